@@ -0,0 +1,83 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark the per-row latency of the compiled preprocessor of
+'src/compiled_inference.py' against the fitted ColumnTransformer on a one-row
+DataFrame, alone and followed by a classifier.
+
+The compiled output is checked to equal the ColumnTransformer's output on the
+validation rows first. Requires the raw data file and the splits. Run from the
+project root:
+
+    python ./benchmarks/bench_compiled_inference.py
+"""
+
+import json
+import time
+from typing import Callable
+
+import numpy as np
+import pandas as pd
+from sklearn.linear_model import LogisticRegression
+from sklearn.preprocessing import LabelEncoder
+
+from src.compiled_inference import CompiledModel, compile_preprocessor
+from src.config import TRAIN_RAW_FILENAME, VALIDATION_RAW_FILENAME
+from src.datasets import DTYPES
+from src.preprocessing import build_preprocessor
+from src.splits import load_split
+
+N_CHECK_ROWS = 5000
+""" Number of validation rows the compiled output is compared on. """
+
+N_TIMED_ROWS = 500
+""" Number of validation rows scored one by one per variant. """
+
+
+def _time_per_row(score: Callable, records: list) -> float:
+    start = time.perf_counter()
+    for record in records:
+        score(record)
+    return (time.perf_counter() - start) / len(records) * 1e6
+
+
+def bench_compiled_inference() -> None:
+    df_train = load_split(TRAIN_RAW_FILENAME)
+    X_train = df_train.drop(columns="Diabetes_012")
+    labelencoder = LabelEncoder().fit(df_train["Diabetes_012"])
+    preprocessor = build_preprocessor().fit(X_train)
+    classifier = LogisticRegression(max_iter=200).fit(
+        preprocessor.transform(X_train),
+        labelencoder.transform(df_train["Diabetes_012"]),
+    )
+
+    X_val = load_split(VALIDATION_RAW_FILENAME).drop(columns="Diabetes_012")
+    records = json.loads(X_val.head(N_CHECK_ROWS).to_json(orient="records"))
+    compiled = compile_preprocessor(preprocessor)
+    expected = np.asarray(preprocessor.transform(X_val.head(N_CHECK_ROWS)))
+    assert np.array_equal(compiled.transform(records), expected)
+    print(f"✅ compiled output equals the ColumnTransformer on {N_CHECK_ROWS} rows")
+
+    model = CompiledModel(preprocessor, classifier, labelencoder)
+    dtypes = {c: DTYPES[c] for c in X_val.columns}
+
+    def to_frame(record: dict) -> pd.DataFrame:
+        return pd.DataFrame([record], columns=X_val.columns).astype(dtypes)
+
+    variants = {
+        "preprocess, DataFrame (former)": lambda r: preprocessor.transform(to_frame(r)),
+        "preprocess, compiled": compiled.transform_record,
+        "predict_proba, DataFrame (former)": lambda r: classifier.predict_proba(
+            preprocessor.transform(to_frame(r))
+        ),
+        "predict_proba, compiled": model.predict_proba_record,
+    }
+
+    timed = records[:N_TIMED_ROWS]
+    print(f"Mean latency per row of {len(timed)} single rows")
+    for name, score in variants.items():
+        print(f"  {name:<34} {_time_per_row(score, timed):10.1f} µs")
+
+
+if __name__ == "__main__":
+    bench_compiled_inference()
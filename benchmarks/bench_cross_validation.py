@@ -0,0 +1,74 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark cross-validating hyperparameter trials on the fold matrices of
+'FoldMatrixStore' in 'src/cross_validation.py' against 'cross_val_score' on
+the raw DataFrame.
+
+Requires the raw data file and the splits. Run from the project root:
+
+    python ./benchmarks/bench_cross_validation.py
+"""
+
+import tempfile
+import time
+
+from imblearn.over_sampling import RandomOverSampler
+from imblearn.pipeline import Pipeline
+from sklearn.model_selection import StratifiedKFold, cross_val_score
+from sklearn.tree import DecisionTreeClassifier
+
+from src.config import TRAIN_RAW_FILENAME
+from src.cross_validation import FoldMatrixStore
+from src.preprocessing import build_preprocessor
+from src.splits import load_split
+
+TRIAL_THRESHOLDS = [
+    [[20, 25, 30], [0, 5, 10], [0, 5, 10]],
+    [[30], [0], [0]],
+] * 3
+""" Thresholds of the trials, the study repeats the few combinations. """
+
+
+def bench_fold_matrix_store() -> None:
+    df = load_split(TRAIN_RAW_FILENAME)
+    X = df.drop(columns="Diabetes_012")
+    y = (df["Diabetes_012"] != "no dia").to_numpy()
+    cv = StratifiedKFold(n_splits=5, shuffle=True, random_state=42)
+
+    preprocessor = build_preprocessor()
+    preprocessor.set_output(transform="pandas")
+    pipeline = Pipeline(
+        [
+            ("preprocessor", preprocessor),
+            ("sample", RandomOverSampler(random_state=5)),
+            ("clf", DecisionTreeClassifier(max_depth=5, random_state=0)),
+        ]
+    )
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        t = time.perf_counter()
+        fold_store = FoldMatrixStore(X, y, cv=cv, store_dir=tmp_dir)
+        t_init = time.perf_counter() - t
+
+        variants = {
+            "cross_val_score (former)": lambda: cross_val_score(
+                pipeline, X, y, scoring="f1_macro", cv=cv, n_jobs=-1
+            ),
+            "FoldMatrixStore": lambda: fold_store.cross_val_score(
+                pipeline, scoring="f1_macro", n_jobs=-1
+            ),
+        }
+
+        print(f"{len(TRIAL_THRESHOLDS)} trials of 5 folds on {len(X)} rows")
+        print(f"  {'FoldMatrixStore init':<26} {t_init:8.1f} s")
+        for name, run in variants.items():
+            t = time.perf_counter()
+            for thresholds in TRIAL_THRESHOLDS:
+                preprocessor.set_params(cg__cat_gen__thresholds=thresholds)
+                run()
+            print(f"  {name:<26} {time.perf_counter() - t:8.1f} s")
+
+
+if __name__ == "__main__":
+    bench_fold_matrix_store()
@@ -0,0 +1,61 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark loading the raw data file with the storage formats of
+'src/datasets.py' against the former 'pd.read_csv' with inferred dtypes.
+
+Requires the transformed raw data file. Run from the project root:
+
+    python ./benchmarks/bench_datasets.py
+"""
+
+import os
+import tempfile
+import timeit
+
+import pandas as pd
+
+from src.config import DATA_RAW_DIR, DATA_RAW_FILENAME
+from src.datasets import (
+    STORAGE_EXTENSIONS,
+    get_dataset_path,
+    load_dataset,
+    save_dataset,
+)
+
+N_REPEATS = 3
+""" Number of timed repetitions, the best one is reported. """
+
+
+def bench_load_dataset() -> None:
+    df = load_dataset(DATA_RAW_DIR, DATA_RAW_FILENAME)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for storage_format in STORAGE_EXTENSIONS:
+            save_dataset(df, tmp_dir, DATA_RAW_FILENAME, storage_format)
+
+        csv_path = get_dataset_path(tmp_dir, DATA_RAW_FILENAME, "csv")
+        variants = {
+            "read_csv, inferred (former)": lambda: pd.read_csv(csv_path),
+        } | {
+            storage_format: lambda storage_format=storage_format: load_dataset(
+                tmp_dir, DATA_RAW_FILENAME, storage_format=storage_format
+            )
+            for storage_format in STORAGE_EXTENSIONS
+        }
+        variants["parquet, 3 columns"] = lambda: load_dataset(
+            tmp_dir,
+            DATA_RAW_FILENAME,
+            columns=["Diabetes_012", "BMI", "Age"],
+            storage_format="parquet",
+        )
+
+        print(f"Loading {len(df)} rows")
+        for name, load in variants.items():
+            t = min(timeit.repeat(load, number=1, repeat=N_REPEATS))
+            n_bytes = load().memory_usage(deep=True).sum()
+            print(f"  {name:<28} {t * 1000:8.1f} ms  {n_bytes / 2**20:8.1f} MiB")
+
+
+if __name__ == "__main__":
+    bench_load_dataset()
@@ -0,0 +1,105 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark the peak memory of hyperparameter trials with the dtype policies of
+'build_preprocessor' in 'src/preprocessing.py'.
+
+Each trial cross-validates a random forest with random oversampling on the
+stored fold matrices of a 'FoldMatrixStore', as 'rf_feateng_objective' does.
+It runs in a fresh process, whose peak resident set size (RSS) before and
+during the trial is reported. The folds are preprocessed beforehand. The
+"float64" policy is stored as float64 (former), the others in their own dtype.
+
+Requires the raw data file and the splits and the 'resource' module, i.e. a
+Unix system. Run from the project root:
+
+    python ./benchmarks/bench_dtype_policy.py
+"""
+
+import multiprocessing
+import resource
+import tempfile
+import time
+from typing import Optional, Tuple
+
+import numpy as np
+from imblearn.over_sampling import RandomOverSampler
+from imblearn.pipeline import Pipeline
+from sklearn.ensemble import RandomForestClassifier
+
+from src.config import TRAIN_RAW_FILENAME
+from src.cross_validation import FoldMatrixStore
+from src.preprocessing import DTYPE_POLICIES, build_preprocessor
+from src.splits import load_split
+
+TRIAL_PARAMS = [
+    {"n_estimators": 50, "max_depth": 15, "min_samples_leaf": 6},
+    {"n_estimators": 30, "max_depth": 40, "min_samples_leaf": 1},
+]
+""" Parameters of the forests of the trials. """
+
+
+def _get_fold_store(dtype_policy: str, store_dir: str) -> FoldMatrixStore:
+    df = load_split(TRAIN_RAW_FILENAME)
+    X = df.drop(columns="Diabetes_012")
+    y = (df["Diabetes_012"] != "no dia").to_numpy()
+    dtype: Optional[type] = np.float64 if dtype_policy == "float64" else None
+    return FoldMatrixStore(X, y, store_dir=store_dir, dtype=dtype)
+
+
+def _get_pipeline(dtype_policy: str, params: dict) -> Pipeline:
+    return Pipeline(
+        [
+            ("preprocessor", build_preprocessor(dtype_policy=dtype_policy)),
+            ("sample", RandomOverSampler(random_state=5)),
+            (
+                "clf",
+                RandomForestClassifier(
+                    class_weight="balanced", random_state=42, **params
+                ),
+            ),
+        ]
+    )
+
+
+def _run_trial(dtype_policy: str, params: dict, store_dir: str) -> Tuple[float, ...]:
+    """Returns the score, the peak RSS before and during the trial in MB and s."""
+    fold_store = _get_fold_store(dtype_policy, store_dir)
+    pipeline = _get_pipeline(dtype_policy, params)
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+    t = time.perf_counter()
+    score = fold_store.cross_val_score(pipeline, scoring="f1_macro", n_jobs=1).mean()
+    duration = time.perf_counter() - t
+
+    rss_peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return score, rss_before, rss_peak, duration
+
+
+def bench_dtype_policy() -> None:
+    with tempfile.TemporaryDirectory() as store_dir:
+        for dtype_policy in DTYPE_POLICIES:
+            fold_store = _get_fold_store(dtype_policy, store_dir)
+            pipeline = _get_pipeline(dtype_policy, TRIAL_PARAMS[0])
+            X_train, _ = fold_store.get_fold_matrices(pipeline[:1])[0]
+            print(
+                f"{dtype_policy}: fold matrices of {X_train.dtype},"
+                f" {X_train.nbytes / 1e6:.0f} MB per training fold"
+            )
+            del fold_store, X_train
+
+            for i, params in enumerate(TRIAL_PARAMS):
+                # A fresh process per trial, its peak RSS is of the trial only.
+                with multiprocessing.Pool(1, maxtasksperchild=1) as pool:
+                    score, rss_before, rss_peak, duration = pool.apply(
+                        _run_trial, (dtype_policy, params, store_dir)
+                    )
+                print(
+                    f"  trial {i}: f1 {score:.4f}, {duration:6.1f} s,"
+                    f" peak RSS {rss_peak:7.0f} MB"
+                    f" (+{rss_peak - rss_before:.0f} MB during the trial)"
+                )
+
+
+if __name__ == "__main__":
+    bench_dtype_policy()
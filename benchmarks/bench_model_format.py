@@ -0,0 +1,131 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark loading a random forest from its pickle against loading it
+memory-mapped with 'MappedForestClassifier' of 'src/mapped_forest.py'.
+
+Each format is loaded in a new process, which reports the load time, the
+growth of its private memory (RssAnon) and of its file-backed memory
+(RssFile, pages of the page cache shared with other processes) after loading,
+and the time to predict 20000 rows. Linux only, as the memory is read from '/proc'.
+
+Trains a forest on the training split, or uses the classifier of a model
+directory given as argument. Run from the project root:
+
+    python ./benchmarks/bench_model_format.py [<model_dir>]
+"""
+
+import json
+import os
+import pickle
+import subprocess
+import sys
+import tempfile
+
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+
+from src.config import TRAIN_RAW_FILENAME
+from src.mapped_forest import save_mapped_forest
+from src.preprocessing import build_preprocessor
+from src.splits import load_split
+
+N_PREDICT_ROWS = 20000
+""" Number of rows predicted after loading. """
+
+LOAD_SCRIPT = """
+import json, pickle, sys, time
+import numpy as np
+from src.mapped_forest import MappedForestClassifier
+
+def rss():
+    with open("/proc/self/status") as f:
+        fields = dict(line.split(":", 1) for line in f)
+    return {k: int(fields[k].split()[0]) / 1024 for k in ("RssAnon", "RssFile")}
+
+fmt, path, x_path = sys.argv[1:]
+X = np.load(x_path)
+before = rss()
+t = time.perf_counter()
+if fmt == "pickle":
+    with open(path, "rb") as f:
+        classifier = pickle.load(f)
+else:
+    classifier = MappedForestClassifier(path)
+t_load = time.perf_counter() - t
+after = rss()
+t = time.perf_counter()
+classifier.predict_proba(X)
+t_predict = time.perf_counter() - t
+print(json.dumps({
+    "load_sec": t_load,
+    "predict_sec": t_predict,
+    "rss_anon_mb": after["RssAnon"] - before["RssAnon"],
+    "rss_file_mb": after["RssFile"] - before["RssFile"],
+}))
+"""
+
+
+def _get_size_mb(path: str) -> float:
+    if os.path.isdir(path):
+        return sum(e.stat().st_size for e in os.scandir(path)) / 2**20
+    return os.path.getsize(path) / 2**20
+
+
+def _measure(fmt: str, path: str, x_path: str) -> dict:
+    result = subprocess.run(
+        [sys.executable, "-c", LOAD_SCRIPT, fmt, path, x_path],
+        capture_output=True,
+        text=True,
+        check=True,
+        env={**os.environ, "PYTHONPATH": os.getcwd()},
+    )
+    return json.loads(result.stdout)
+
+
+def bench_model_format() -> None:
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        if len(sys.argv) > 1:
+            model_dir = os.path.normpath(sys.argv[1])
+            model_name = os.path.basename(model_dir)
+            pickle_path = os.path.join(model_dir, f"{model_name}.model.pkl")
+            with open(pickle_path, "rb") as f:
+                classifier = pickle.load(f)
+            X = np.random.RandomState(0).rand(N_PREDICT_ROWS, classifier.n_features_in_)
+        else:
+            df = load_split(TRAIN_RAW_FILENAME)
+            X = build_preprocessor().fit_transform(df.drop(columns="Diabetes_012"))
+            X = np.asarray(X, dtype=np.float64)
+            classifier = RandomForestClassifier(
+                n_estimators=50, class_weight="balanced", random_state=42, n_jobs=-1
+            )
+            classifier.fit(X, df["Diabetes_012"])
+            pickle_path = os.path.join(tmp_dir, "model.pkl")
+            with open(pickle_path, "wb") as f:
+                pickle.dump(classifier, f)
+            X = X[:N_PREDICT_ROWS]
+
+        x_path = os.path.join(tmp_dir, "X.npy")
+        np.save(x_path, X)
+        forest_path = os.path.join(tmp_dir, "model.forest")
+        save_mapped_forest(classifier, forest_path)
+
+        print(f"{type(classifier).__name__}, predicting {len(X)} rows")
+        print(
+            f"  {'format':<16} {'size MB':>8} {'load s':>8} {'private MB':>11}"
+            f" {'shared MB':>10} {'predict s':>10}"
+        )
+        for name, fmt, path in [
+            ("pickle (former)", "pickle", pickle_path),
+            ("mapped forest", "mapped", forest_path),
+        ]:
+            r = _measure(fmt, path, x_path)
+            print(
+                f"  {name:<16} {_get_size_mb(path):8.1f} {r['load_sec']:8.2f}"
+                f" {r['rss_anon_mb']:11.1f} {r['rss_file_mb']:10.1f}"
+                f" {r['predict_sec']:10.2f}"
+            )
+
+
+if __name__ == "__main__":
+    bench_model_format()
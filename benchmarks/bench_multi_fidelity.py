@@ -0,0 +1,65 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark the multi-fidelity study of 'src/multi_fidelity.py', pruned by
+successive halving on growing row subsamples and 'n_estimators' budgets,
+against the study on the full training split pruned after the first folds.
+
+Both studies run the same number of trials with the same TPE seed. The values
+of their completed trials are 5-fold cross-validated on the full budget, so
+the best values are comparable. Requires the raw data file and the splits.
+Run from the project root:
+
+    python ./benchmarks/bench_multi_fidelity.py
+"""
+
+import tempfile
+import time
+
+import optuna
+
+from src.studies import run_study
+
+N_TRIALS = 40
+""" Number of trials of each study. """
+
+STUDIES = {
+    "full budget, median pruner (former)": (
+        "src.objectives:rf_feateng_objective",
+        "median",
+    ),
+    "multi-fidelity, asha pruner": (
+        "src.objectives:rf_feateng_multi_fidelity_objective",
+        "asha",
+    ),
+}
+""" Objective factory and pruner of each study. """
+
+
+def bench_multi_fidelity() -> None:
+    optuna.logging.set_verbosity(optuna.logging.WARNING)
+
+    print(f"{N_TRIALS} trials per study")
+    with tempfile.TemporaryDirectory() as study_dir:
+        for i, (name, (objective, pruner)) in enumerate(STUDIES.items()):
+            t = time.perf_counter()
+            study = run_study(
+                f"bench_multi_fidelity_{i}",
+                objective,
+                n_trials=N_TRIALS,
+                pruner=pruner,
+                study_dir=study_dir,
+            )
+            duration = time.perf_counter() - t
+
+            n_pruned = sum(
+                t.state == optuna.trial.TrialState.PRUNED for t in study.trials
+            )
+            print(
+                f"  {name:<36} {duration:8.1f} s, best f1 {study.best_value:.4f},"
+                f" {n_pruned} pruned"
+            )
+
+
+if __name__ == "__main__":
+    bench_multi_fidelity()
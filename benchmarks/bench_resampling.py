@@ -0,0 +1,114 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark the resampling stages of 'src/resampling.py' against the imblearn
+samplers on the stored fold matrices of a 'FoldMatrixStore'.
+
+Every variant cross-validates a random forest on the preprocessed folds, as
+'rf_feateng_objective' does, and reports the time and the peak of the memory
+allocated during the cross-validation, traced by 'tracemalloc'. The folds are
+preprocessed with the "float32" dtype policy, as SMOTE interpolates between
+rows and would truncate the synthetic rows of the integer "compact" matrices.
+The cached SMOTE neighbors are computed in the first (cold) run and loaded in
+the second (warm) one, as by the next trial with the same preprocessing.
+
+Requires the raw data file and the splits. Run from the project root:
+
+    python ./benchmarks/bench_resampling.py
+"""
+
+import tempfile
+import time
+import tracemalloc
+from typing import Any, Tuple
+
+from imblearn.over_sampling import SMOTE, RandomOverSampler
+from imblearn.pipeline import Pipeline
+from sklearn.ensemble import RandomForestClassifier
+
+from src.config import TRAIN_RAW_FILENAME
+from src.cross_validation import FoldMatrixStore
+from src.preprocessing import build_preprocessor
+from src.resampling import CachedNearestNeighbors, OverSampledClassifier
+from src.splits import load_split
+
+RF_PARAMS = {"n_estimators": 30, "max_depth": 15, "min_samples_leaf": 6}
+""" Parameters of the forests of all variants. """
+
+
+def _get_rf() -> RandomForestClassifier:
+    return RandomForestClassifier(random_state=42, n_jobs=1, **RF_PARAMS)
+
+
+def _get_pipeline(*steps: Tuple[str, Any]) -> Pipeline:
+    return Pipeline(
+        [("preprocessor", build_preprocessor(dtype_policy="float32")), *steps]
+    )
+
+
+def _run(fold_store: FoldMatrixStore, pipeline: Pipeline) -> Tuple[float, ...]:
+    """Returns the score, the duration in s and the traced peak in MB."""
+    tracemalloc.start()
+    t = time.perf_counter()
+    score = fold_store.cross_val_score(pipeline, scoring="f1_macro", n_jobs=1).mean()
+    duration = time.perf_counter() - t
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return score, duration, peak / 1e6
+
+
+def bench_resampling() -> None:
+    df = load_split(TRAIN_RAW_FILENAME)
+    X = df.drop(columns="Diabetes_012")
+    y = df["Diabetes_012"].to_numpy()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        fold_store = FoldMatrixStore(X, y, store_dir=tmp_dir, dtype=None)
+        # Preprocess the folds beforehand, all variants share them.
+        fold_store.get_fold_matrices(_get_pipeline()[:1])
+
+        def cached_smote() -> SMOTE:
+            return SMOTE(
+                k_neighbors=CachedNearestNeighbors(n_neighbors=6, cache_dir=tmp_dir),
+                random_state=5,
+            )
+
+        variants = [
+            ("no resampling", lambda: _get_pipeline(("clf", _get_rf()))),
+            (
+                "RandomOverSampler (former)",
+                lambda: _get_pipeline(
+                    ("sample", RandomOverSampler(random_state=5)), ("clf", _get_rf())
+                ),
+            ),
+            (
+                "OverSampledClassifier",
+                lambda: _get_pipeline(
+                    ("clf", OverSampledClassifier(_get_rf(), random_state=5))
+                ),
+            ),
+            (
+                "SMOTE (former)",
+                lambda: _get_pipeline(
+                    ("sample", SMOTE(random_state=5)), ("clf", _get_rf())
+                ),
+            ),
+            (
+                "SMOTE, cached neighbors (cold)",
+                lambda: _get_pipeline(("sample", cached_smote()), ("clf", _get_rf())),
+            ),
+            (
+                "SMOTE, cached neighbors (warm)",
+                lambda: _get_pipeline(("sample", cached_smote()), ("clf", _get_rf())),
+            ),
+        ]
+        for name, get_pipeline in variants:
+            score, duration, peak = _run(fold_store, get_pipeline())
+            print(
+                f"{name:31s}: f1 {score:.4f}, {duration / fold_store.n_splits:5.1f} s"
+                f" per fold, peak {peak:6.0f} MB"
+            )
+
+
+if __name__ == "__main__":
+    bench_resampling()
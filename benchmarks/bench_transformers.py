@@ -0,0 +1,179 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark the custom transformers in 'src/transformers.py' on synthetic data
+shaped like the training split (~250k rows).
+
+Run from the project root:
+
+    python ./benchmarks/bench_transformers.py
+"""
+
+import timeit
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from sklearn.preprocessing import OneHotEncoder
+
+from src.transformers import (
+    CategoryFromThresholdTransformer,
+    MissingFlagTransformer,
+    ThresholdOneHotEncoder,
+)
+
+N_ROWS = 250_000
+""" Number of rows of the synthetic data, roughly the size of the training split. """
+N_REPEATS = 3
+""" Number of timed repetitions, the best one is reported. """
+
+
+def make_cat_gen_data(n_rows: int = N_ROWS, seed: int = 0) -> pd.DataFrame:
+    """Returns synthetic 'BMI', 'MentHlth' and 'PhysHlth' columns with some missing values."""
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame(
+        {
+            "BMI": rng.uniform(12, 70, n_rows).round(2),
+            "MentHlth": rng.integers(0, 31, n_rows).astype(float),
+            "PhysHlth": rng.integers(0, 31, n_rows).astype(float),
+        }
+    )
+    for col in df.columns:
+        df.loc[rng.random(n_rows) < 0.02, col] = np.nan
+    return df
+
+
+def get_cat_from_threshold(value, thresholds):
+    """The former per-element binning of 'transform', kept as reference."""
+    if pd.isna(value):
+        return "NA"
+    if value >= thresholds[-1]:
+        return f"{thresholds[-1]}+"
+    if value < thresholds[0]:
+        return f"<{thresholds[0]}"
+    idx = next(i for i, val in enumerate(thresholds) if val > value)
+    return f"[{thresholds[idx - 1]}-{thresholds[idx]})"
+
+
+def transform_elementwise(transformer: CategoryFromThresholdTransformer, X):
+    """The former per-element implementation of 'transform', kept as reference."""
+    X_ = X.values if isinstance(X, pd.DataFrame) else X
+    return np.column_stack(
+        [
+            [get_cat_from_threshold(x, th) for x in X_[:, i]]
+            for i, th in enumerate(transformer.thresholds)
+        ]
+    )
+
+
+def bench_category_from_threshold() -> None:
+    X = make_cat_gen_data()
+    transformer = CategoryFromThresholdTransformer(
+        [[20, 25, 30], [0, 5, 10], [0, 10, 20]]
+    ).fit(X)
+
+    if not np.array_equal(
+        transformer.transform(X), transform_elementwise(transformer, X)
+    ):
+        raise AssertionError("vectorized and element-wise output differ")
+
+    t_elem = min(
+        timeit.repeat(
+            lambda: transform_elementwise(transformer, X), number=1, repeat=N_REPEATS
+        )
+    )
+    t_vec = min(
+        timeit.repeat(lambda: transformer.transform(X), number=1, repeat=N_REPEATS)
+    )
+
+    print(f"CategoryFromThresholdTransformer.transform on {len(X)} rows")
+    print(f"  element-wise: {t_elem * 1000:9.1f} ms")
+    print(f"  vectorized:   {t_vec * 1000:9.1f} ms  ({t_elem / t_vec:.1f}x)")
+
+
+def bench_threshold_one_hot() -> None:
+    X = make_cat_gen_data().fillna(0)
+    thresholds = [[20, 25, 30], [0, 5, 10], [0, 10, 20]]
+
+    cat_gen = CategoryFromThresholdTransformer(thresholds).fit(X)
+    ohe = OneHotEncoder(handle_unknown="ignore", sparse_output=False)
+    ohe.fit(cat_gen.transform(X))
+    fused = ThresholdOneHotEncoder(thresholds).fit(X)
+
+    t_two_step = min(
+        timeit.repeat(
+            lambda: ohe.transform(cat_gen.transform(X)), number=1, repeat=N_REPEATS
+        )
+    )
+    t_fused = min(timeit.repeat(lambda: fused.transform(X), number=1, repeat=N_REPEATS))
+
+    n_two_step = ohe.transform(cat_gen.transform(X)).nbytes
+    n_fused = fused.transform(X).nbytes
+
+    print(f"Threshold binning + one-hot encoding on {len(X)} rows")
+    print(
+        f"  labels + OneHotEncoder: {t_two_step * 1000:9.1f} ms {n_two_step:>11} bytes"
+    )
+    print(
+        f"  ThresholdOneHotEncoder: {t_fused * 1000:9.1f} ms {n_fused:>11} bytes"
+        f"  ({t_two_step / t_fused:.1f}x)"
+    )
+
+
+def make_missing_flag_data(
+    n_rows: int = N_ROWS, n_cols: int = 18, seed: int = 0
+) -> pd.DataFrame:
+    """Returns synthetic categorical columns, half of them with missing values."""
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame(
+        {f"c{i}": rng.choice(["y", "n"], n_rows) for i in range(n_cols)},
+        dtype=object,
+    )
+    for col in df.columns[::2]:
+        df.loc[rng.random(n_rows) < 0.02, col] = None
+    return df
+
+
+def peak_memory(func) -> int:
+    """Returns the peak of memory allocated while calling 'func' in bytes."""
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+
+def bench_missing_flags() -> None:
+    X = make_missing_flag_data()
+
+    def transform_with_copy(X):
+        """The former implementation of 'transform', kept as reference."""
+        return pd.isna(X.copy()).to_numpy()
+
+    variants = {
+        "copy + pd.isna (former)": transform_with_copy,
+        "bool": MissingFlagTransformer().fit(X).transform,
+        "uint8, drop never missing": MissingFlagTransformer(
+            dtype=np.uint8, drop_never_missing=True
+        )
+        .fit(X)
+        .transform,
+        "packbits": MissingFlagTransformer(packbits=True).fit(X).transform,
+    }
+
+    print(f"MissingFlagTransformer.transform on {X.shape[0]} rows x {X.shape[1]} cols")
+    for name, transform in variants.items():
+        t = min(timeit.repeat(lambda: transform(X), number=1, repeat=N_REPEATS))
+        out = transform(X)
+        peak = peak_memory(lambda: transform(X))
+        print(
+            f"  {name:<26} {t * 1000:7.1f} ms  output {out.nbytes:>9} bytes"
+            f"  peak {peak:>10} bytes"
+        )
+
+
+if __name__ == "__main__":
+    bench_category_from_threshold()
+    bench_threshold_one_hot()
+    bench_missing_flags()
@@ -0,0 +1,173 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Load test of the scoring service of 'src/serving.py' on localhost.
+
+Starts the service for each batching configuration in a separate process and
+sends single-record requests of the validation split from concurrent client
+threads over keep-alive connections. Reports the client-side p50/p99 latency
+and throughput and the mean batch size of the service.
+
+Requires the splits and a saved model, by default the model with the best
+f1. Run from the project root:
+
+    python ./benchmarks/load_test_serving.py [<model_dir>]
+"""
+
+import http.client
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+from src.config import VALIDATION_RAW_FILENAME
+from src.registry import find_best_model_dir
+from src.splits import load_split
+
+N_CLIENTS = 32
+""" Number of concurrent client threads. """
+
+N_REQUESTS_PER_CLIENT = 50
+""" Number of requests each client sends. """
+
+CONFIGURATIONS = [
+    ("no batching", 1, 0.0),
+    ("max wait 2 ms", 256, 2.0),
+    ("max wait 10 ms", 256, 10.0),
+]
+""" Name, maximum batch size and maximum wait in milliseconds of the runs. """
+
+
+def _get_free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _request(
+    connection: http.client.HTTPConnection, method: str, path: str, body: Any = None
+) -> Any:
+    data = json.dumps(body).encode("utf-8") if body is not None else None
+    headers = {"Content-Type": "application/json"} if data is not None else {}
+    connection.request(method, path, body=data, headers=headers)
+    response = connection.getresponse()
+    result = json.loads(response.read())
+    if response.status != 200:
+        raise RuntimeError(f"{response.status}: {result}")
+    return result
+
+
+def _wait_for_service(port: int, process: subprocess.Popen) -> None:
+    while True:
+        if process.poll() is not None:
+            raise RuntimeError("The service exited during startup.")
+        try:
+            connection = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+            _request(connection, "GET", "/health")
+            connection.close()
+            return
+        except OSError:
+            time.sleep(0.2)
+
+
+def _run_client(
+    port: int, records: List[Dict[str, Any]], latencies: List[float]
+) -> None:
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+    for record in records:
+        start = time.perf_counter()
+        _request(connection, "POST", "/predict", record)
+        latencies.append(time.perf_counter() - start)
+    connection.close()
+
+
+def _load_test(
+    model_dir: str,
+    records: List[Dict[str, Any]],
+    max_batch_size: int,
+    max_wait_ms: float,
+) -> Tuple[np.ndarray, float, Dict[str, Any]]:
+    port = _get_free_port()
+    process = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "src.serving",
+            "--model-dir",
+            model_dir,
+            "--port",
+            str(port),
+            "--max-batch-size",
+            str(max_batch_size),
+            "--max-wait-ms",
+            str(max_wait_ms),
+        ],
+        stdout=subprocess.DEVNULL,
+        env={**os.environ, "PYTHONPATH": os.getcwd()},
+    )
+    try:
+        _wait_for_service(port, process)
+        latencies: List[float] = []
+        clients = [
+            threading.Thread(
+                target=_run_client,
+                args=(
+                    port,
+                    records[
+                        i * N_REQUESTS_PER_CLIENT : (i + 1) * N_REQUESTS_PER_CLIENT
+                    ],
+                    latencies,
+                ),
+            )
+            for i in range(N_CLIENTS)
+        ]
+        start = time.perf_counter()
+        for client in clients:
+            client.start()
+        for client in clients:
+            client.join()
+        duration = time.perf_counter() - start
+
+        connection = http.client.HTTPConnection("127.0.0.1", port)
+        metrics = _request(connection, "GET", "/metrics")
+        connection.close()
+    finally:
+        process.terminate()
+        process.wait()
+    return np.array(latencies), duration, metrics
+
+
+def load_test_serving() -> None:
+    model_dir = sys.argv[1] if len(sys.argv) > 1 else find_best_model_dir()
+    df = load_split(VALIDATION_RAW_FILENAME).drop(columns="Diabetes_012")
+    records = json.loads(
+        df.head(N_CLIENTS * N_REQUESTS_PER_CLIENT).to_json(orient="records")
+    )
+
+    print(
+        f"{N_CLIENTS} clients x {N_REQUESTS_PER_CLIENT} single-record requests,"
+        f" model '{os.path.basename(os.path.normpath(model_dir))}'"
+    )
+    print(
+        f"  {'configuration':<16} {'p50 ms':>8} {'p99 ms':>8} {'req/s':>8}"
+        f" {'batch size':>11}"
+    )
+    for name, max_batch_size, max_wait_ms in CONFIGURATIONS:
+        latencies, duration, metrics = _load_test(
+            model_dir, records, max_batch_size, max_wait_ms
+        )
+        p50, p99 = np.percentile(latencies * 1000.0, [50, 99])
+        print(
+            f"  {name:<16} {p50:8.1f} {p99:8.1f} {len(latencies) / duration:8.1f}"
+            f" {metrics.get('mean_batch_size', 0.0):11.1f}"
+        )
+
+
+if __name__ == "__main__":
+    load_test_serving()
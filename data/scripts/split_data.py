@@ -19,28 +19,76 @@ I wanted to keep the data as close to the original dataset as possible, i.e.,
 keeping missing values while also introducing readable values.
 """
 
-import os
-import pandas as pd
-from sklearn.model_selection import train_test_split
+import argparse
+
+import numpy as np
+from sklearn.model_selection import StratifiedKFold, train_test_split
 
 
 from src.config import (
     DATA_RAW_DIR,
-    DATA_SPLIT_DIR,
     DATA_RAW_FILENAME,
     TRAIN_RAW_FILENAME,
     TEST_RAW_FILENAME,
     VALIDATION_RAW_FILENAME,
 )
+from src.datasets import load_dataset
+from src.schema import TARGET_COL
+from src.splits import save_splits
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Split the transformed BRFSS dataset by saving row indices."
+    )
+    parser.add_argument(
+        "--stratify",
+        action="store_true",
+        help=f"Stratify the training, validation and test split by '{TARGET_COL}'.",
+    )
+    parser.add_argument(
+        "--folds",
+        type=int,
+        default=5,
+        help="Number of stratified cross-validation folds of the training split.",
+    )
+    args = parser.parse_args()
 
-os.makedirs(DATA_SPLIT_DIR, exist_ok=True)
+    # Only the target is needed to split, the rows are indexed by position.
+    target = load_dataset(DATA_RAW_DIR, DATA_RAW_FILENAME, columns=[TARGET_COL])[
+        TARGET_COL
+    ].to_numpy()
+    positions = np.arange(len(target))
 
-df_raw = pd.read_csv(os.path.join(DATA_RAW_DIR, DATA_RAW_FILENAME))
+    idx_train, idx_temp = train_test_split(
+        positions,
+        random_state=42,
+        test_size=0.15,
+        stratify=target if args.stratify else None,
+    )
+    idx_val, idx_test = train_test_split(
+        idx_temp,
+        random_state=42,
+        test_size=0.33,
+        stratify=target[idx_temp] if args.stratify else None,
+    )
 
-X_train, X_temp = train_test_split(df_raw, random_state=42, test_size=0.15)
-X_val, X_test = train_test_split(X_temp, random_state=42, test_size=0.33)
+    # Stratified on the 3-class target, stored as fold id per row of the
+    # training split. Same folds as 'StratifiedKFold(n_splits=5, shuffle=True,
+    # random_state=42)' of the notebooks on the 3-class target only, not on the
+    # merged 'pre'/'dia' target.
+    folds_train = np.empty(len(idx_train), dtype=np.int8)
+    skf = StratifiedKFold(n_splits=args.folds, shuffle=True, random_state=42)
+    for fold, (_, idx_fold) in enumerate(skf.split(idx_train, target[idx_train])):
+        folds_train[idx_fold] = fold
 
+    manifest_path = save_splits(
+        splits={
+            TRAIN_RAW_FILENAME: idx_train,
+            VALIDATION_RAW_FILENAME: idx_val,
+            TEST_RAW_FILENAME: idx_test,
+        },
+        folds={TRAIN_RAW_FILENAME: folds_train},
+        params={"random_state": 42, "stratify": args.stratify, "folds": args.folds},
+    )
 
-X_train.to_csv(os.path.join(DATA_SPLIT_DIR, TRAIN_RAW_FILENAME), index=False)
-X_val.to_csv(os.path.join(DATA_SPLIT_DIR, VALIDATION_RAW_FILENAME), index=False)
-X_test.to_csv(os.path.join(DATA_SPLIT_DIR, TEST_RAW_FILENAME), index=False)
+    print(f"✅ Saved split indices described by '{manifest_path}'")
@@ -1,5 +1,4 @@
-def main():
-    print("Hello from cleanupdiabetes!")
+from src.score import main
 
 
 if __name__ == "__main__":
@@ -0,0 +1,195 @@
+"""
+Loads the saved components of a trained model.
+
+A model directory '<MODELS_DIR>/<model_name>' holds the classifier
+'<model_name>.model.pkl', the fitted preprocessor '<model_name>.pipeline.pkl'
+and the label encoder '<model_name>.label_encoder.pkl'. 'load_model_artifact'
+loads the three once and keeps them in an in-process cache, keyed by the
+directory and the modification times of the files, so that the evaluation
+functions run on the same model share one deserialized copy.
+
+A forest classifier can additionally be saved as directory
+'<model_name>.model.forest' with 'save_mapped_classifier', which is loaded
+memory-mapped instead of the pickle, see 'src/mapped_forest.py'. A mapped
+forest only predicts. Callers which clone or refit the classifier load the
+pickle with 'prefer_mapped=False'.
+"""
+
+import os
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Literal, Optional
+
+import joblib
+from sklearn.base import BaseEstimator
+
+from src.mapped_forest import MappedForestClassifier, save_mapped_forest
+
+ARTIFACT_SUFFIXES = {
+    "classifier": "model.pkl",
+    "preprocessor": "pipeline.pkl",
+    "label_encoder": "label_encoder.pkl",
+}
+""" File suffixes of the model components, after '<model_name>.'. """
+
+MAPPED_CLASSIFIER_SUFFIX = "model.forest"
+""" Suffix of the directory of a classifier saved by 'save_mapped_forest'. """
+
+MAX_CACHED_ARTIFACTS = 4
+""" Number of loaded models kept in the cache, the least recently used are dropped. """
+
+# Maps (directory, mmap_mode, prefer_mapped) to the file versions and the
+# loaded artifact.
+_artifact_cache: OrderedDict = OrderedDict()
+
+
+@dataclass(frozen=True)
+class ModelArtifact:
+    """
+    Components of a trained model, loaded from its directory.
+
+    Attributes
+    ----------
+    model_dir : str
+        Directory of the model.
+    classifier : BaseEstimator or MappedForestClassifier
+        Classifier fitted on the preprocessed features.
+    preprocessor : BaseEstimator
+        Fitted preprocessor of the raw features.
+    label_encoder : BaseEstimator or None
+        Fitted label encoder of the target, None if the model has none.
+    """
+
+    model_dir: str
+    classifier: BaseEstimator
+    preprocessor: BaseEstimator
+    label_encoder: Optional[BaseEstimator]
+
+    @property
+    def name(self) -> str:
+        """Name of the model, the name of its directory."""
+        return get_model_name(self.model_dir)
+
+    @property
+    def path_filename_prefix(self) -> str:
+        """Path of the model files without their suffix."""
+        return get_path_filename_prefix(self.model_dir)
+
+
+def get_model_name(model_dir: str) -> str:
+    """Returns the name of a model, the name of its directory."""
+    return os.path.basename(os.path.normpath(model_dir))
+
+
+def get_path_filename_prefix(model_dir: str) -> str:
+    """Returns the path of the files of a model without their suffix."""
+    return os.path.join(model_dir, get_model_name(model_dir))
+
+
+def _get_file_versions(model_dir: str) -> tuple:
+    """Returns the modification time and size of each component file."""
+    prefix = get_path_filename_prefix(model_dir)
+    paths = [f"{prefix}.{suffix}" for suffix in ARTIFACT_SUFFIXES.values()]
+    # The meta file is written last when a mapped forest is saved.
+    paths.append(os.path.join(f"{prefix}.{MAPPED_CLASSIFIER_SUFFIX}", "meta.json"))
+    versions = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+            versions.append((stat.st_mtime_ns, stat.st_size))
+        except FileNotFoundError:
+            versions.append(None)
+    return tuple(versions)
+
+
+def load_model_artifact(
+    model_dir: str,
+    mmap_mode: Optional[Literal["r", "c"]] = None,
+    use_cache: bool = True,
+    prefer_mapped: bool = True,
+) -> ModelArtifact:
+    """
+    Loads the classifier, preprocessor and label encoder of a model.
+
+    Parameters
+    ----------
+    model_dir : str
+        Directory of the model.
+    mmap_mode : {"r", "c"} or None, default=None
+        Memory-maps the NumPy array attributes of files saved with
+        'joblib.dump' instead of reading them. Files saved with 'pickle.dump'
+        are read as they are. The trees of sklearn copy their node arrays when
+        loaded, so they are not mapped. A classifier saved by
+        'save_mapped_classifier' is always mapped, read-only unless
+        'mmap_mode' is "c".
+    use_cache : bool, default=True
+        Whether to return the cached components of a previous call for the
+        directory, if its files did not change since.
+    prefer_mapped : bool, default=True
+        Whether to load a classifier saved by 'save_mapped_classifier' instead
+        of the pickled one. The mapped classifier cannot be fitted, load the
+        pickle to clone or refit it, e.g. for learning curves.
+
+    Returns
+    -------
+    ModelArtifact
+        The model components. Cached components are shared, do not modify them.
+
+    Raises
+    ------
+    FileNotFoundError
+        If the classifier or the preprocessor file is missing.
+    """
+    key = (os.path.abspath(model_dir), mmap_mode, prefer_mapped)
+    versions = _get_file_versions(model_dir)
+
+    if use_cache and key in _artifact_cache:
+        cached_versions, artifact = _artifact_cache[key]
+        if cached_versions == versions:
+            _artifact_cache.move_to_end(key)
+            return artifact
+
+    prefix = get_path_filename_prefix(model_dir)
+    components = {}
+    mapped_path = f"{prefix}.{MAPPED_CLASSIFIER_SUFFIX}"
+    for name, suffix in ARTIFACT_SUFFIXES.items():
+        path = f"{prefix}.{suffix}"
+        if name == "classifier" and prefer_mapped and os.path.isdir(mapped_path):
+            components[name] = MappedForestClassifier(
+                mapped_path, mmap_mode=mmap_mode or "r"
+            )
+            continue
+        if name == "label_encoder" and not os.path.exists(path):
+            components[name] = None
+            continue
+        # joblib also reads plain pickles, memory-mapping applies to its own files.
+        components[name] = joblib.load(path, mmap_mode=mmap_mode)
+    artifact = ModelArtifact(model_dir=model_dir, **components)
+
+    if use_cache:
+        _artifact_cache[key] = (versions, artifact)
+        _artifact_cache.move_to_end(key)
+        while len(_artifact_cache) > MAX_CACHED_ARTIFACTS:
+            _artifact_cache.popitem(last=False)
+    return artifact
+
+
+def save_mapped_classifier(model_dir: str) -> str:
+    """
+    Saves the pickled forest classifier of a model additionally as directory
+    '<model_name>.model.forest', which 'load_model_artifact' loads instead.
+
+    Returns
+    -------
+    str
+        Path of the directory.
+    """
+    prefix = get_path_filename_prefix(model_dir)
+    path = f"{prefix}.{MAPPED_CLASSIFIER_SUFFIX}"
+    save_mapped_forest(joblib.load(f"{prefix}.{ARTIFACT_SUFFIXES['classifier']}"), path)
+    return path
+
+
+def clear_artifact_cache() -> None:
+    """Drops all cached model components."""
+    _artifact_cache.clear()
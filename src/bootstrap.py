@@ -0,0 +1,434 @@
+"""
+Bootstrap confidence intervals of the metrics of 'evaluate_classifier'.
+
+The predictions on the validation rows are resampled with replacement
+'n_resamples' times. The resamples of a chunk are one index matrix, whose
+confusion matrices are counted with one 'np.bincount' and whose ROC AUC is
+computed from the ranks of the scores, without a loop over the resamples.
+Chunks are computed in parallel, each with its own seed spawned from
+'random_state', so that the intervals do not depend on 'n_jobs'.
+
+The intervals are percentile intervals, saved by 'save_bootstrap_ci' as
+"bootstrap_ci" into the '<model_name>.results.json' of a model.
+"""
+
+import json
+from itertools import combinations
+from typing import Any, Dict, List, Optional, Sequence, Union
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from src.artifacts import get_path_filename_prefix, load_model_artifact
+from src.model_evaluation import AVERAGE_MODES, align_labels, encode_labels
+
+N_RESAMPLES = 2000
+""" Default number of bootstrap resamples. """
+
+CONFIDENCE_LEVEL = 0.95
+""" Default coverage of the confidence intervals. """
+
+CHUNK_RESAMPLES = 50
+""" Number of resamples drawn and scored at once, bounds the memory of a chunk. """
+
+
+def get_batched_contingency(
+    pair_codes: np.ndarray, indices: np.ndarray, n_classes: int
+) -> np.ndarray:
+    """
+    Counts the confusion matrices of resamples with one 'np.bincount'.
+
+    Parameters
+    ----------
+    pair_codes : np.ndarray
+        'true_code * n_classes + pred_code' of each row, see 'encode_labels'.
+    indices : np.ndarray
+        Rows of the resamples, of shape (n_resamples, n_rows).
+    n_classes : int
+        Number of classes of the codes.
+
+    Returns
+    -------
+    np.ndarray
+        Confusion matrices of shape (n_resamples, n_classes, n_classes).
+    """
+    n_cells = n_classes * n_classes
+    offsets = np.arange(len(indices))[:, np.newaxis] * n_cells
+    counts = np.bincount(
+        (pair_codes[indices] + offsets).ravel(), minlength=len(indices) * n_cells
+    )
+    return counts.reshape(len(indices), n_classes, n_classes)
+
+
+def _divide(numerator: np.ndarray, denominator: np.ndarray) -> np.ndarray:
+    """Divides elementwise, ill-defined results are 0 as in scikit-learn."""
+    return np.where(denominator > 0, numerator / np.maximum(denominator, 1), 0.0)
+
+
+def get_batched_scores(
+    contingency: np.ndarray,
+    classes: np.ndarray,
+    labels: Sequence[Union[str, int]],
+    avg_mode: str = "weighted",
+) -> Dict[str, np.ndarray]:
+    """
+    Computes the metrics of 'get_metrics_from_contingency' for a batch of
+    confusion matrices at once.
+
+    Returns
+    -------
+    dict
+        "f1", "recall", "precision" and "bal_accuracy" of shape
+        (n_resamples,), and "per_class", the "precision", "recall" and
+        "f1-score" of the labels of shape (n_resamples, n_labels).
+    """
+    if avg_mode not in AVERAGE_MODES:
+        raise ValueError(
+            f"Unknown avg_mode '{avg_mode}', expected one of {AVERAGE_MODES}."
+        )
+    tp = np.diagonal(contingency, axis1=1, axis2=2)
+    pred_sum = contingency.sum(axis=1)
+    true_sum = contingency.sum(axis=2)
+    scores = {
+        "precision": _divide(tp, pred_sum),
+        "recall": _divide(tp, true_sum),
+        "f1": _divide(2.0 * tp, true_sum + pred_sum),
+    }
+
+    if avg_mode == "micro":
+        totals = [tp.sum(axis=1), pred_sum.sum(axis=1), true_sum.sum(axis=1)]
+        metrics = {
+            "precision": _divide(totals[0], totals[1]),
+            "recall": _divide(totals[0], totals[2]),
+            "f1": _divide(2.0 * totals[0], totals[1] + totals[2]),
+        }
+    elif avg_mode == "binary":
+        # The positive class of 'get_metrics_from_contingency'.
+        i = int(np.searchsorted(classes, labels[-1]))
+        metrics = {name: score[:, i] for name, score in scores.items()}
+    else:
+        # Classes neither true nor predicted in a resample are not averaged.
+        weights = true_sum if avg_mode == "weighted" else (true_sum + pred_sum) > 0
+        metrics = {
+            name: (score * weights).sum(axis=1) / weights.sum(axis=1)
+            for name, score in scores.items()
+        }
+
+    # Classes without true rows are left out of the balanced accuracy.
+    has_true = true_sum > 0
+    metrics["bal_accuracy"] = (scores["recall"] * has_true).sum(axis=1) / has_true.sum(
+        axis=1
+    )
+
+    label_indices = np.searchsorted(classes, np.asarray(labels))
+    metrics["per_class"] = {
+        "precision": scores["precision"][:, label_indices],
+        "recall": scores["recall"][:, label_indices],
+        "f1-score": scores["f1"][:, label_indices],
+    }
+    return metrics
+
+
+def get_resample_counts(indices: np.ndarray, n_rows: int) -> np.ndarray:
+    """
+    Counts how often each row is drawn into each resample, returns an array of
+    shape (n_rows, n_resamples).
+    """
+    n_resamples = len(indices)
+    codes = indices * n_resamples + np.arange(n_resamples)[:, np.newaxis]
+    counts = np.bincount(codes.ravel(), minlength=n_rows * n_resamples)
+    return counts.reshape(n_rows, n_resamples)
+
+
+class _RankedScores:
+    """
+    Order of the predicted probabilities, computed once for all resamples.
+
+    The ROC AUC of positive rows against negative rows is the Mann-Whitney U
+    statistic: the number of pairs of a positive and a negative row in which
+    the positive row has the higher score, ties counting one half, divided by
+    the number of pairs. With the rows sorted by score, the negative rows below
+    each positive row are a cumulative sum of the resample counts of the
+    negative rows.
+
+    Parameters
+    ----------
+    label_codes : np.ndarray
+        Index of the true class of each row into the probability columns, -1
+        for rows of other classes.
+    target_pred_proba : np.ndarray
+        Probabilities of the labels of shape (n_rows, n_labels), or of the
+        positive class 1 of shape (n_rows,).
+    """
+
+    def __init__(self, label_codes: np.ndarray, target_pred_proba: np.ndarray):
+        proba = np.asarray(target_pred_proba, dtype=np.float64)
+        self.n_rows = len(proba)
+        self.n_labels = proba.shape[1] if proba.ndim == 2 else 2
+        if proba.ndim == 1:
+            columns = {1: proba}
+        elif self.n_labels == 2:
+            # The binary ROC AUC of scikit-learn scores the second column.
+            columns = {1: proba[:, 1]}
+        else:
+            columns = {j: proba[:, j] for j in range(self.n_labels)}
+
+        # Maps each label to its rows sorted by its score, and each pair of a
+        # positive and a negative label to the rows of the negative label
+        # sorted by the score of the positive label. The sorted positive rows
+        # are segments of rows with equally many negative rows of a lower,
+        # and of a lower or equal score, given by the start of each segment
+        # and its number of negative rows.
+        self.positive_rows = {}
+        self.pairs = {}
+        for a, column in columns.items():
+            positive_rows = np.flatnonzero(label_codes == a)
+            positive_rows = positive_rows[
+                np.argsort(column[positive_rows], kind="stable")
+            ]
+            self.positive_rows[a] = positive_rows
+            for b in range(self.n_labels):
+                if b == a:
+                    continue
+                negative_rows = np.flatnonzero(label_codes == b)
+                negative_rows = negative_rows[
+                    np.argsort(column[negative_rows], kind="stable")
+                ]
+                segments = []
+                for side in ["left", "right"]:
+                    n_below = np.searchsorted(
+                        column[negative_rows], column[positive_rows], side=side
+                    )
+                    n_below, starts = np.unique(n_below, return_index=True)
+                    segments.append((starts, n_below))
+                self.pairs[a, b] = (negative_rows, segments)
+
+    def _get_batched_binary_auc(
+        self, counts: np.ndarray, positive_counts: np.ndarray, pair: tuple
+    ) -> np.ndarray:
+        """
+        Returns the ROC AUC of the rows of the positive label against the rows
+        of the negative label of 'pair', scored by the probability of the
+        positive label, from the resample counts of all rows and of the sorted
+        positive rows.
+        """
+        negative_rows, segments = self.pairs[pair]
+        # Number of negative rows up to a sorted position, of each resample.
+        negative_cumsum = np.zeros((len(negative_rows) + 1, counts.shape[1]), np.int64)
+        np.cumsum(counts[negative_rows], axis=0, out=negative_cumsum[1:])
+
+        # Twice the number of pairs the positive row wins, so that ties count one.
+        twice_wins = sum(
+            np.einsum(
+                "ij,ij->j",
+                np.add.reduceat(positive_counts, starts, axis=0),
+                negative_cumsum[n_below],
+            )
+            for starts, n_below in segments
+        )
+        n_pairs = positive_counts.sum(axis=0) * negative_cumsum[-1]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return twice_wins / (2 * n_pairs)
+
+    def get_batched_auc(self, indices: np.ndarray) -> np.ndarray:
+        """
+        Returns the ROC AUC of each resample, one-vs-one averaged over the
+        pairs of labels like 'roc_auc_score(multi_class="ovo")' if there are
+        more than two labels. NaN if a label has no rows in a resample.
+        """
+        counts = get_resample_counts(indices, self.n_rows)
+        positive_counts = {
+            a: counts[positive_rows] for a, positive_rows in self.positive_rows.items()
+        }
+        if self.n_labels == 2:
+            return self._get_batched_binary_auc(counts, positive_counts[1], (1, 0))
+
+        pair_aucs = [
+            (
+                self._get_batched_binary_auc(counts, positive_counts[a], (a, b))
+                + self._get_batched_binary_auc(counts, positive_counts[b], (b, a))
+            )
+            / 2
+            for a, b in combinations(range(self.n_labels), 2)
+        ]
+        return np.mean(pair_aucs, axis=0)
+
+
+def _bootstrap_chunk(
+    seed: np.random.SeedSequence,
+    n_resamples: int,
+    pair_codes: np.ndarray,
+    classes: np.ndarray,
+    labels: Sequence[Union[str, int]],
+    avg_mode: str,
+    ranked_scores: Optional[_RankedScores],
+) -> Dict[str, Any]:
+    n_rows = len(pair_codes)
+    indices = np.random.default_rng(seed).integers(0, n_rows, (n_resamples, n_rows))
+    contingency = get_batched_contingency(pair_codes, indices, len(classes))
+    metrics = get_batched_scores(contingency, classes, labels, avg_mode)
+    if ranked_scores is not None:
+        metrics["roc_auc_score"] = ranked_scores.get_batched_auc(indices)
+    return metrics
+
+
+def _get_interval(values: np.ndarray, confidence_level: float) -> Dict[str, float]:
+    alpha = (1.0 - confidence_level) / 2
+    lower, upper = np.nanpercentile(values, [100 * alpha, 100 * (1 - alpha)])
+    return {"lower": float(lower), "upper": float(upper)}
+
+
+def compute_bootstrap_ci(
+    labels: List[Union[str, int]],
+    target_truth: Union[pd.Series, np.ndarray],
+    target_pred: Union[pd.Series, np.ndarray],
+    target_pred_proba: Optional[np.ndarray] = None,
+    avg_mode: str = "weighted",
+    n_resamples: int = N_RESAMPLES,
+    confidence_level: float = CONFIDENCE_LEVEL,
+    n_jobs: Optional[int] = None,
+    random_state: Optional[int] = 0,
+) -> Dict[str, Any]:
+    """
+    Computes bootstrap percentile intervals of the metrics of
+    'evaluate_classifier'.
+
+    Parameters
+    ----------
+    labels, target_truth, target_pred, target_pred_proba, avg_mode
+        As for 'evaluate_classifier'. The columns of a 2-dimensional
+        'target_pred_proba' are the probabilities of 'labels'.
+    n_resamples : int, default=N_RESAMPLES
+        Number of resamples of the rows.
+    confidence_level : float, default=CONFIDENCE_LEVEL
+        Coverage of the intervals.
+    n_jobs : int or None, default=None
+        Number of chunks of 'CHUNK_RESAMPLES' resamples computed in parallel.
+    random_state : int or None, default=0
+        Seed of the resamples.
+
+    Returns
+    -------
+    dict
+        The "n_resamples", "confidence_level" and "random_state", and the
+        "lower" and "upper" bound of "f1", "recall", "precision",
+        "bal_accuracy", "roc_auc_score" if 'target_pred_proba' is given, and of
+        the "precision", "recall" and "f1-score" of each label in
+        "classification_report".
+    """
+    classes, truth_codes, pred_codes = encode_labels(target_truth, target_pred, labels)
+    pair_codes = truth_codes * len(classes) + pred_codes
+
+    ranked_scores = None
+    if target_pred_proba is not None:
+        # Maps the class codes to the indices of the labels, -1 if no label.
+        label_of_class = np.full(len(classes), -1)
+        label_of_class[np.searchsorted(classes, np.asarray(labels))] = np.arange(
+            len(labels)
+        )
+        label_codes = label_of_class[truth_codes]
+        if np.ndim(target_pred_proba) == 1:
+            # The probabilities are of the last label, as in 'evaluate_classifier'.
+            label_codes = (label_codes == len(labels) - 1).astype(int)
+        ranked_scores = _RankedScores(label_codes, target_pred_proba)
+
+    n_chunks = -(-n_resamples // CHUNK_RESAMPLES)
+    seeds = np.random.SeedSequence(random_state).spawn(n_chunks)
+    chunks = joblib.Parallel(n_jobs=n_jobs)(
+        joblib.delayed(_bootstrap_chunk)(
+            seed,
+            min(CHUNK_RESAMPLES, n_resamples - i * CHUNK_RESAMPLES),
+            pair_codes,
+            classes,
+            labels,
+            avg_mode,
+            ranked_scores,
+        )
+        for i, seed in enumerate(seeds)
+    )
+
+    ci: Dict[str, Any] = {
+        "n_resamples": n_resamples,
+        "confidence_level": confidence_level,
+        "random_state": random_state,
+    }
+    for name in ["f1", "recall", "precision", "bal_accuracy", "roc_auc_score"]:
+        if name in chunks[0]:
+            values = np.concatenate([chunk[name] for chunk in chunks])
+            ci[name] = _get_interval(values, confidence_level)
+    ci["classification_report"] = {
+        f"{label}": {
+            name: _get_interval(
+                np.concatenate([chunk["per_class"][name][:, i] for chunk in chunks]),
+                confidence_level,
+            )
+            for name in ["precision", "recall", "f1-score"]
+        }
+        for i, label in enumerate(labels)
+    }
+    return ci
+
+
+def save_bootstrap_ci(
+    model_dir: str,
+    X: pd.DataFrame,
+    y: Union[pd.Series, np.ndarray],
+    n_resamples: int = N_RESAMPLES,
+    confidence_level: float = CONFIDENCE_LEVEL,
+    n_jobs: Optional[int] = None,
+    random_state: Optional[int] = 0,
+) -> Dict[str, Any]:
+    """
+    Scores the rows with the saved model and adds the bootstrap intervals of
+    its metrics as "bootstrap_ci" to its '<model_name>.results.json'.
+
+    Parameters
+    ----------
+    model_dir : str
+        Directory of the model, see 'src/artifacts.py'.
+    X : pd.DataFrame
+        Raw features of the evaluation rows, e.g. of the validation split.
+    y : array-like
+        True labels of the rows, mapped onto the labels the model predicts,
+        see 'align_labels'. E.g. 'pre' is merged into 'dia' for a model of
+        the presence of diabetes, as in its results.
+    n_resamples, confidence_level, n_jobs, random_state
+        See 'compute_bootstrap_ci'.
+
+    Returns
+    -------
+    dict
+        The intervals, see 'compute_bootstrap_ci'.
+
+    Raises
+    ------
+    ValueError
+        If 'y' holds labels the model does not predict, see 'align_labels'.
+    """
+    path_filename_prefix = get_path_filename_prefix(model_dir)
+    with open(f"{path_filename_prefix}.results.json", "r") as f:
+        results = json.load(f)
+    y = align_labels(y, results["predicts"])
+
+    artifact = load_model_artifact(model_dir)
+    features = artifact.preprocessor.transform(X)
+    target_pred = artifact.classifier.predict(features)
+    target_pred_proba = artifact.classifier.predict_proba(features)
+    if artifact.label_encoder is not None:
+        target_pred = artifact.label_encoder.inverse_transform(target_pred)
+
+    results["bootstrap_ci"] = compute_bootstrap_ci(
+        results["predicts"],
+        y,
+        target_pred,
+        target_pred_proba,
+        avg_mode=results.get("avg_mode", "weighted"),
+        n_resamples=n_resamples,
+        confidence_level=confidence_level,
+        n_jobs=n_jobs,
+        random_state=random_state,
+    )
+    with open(f"{path_filename_prefix}.results.json", "w") as f:
+        json.dump(results, f, indent=2)
+    return results["bootstrap_ci"]
@@ -0,0 +1,24 @@
+"""
+Fingerprints of data and preprocessors, the keys of the cached data in
+'CACHE_DIR', e.g. the fold matrices of 'FoldMatrixStore' in
+'src/cross_validation.py'.
+"""
+
+from typing import Any
+
+import joblib
+from sklearn.base import BaseEstimator, clone
+
+
+def fingerprint_data(X: Any) -> str:
+    """Returns a hash of the content of an array, DataFrame or Series."""
+    return joblib.hash(X)
+
+
+def fingerprint_params(transformer: BaseEstimator) -> str:
+    """
+    Returns a hash of the parameters of a transformer, including the
+    parameters of nested estimators and the output configuration of
+    'set_output', but not its fitted state.
+    """
+    return joblib.hash(clone(transformer))
@@ -0,0 +1,338 @@
+"""
+Compiles fitted preprocessors into a fast inference form for single rows.
+
+Transforming one row with a ColumnTransformer of pipelines costs milliseconds
+of pandas and validation overhead, far more than evaluating most models on
+the row. 'compile_preprocessor' reads the fitted state of the steps, e.g. the
+impute values, the categories of the encoders and the thresholds of the
+binning, into plain lookup tables. 'CompiledPreprocessor' applies them to a
+record of one respondent with Python and NumPy operations only.
+
+The output equals the output of the ColumnTransformer, as float64 array.
+Steps without a compiled form raise a 'TypeError' when compiled.
+"""
+
+import warnings
+from bisect import bisect_right
+from typing import Any, Callable, Dict, List, Mapping, Optional, Sequence, Union
+
+import numpy as np
+import pandas as pd
+from sklearn.base import BaseEstimator
+from sklearn.compose import ColumnTransformer
+from sklearn.impute import SimpleImputer
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import OneHotEncoder, OrdinalEncoder, StandardScaler
+
+from src.transformers import (
+    CastTransformer,
+    CategoryFromThresholdTransformer,
+    MissingFlagTransformer,
+    ThresholdOneHotEncoder,
+)
+
+Step = Callable[[List[Any]], List[Any]]
+Record = Union[Mapping[str, Any], Sequence[Any], np.ndarray]
+
+
+def _is_missing(value: Any) -> bool:
+    """Returns whether a scalar is None, NaN or pd.NA."""
+    # NaN is the only value not equal to itself.
+    return value is None or value is pd.NA or value != value
+
+
+def _compile_imputer(imputer: SimpleImputer) -> Step:
+    if imputer.add_indicator or len(imputer.get_feature_names_out()) != len(
+        imputer.statistics_
+    ):
+        raise TypeError("SimpleImputer with indicators or dropped columns.")
+    fill_values = list(imputer.statistics_)
+
+    def impute(values: List[Any]) -> List[Any]:
+        return [
+            fill if _is_missing(value) else value
+            for value, fill in zip(values, fill_values)
+        ]
+
+    return impute
+
+
+def _compile_scaler(scaler: StandardScaler) -> Step:
+    mean, scale = scaler.mean_, scaler.scale_
+
+    def scale_values(values: List[Any]) -> np.ndarray:
+        # The same operations as 'StandardScaler.transform'.
+        X = np.array(values, dtype=np.float64)
+        if mean is not None:
+            X -= mean
+        if scale is not None:
+            X /= scale
+        return X
+
+    return scale_values
+
+
+def _compile_ordinal_encoder(encoder: OrdinalEncoder) -> Step:
+    codes = [
+        {category: float(code) for code, category in enumerate(categories)}
+        for categories in encoder.categories_
+    ]
+    unknown_value = (
+        encoder.unknown_value if encoder.handle_unknown == "use_encoded_value" else None
+    )
+
+    def encode(values: List[Any]) -> List[float]:
+        result = []
+        for value, column_codes in zip(values, codes):
+            code = column_codes.get(value, unknown_value)
+            if code is None:
+                raise ValueError(f"Found unknown category '{value}' during transform.")
+            result.append(code)
+        return result
+
+    return encode
+
+
+def _compile_one_hot_encoder(encoder: OneHotEncoder) -> Step:
+    # The compiled row is dense, a sparse output only differs in its container.
+    if encoder._infrequent_enabled:
+        raise TypeError("OneHotEncoder with infrequent categories.")
+
+    # Maps the categories of each column to their output position.
+    positions: List[Dict[Any, int]] = []
+    n_out = 0
+    for i, categories in enumerate(encoder.categories_):
+        drop_idx = encoder.drop_idx_[i] if encoder.drop_idx_ is not None else None
+        column_positions = {}
+        for j, category in enumerate(categories):
+            if j == drop_idx:
+                continue
+            column_positions[category] = n_out
+            n_out += 1
+        positions.append(column_positions)
+    known = [set(categories) for categories in encoder.categories_]
+    handle_unknown = encoder.handle_unknown
+
+    def encode(values: List[Any]) -> np.ndarray:
+        result = np.zeros(n_out, dtype=np.float64)
+        for i, (value, column_positions) in enumerate(zip(values, positions)):
+            position = column_positions.get(value)
+            if position is not None:
+                result[position] = 1.0
+            elif handle_unknown == "error" and value not in known[i]:
+                raise ValueError(f"Found unknown category '{value}' during transform.")
+        return result
+
+    return encode
+
+
+def _compile_missing_flags(transformer: MissingFlagTransformer) -> Step:
+    flagged = list(transformer.flagged_features_)
+    dtype, packbits = transformer.dtype, transformer.packbits
+
+    def flag(values: List[Any]) -> np.ndarray:
+        flags = np.array([_is_missing(values[i]) for i in flagged], dtype=dtype)
+        return np.packbits(flags) if packbits else flags
+
+    return flag
+
+
+def _compile_cast(transformer: CastTransformer) -> Step:
+    dtype = transformer.dtype
+
+    def cast(values: List[Any]) -> np.ndarray:
+        return np.asarray(values, dtype=dtype)
+
+    return cast
+
+
+def _compile_threshold_encoder(transformer: CategoryFromThresholdTransformer) -> Step:
+    thresholds = [list(th) for th in transformer.thresholds]
+
+    if isinstance(transformer, ThresholdOneHotEncoder):
+        n_dropped = 1 if transformer.drop == "first" else 0
+        offsets = list(transformer.offsets_)
+
+        def encode(values: List[Any]) -> np.ndarray:
+            result = np.zeros(offsets[-1], dtype=np.uint8)
+            for i, (value, th) in enumerate(zip(values, thresholds)):
+                if _is_missing(value):
+                    continue
+                # bisect_right equals np.searchsorted(side="right").
+                bin_ = bisect_right(th, float(value)) - n_dropped
+                if bin_ >= 0:
+                    result[offsets[i] + bin_] = 1
+            return result
+
+        return encode
+
+    if transformer.output != "codes":
+        raise TypeError("CategoryFromThresholdTransformer with output='labels'.")
+
+    def bin_codes(values: List[Any]) -> np.ndarray:
+        return np.array(
+            [
+                -1 if _is_missing(value) else bisect_right(th, float(value))
+                for value, th in zip(values, thresholds)
+            ],
+            dtype=np.int8,
+        )
+
+    return bin_codes
+
+
+def _passthrough(values: List[Any]) -> List[Any]:
+    return values
+
+
+STEP_COMPILERS: Dict[type, Callable[[Any], Step]] = {
+    SimpleImputer: _compile_imputer,
+    StandardScaler: _compile_scaler,
+    OrdinalEncoder: _compile_ordinal_encoder,
+    OneHotEncoder: _compile_one_hot_encoder,
+    MissingFlagTransformer: _compile_missing_flags,
+    CastTransformer: _compile_cast,
+    CategoryFromThresholdTransformer: _compile_threshold_encoder,
+    ThresholdOneHotEncoder: _compile_threshold_encoder,
+}
+""" Compiles the fitted state of a transformer type into a function of one row. """
+
+
+def _compile_transformer(transformer: Any) -> List[Step]:
+    if transformer == "passthrough":
+        return [_passthrough]
+    steps = (
+        [step for _, step in transformer.steps]
+        if isinstance(transformer, Pipeline)
+        else [transformer]
+    )
+    compiled = []
+    for step in steps:
+        if step is None or step == "passthrough":
+            continue
+        if type(step) not in STEP_COMPILERS:
+            raise TypeError(
+                f"'{type(step).__name__}' has no compiled form, supported are"
+                f" {[t.__name__ for t in STEP_COMPILERS]}."
+            )
+        compiled.append(STEP_COMPILERS[type(step)](step))
+    return compiled
+
+
+class CompiledPreprocessor:
+    """
+    Fast single-row form of a fitted ColumnTransformer, see
+    'compile_preprocessor'.
+
+    Attributes
+    ----------
+    feature_names_in_ : list of str
+        Input columns, the order of records given as sequences.
+    n_features_out_ : int
+        Number of output columns.
+    """
+
+    def __init__(self, preprocessor: ColumnTransformer):
+        self.feature_names_in_ = list(preprocessor.feature_names_in_)
+        positions = {name: i for i, name in enumerate(self.feature_names_in_)}
+
+        self._blocks = []
+        for name, transformer, columns in preprocessor.transformers_:
+            output = preprocessor.output_indices_[name]
+            if transformer == "drop" or output.stop == output.start:
+                continue
+            if isinstance(columns, slice) or np.asarray(columns).dtype.kind in "iub":
+                columns = np.asarray(self.feature_names_in_)[columns]
+            self._blocks.append(
+                (
+                    [positions[c] for c in columns],
+                    _compile_transformer(transformer),
+                    output,
+                )
+            )
+        self.n_features_out_ = max(output.stop for _, _, output in self._blocks)
+
+    def transform_record(self, record: Record) -> np.ndarray:
+        """
+        Transforms the record of one respondent.
+
+        Parameters
+        ----------
+        record : mapping or sequence
+            Values of the input columns by name, missing names are missing
+            values, or in the order of 'feature_names_in_'.
+
+        Returns
+        -------
+        np.ndarray
+            Transformed row of shape (n_features_out_,).
+        """
+        if isinstance(record, Mapping):
+            values = [record.get(name) for name in self.feature_names_in_]
+        else:
+            values = list(record)
+
+        row = np.empty(self.n_features_out_, dtype=np.float64)
+        for positions, steps, output in self._blocks:
+            block = [values[i] for i in positions]
+            for step in steps:
+                block = step(block)
+            row[output] = block
+        return row
+
+    def transform(self, records: Sequence[Record]) -> np.ndarray:
+        """Transforms several records row by row, returns an array of rows."""
+        return np.vstack([self.transform_record(record) for record in records])
+
+
+def compile_preprocessor(preprocessor: ColumnTransformer) -> CompiledPreprocessor:
+    """
+    Compiles a fitted ColumnTransformer, e.g. of 'build_preprocessor', into a
+    'CompiledPreprocessor'.
+
+    Raises
+    ------
+    TypeError
+        If a step has no compiled form, see 'STEP_COMPILERS'.
+    """
+    return CompiledPreprocessor(preprocessor)
+
+
+class CompiledModel:
+    """
+    Predicts single records with a compiled preprocessor and the classifier.
+
+    Parameters
+    ----------
+    preprocessor : ColumnTransformer
+        Fitted preprocessor, compiled with 'compile_preprocessor'.
+    classifier : BaseEstimator
+        Fitted classifier of the preprocessed rows.
+    label_encoder : BaseEstimator or None, default=None
+        Fitted label encoder, decodes the predicted classes.
+    """
+
+    def __init__(
+        self,
+        preprocessor: ColumnTransformer,
+        classifier: BaseEstimator,
+        label_encoder: Optional[BaseEstimator] = None,
+    ):
+        self.preprocessor = compile_preprocessor(preprocessor)
+        self.classifier = classifier
+        classes = classifier.classes_
+        if label_encoder is not None:
+            classes = label_encoder.inverse_transform(classes)
+        self.classes_ = classes
+
+    def predict_proba_record(self, record: Record) -> np.ndarray:
+        """Returns the class probabilities of one record."""
+        row = self.preprocessor.transform_record(record)[np.newaxis, :]
+        with warnings.catch_warnings():
+            # Classifiers fitted on DataFrames warn about the missing names.
+            warnings.filterwarnings("ignore", message="X does not have valid feature")
+            return self.classifier.predict_proba(row)[0]
+
+    def predict_record(self, record: Record) -> Any:
+        """Returns the decoded class of one record."""
+        return self.classes_[np.argmax(self.predict_proba_record(record))]
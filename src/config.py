@@ -36,18 +36,28 @@ DATA_ORIG_DIR = os.path.join(DATA_DIR, "orig")
 DATA_SKRIPTS_DIR = os.path.join(DATA_DIR, "scripts")
 """ Directory for scripts related to data processing and transformation. """
 DATA_SPLIT_DIR = os.path.join(DATA_DIR, "split")
-""" Directory for split data files, such as training, test and validation sets. """
+""" Directory for the row indices of the training, test and validation sets. """
 
 DATA_ORIG_FILENAME = "2015.csv"
 """ Name of the original data file downloaded from Kaggle. """
-DATA_RAW_FILENAME = "brfss_2015_transformed.csv"
-""" Name of the raw data file after transformation. """
-TRAIN_RAW_FILENAME = "train_raw_split.csv"
-""" Name of the training data file after splitting. """
-TEST_RAW_FILENAME = "test_raw_split.csv"
-""" Name of the test data file after splitting. """
-VALIDATION_RAW_FILENAME = "validation_raw_split.csv"
-""" Name of the validation data file after splitting. """
+DATA_RAW_FILENAME = "brfss_2015_transformed"
+""" Name of the raw data file after transformation, without extension. """
+TRAIN_RAW_FILENAME = "train_raw_split"
+""" Name of the training split, without extension. """
+TEST_RAW_FILENAME = "test_raw_split"
+""" Name of the test split, without extension. """
+VALIDATION_RAW_FILENAME = "validation_raw_split"
+""" Name of the validation split, without extension. """
+SPLIT_MANIFEST_FILENAME = "splits.json"
+""" Name of the file describing the splits and the raw data they index. """
+
+DATA_STORAGE_FORMAT = "parquet"
+"""
+Storage format of the raw data file, one of 'csv', 'parquet' and
+'feather'. 'parquet' stores categorical columns dictionary-encoded and
+compressed, 'feather' stores them uncompressed for memory-mapped reads.
+See 'src/datasets.py'.
+"""
 
 
 MODELS_DIR = os.path.join(BASE_DIR, "models")
@@ -56,6 +66,9 @@ MODELS_DIR = os.path.join(BASE_DIR, "models")
 STUDY_DIR = os.path.join(BASE_DIR, "studies")
 """ Directory for optuna studies and related files. """
 
+CACHE_DIR = os.path.join(BASE_DIR, "cache")
+""" Directory for cached preprocessed folds and neighbors, keyed by 'src/cache.py'. """
+
 MODEL_ALIASES = {
     "HistGradientBoostingClassifier": "hgb",
     "RandomForestClassifier": "rf",
@@ -0,0 +1,550 @@
+"""
+Cross-validates the trials of hyperparameter studies on precomputed folds.
+
+'FoldMatrixStore' splits the training data into folds once and preprocesses
+each fold once per set of preprocessor parameters. The fold matrices are
+stored as '.npy' files and passed memory-mapped to the joblib workers, which
+read them without copying instead of receiving a pickled copy of the raw
+DataFrame for every trial and fold. Sparse matrices, e.g. of
+'build_preprocessor(sparse_output=True)', are stored as their CSR arrays.
+
+The stored preprocessors are bounded by count and by size on disk, the least
+recently used are removed first. Optionally the fold matrices of the most
+recently used preprocessors are also kept loaded in memory, bounded by size.
+
+Several processes, e.g. the workers of a study, can share a store. Each
+preprocessor has a lock file next to its directory, which is locked shared
+while its fold matrices are built, loaded and evaluated. The eviction only
+removes preprocessors it can lock exclusively. Without 'fcntl', e.g. on
+Windows, preprocessors used within the last 'EVICTION_GRACE_SECONDS' are kept
+instead.
+"""
+
+import contextlib
+import os
+import shutil
+import time
+import warnings
+from collections import OrderedDict
+from typing import Any, Callable, Iterator, List, Optional, Tuple, Union
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+import joblib
+import numpy as np
+import scipy.sparse as sp
+from sklearn.base import BaseEstimator, clone
+from sklearn.exceptions import FitFailedWarning
+from sklearn.metrics import check_scoring
+from sklearn.model_selection import StratifiedKFold, check_cv
+from sklearn.pipeline import Pipeline
+
+from src.cache import fingerprint_data, fingerprint_params
+from src.config import CACHE_DIR
+
+CSR_ARRAYS = ("data", "indices", "indptr")
+""" Arrays of a CSR matrix stored as '.npy' files in its '.csr' directory. """
+
+EVICTION_GRACE_SECONDS = 600
+""" Age in seconds below which preprocessors are not evicted without 'fcntl'. """
+
+
+def _save_array(path: str, X: Any, dtype: Optional[np.dtype]) -> None:
+    """
+    Saves data as '<path>.npy' file, or a sparse matrix as CSR arrays in the
+    directory '<path>.csr', written to a temporary path first.
+    """
+    if not sp.issparse(X):
+        tmp_path = f"{path}.npy.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.save(f, np.asarray(X, dtype=dtype))
+        os.replace(tmp_path, f"{path}.npy")
+        return
+
+    X = sp.csr_matrix(X, dtype=dtype)
+    tmp_path = f"{path}.csr.{os.getpid()}.tmp"
+    os.makedirs(tmp_path, exist_ok=True)
+    for name in CSR_ARRAYS:
+        np.save(os.path.join(tmp_path, f"{name}.npy"), getattr(X, name))
+    np.save(os.path.join(tmp_path, "shape.npy"), np.array(X.shape))
+    try:
+        os.replace(tmp_path, f"{path}.csr")
+    except OSError:
+        # Another process stored the same matrix first.
+        if not os.path.isdir(f"{path}.csr"):
+            raise
+        shutil.rmtree(tmp_path, ignore_errors=True)
+
+
+def _array_exists(path: str) -> bool:
+    return os.path.exists(f"{path}.npy") or os.path.isdir(f"{path}.csr")
+
+
+def _load_array(path: str) -> Union[np.ndarray, sp.csr_matrix]:
+    """Loads the data saved by '_save_array' memory-mapped."""
+    if not os.path.isdir(f"{path}.csr"):
+        return np.load(f"{path}.npy", mmap_mode="r")
+    data, indices, indptr = (
+        np.load(os.path.join(f"{path}.csr", f"{name}.npy"), mmap_mode="r")
+        for name in CSR_ARRAYS
+    )
+    shape = tuple(np.load(os.path.join(f"{path}.csr", "shape.npy")))
+    return sp.csr_matrix((data, indices, indptr), shape=shape, copy=False)
+
+
+def _get_nbytes(X: Union[np.ndarray, sp.csr_matrix]) -> int:
+    """Returns the memory size of a matrix, of its arrays if sparse."""
+    if sp.issparse(X):
+        return sum(getattr(X, name).nbytes for name in CSR_ARRAYS)
+    return X.nbytes
+
+
+def _get_dir_size(path: str) -> int:
+    """Returns the total size of the files in a directory tree."""
+    size = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                size += os.path.getsize(os.path.join(root, name))
+            except FileNotFoundError:
+                pass
+    return size
+
+
+def _take_rows(X: Any, rows: np.ndarray) -> Any:
+    """Returns the rows at the positions of a DataFrame or an array."""
+    return X.iloc[rows] if hasattr(X, "iloc") else X[rows]
+
+
+def _preprocess_fold(
+    preprocessor: BaseEstimator,
+    X: Any,
+    y: np.ndarray,
+    train: np.ndarray,
+    test: np.ndarray,
+    paths: Tuple[str, str],
+    dtype: Optional[np.dtype],
+) -> None:
+    """Fits a clone of the preprocessor on a fold and saves both matrices."""
+    preprocessor = clone(preprocessor)
+    X_train = preprocessor.fit_transform(_take_rows(X, train), y[train])
+    _save_array(paths[0], X_train, dtype)
+    del X_train
+    _save_array(paths[1], preprocessor.transform(_take_rows(X, test)), dtype)
+
+
+def _fit_and_score(
+    estimator: BaseEstimator,
+    X_train: np.ndarray,
+    X_test: np.ndarray,
+    y_train: np.ndarray,
+    y_test: np.ndarray,
+    scorer: Callable,
+    error_score: Union[float, str],
+    train_rows: Optional[np.ndarray] = None,
+    test_rows: Optional[np.ndarray] = None,
+) -> float:
+    """
+    Fits an estimator on the training matrix of a fold and scores it on the
+    test matrix. With 'train_rows' and 'test_rows' the rows of the fold are
+    taken of the matrices, e.g. of the whole data.
+    """
+    if train_rows is not None:
+        X_train = X_train[train_rows]
+    if test_rows is not None:
+        X_test = X_test[test_rows]
+    try:
+        estimator.fit(X_train, y_train)
+        return scorer(estimator, X_test, y_test)
+    except Exception as e:
+        if error_score == "raise":
+            raise
+        warnings.warn(
+            f"Fitting failed, the score of the fold is set to {error_score}: {e!r}",
+            FitFailedWarning,
+        )
+        return error_score
+
+
+class FoldMatrixStore:
+    """
+    Folds of training data with their preprocessed matrices stored as
+    memory-mapped '.npy' files, the arrays of sparse matrices as CSR.
+
+    Parameters
+    ----------
+    X : pd.DataFrame or np.ndarray
+        Training features, as passed to 'cross_val_score'.
+    y : array-like
+        Training target.
+    cv : int, cross-validation generator, iterable or None, default=None
+        Folds as for 'cross_val_score'. None uses
+        'StratifiedKFold(n_splits=5, shuffle=True, random_state=42)' of the
+        notebooks. The folds are split once on construction.
+    store_dir : str or None, default=None
+        Directory of the fold matrices. None uses 'CACHE_DIR/folds'. A
+        directory in '/dev/shm' keeps them in shared memory.
+    max_preprocessors : int, default=8
+        Maximum number of preprocessor parameter sets whose fold matrices are
+        kept. The least recently used are removed first.
+    dtype : np.dtype or None, default=np.float64
+        Dtype of the stored matrices. None keeps the dtype of the
+        preprocessed matrices, e.g. of 'build_preprocessor(dtype_policy=...)'.
+    max_bytes : int or None, default=None
+        Maximum total size in bytes of the stored fold matrices. The least
+        recently used preprocessors are removed first, the fold matrices of
+        the current one are kept even if they exceed it. None disables the
+        bound.
+    memory_bytes : int, default=0
+        Maximum total size in bytes of the fold matrices kept loaded in memory
+        by this instance, of the most recently used preprocessors. They are
+        returned without reading the files again. 0 keeps none, the matrices
+        are memory-mapped only.
+
+    Attributes
+    ----------
+    folds_ : list of tuple of (np.ndarray, np.ndarray)
+        Train and test row positions of the folds.
+
+    Examples
+    --------
+    >>> fold_store = FoldMatrixStore(features_train_raw, target_train_enc)
+    >>> scores = fold_store.cross_val_score(
+    ...     Pipeline([("preprocessor", preprocessor), ("clf", classifier)]),
+    ...     scoring="f1_macro",
+    ...     n_jobs=-1,
+    ... )
+    """
+
+    def __init__(
+        self,
+        X: Any,
+        y: Any,
+        cv: Union[int, Any, None] = None,
+        store_dir: Optional[str] = None,
+        max_preprocessors: int = 8,
+        dtype: Optional[np.dtype] = np.float64,
+        max_bytes: Optional[int] = None,
+        memory_bytes: int = 0,
+    ):
+        if cv is None:
+            cv = StratifiedKFold(n_splits=5, shuffle=True, random_state=42)
+        self.X = X
+        self.y = np.asarray(y)
+        self.folds_: List[Tuple[np.ndarray, np.ndarray]] = list(
+            check_cv(cv, self.y, classifier=True).split(X, self.y)
+        )
+        self.max_preprocessors = max_preprocessors
+        self.dtype = None if dtype is None else np.dtype(dtype)
+        self.max_bytes = max_bytes
+        self.memory_bytes = memory_bytes
+        self._train_quantiles: Optional[List[np.ndarray]] = None
+        # Maps preprocessor keys to their loaded fold matrices and their size.
+        self._memory: "OrderedDict[str, Tuple[list, int]]" = OrderedDict()
+        self._memory_nbytes = 0
+
+        data_key = joblib.hash(
+            (fingerprint_data(X), fingerprint_data(self.y), self.folds_, self.dtype)
+        )
+        self.store_dir = os.path.join(
+            store_dir if store_dir is not None else os.path.join(CACHE_DIR, "folds"),
+            data_key,
+        )
+        os.makedirs(self.store_dir, exist_ok=True)
+
+    @property
+    def n_splits(self) -> int:
+        """Number of folds."""
+        return len(self.folds_)
+
+    def _get_paths(self, key: str, fold: int) -> Tuple[str, str]:
+        directory = os.path.join(self.store_dir, key)
+        return (
+            os.path.join(directory, f"fold{fold}_train"),
+            os.path.join(directory, f"fold{fold}_test"),
+        )
+
+    @contextlib.contextmanager
+    def _lock_key(self, key: str, shared: bool = True) -> Iterator[bool]:
+        """
+        Locks the fold matrices of a preprocessor for the duration of the
+        context, shared while they are used or exclusively to remove them.
+        Yields whether the lock was acquired, an exclusive lock is not waited
+        for. Without 'fcntl' only shared locks are acquired.
+        """
+        if fcntl is None:
+            yield shared
+            return
+        with open(os.path.join(self.store_dir, f"{key}.lock"), "a") as f:
+            try:
+                fcntl.flock(
+                    f, fcntl.LOCK_SH if shared else fcntl.LOCK_EX | fcntl.LOCK_NB
+                )
+            except BlockingIOError:
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _evict(self, keep: str) -> None:
+        entries = sorted(
+            (entry.stat().st_mtime_ns, entry.path)
+            for entry in os.scandir(self.store_dir)
+            # The '.csr' directory of a sparse 'X' is kept with the store.
+            if entry.is_dir()
+            and entry.name != keep
+            and not entry.name.startswith("data.")
+        )
+        if fcntl is None:
+            min_mtime_ns = time.time_ns() - EVICTION_GRACE_SECONDS * 10**9
+            entries = [entry for entry in entries if entry[0] < min_mtime_ns]
+        n_stored = len(entries) + 1
+        if self.max_bytes is not None:
+            sizes = [_get_dir_size(path) for _, path in entries]
+            total = sum(sizes) + _get_dir_size(os.path.join(self.store_dir, keep))
+        for i, (_, path) in enumerate(entries):
+            if n_stored <= self.max_preprocessors and (
+                self.max_bytes is None or total <= self.max_bytes
+            ):
+                break
+            # Preprocessors in use by other processes are skipped.
+            with self._lock_key(os.path.basename(path), shared=False) as locked:
+                if not locked:
+                    continue
+                shutil.rmtree(path, ignore_errors=True)
+            n_stored -= 1
+            if self.max_bytes is not None:
+                total -= sizes[i]
+
+    def _put_in_memory(self, key: str, fold_matrices: list) -> list:
+        """
+        Keeps copies of memory-mapped fold matrices loaded in memory, if they
+        fit into 'memory_bytes', and returns the matrices to use.
+        """
+        nbytes = sum(_get_nbytes(X) for matrices in fold_matrices for X in matrices)
+        if nbytes > self.memory_bytes:
+            return fold_matrices
+
+        fold_matrices = [
+            tuple(X.copy() if sp.issparse(X) else np.array(X) for X in matrices)
+            for matrices in fold_matrices
+        ]
+        self._memory[key] = (fold_matrices, nbytes)
+        self._memory_nbytes += nbytes
+        while self._memory_nbytes > self.memory_bytes:
+            self._memory_nbytes -= self._memory.popitem(last=False)[1][1]
+        return fold_matrices
+
+    def get_fold_matrices(
+        self, preprocessor: Optional[BaseEstimator] = None, n_jobs: Optional[int] = None
+    ) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Returns the memory-mapped training and test matrices of the folds,
+        preprocessing the folds not stored yet.
+
+        Parameters
+        ----------
+        preprocessor : BaseEstimator or None, default=None
+            Transformer fitted on the training rows of each fold. None stores
+            'X' once and returns the rows of the folds as copies.
+        n_jobs : int or None, default=None
+            Number of folds preprocessed in parallel.
+
+        Returns
+        -------
+        list of tuple of (np.ndarray, np.ndarray)
+            Training and test matrix of each fold, CSR matrices if the
+            preprocessor's output is sparse.
+        """
+        if preprocessor is None:
+            X = self._get_data_matrix()
+            return [(X[train], X[test]) for train, test in self.folds_]
+
+        key = fingerprint_params(preprocessor)
+        if key in self._memory:
+            self._memory.move_to_end(key)
+            return self._memory[key][0]
+
+        with self._lock_key(key):
+            os.makedirs(os.path.join(self.store_dir, key), exist_ok=True)
+            missing = [
+                fold
+                for fold in range(self.n_splits)
+                if not all(_array_exists(p) for p in self._get_paths(key, fold))
+            ]
+            if missing:
+                joblib.Parallel(n_jobs=n_jobs)(
+                    joblib.delayed(_preprocess_fold)(
+                        preprocessor,
+                        self.X,
+                        self.y,
+                        *self.folds_[fold],
+                        self._get_paths(key, fold),
+                        self.dtype,
+                    )
+                    for fold in missing
+                )
+            # The modification time orders the preprocessors for the eviction.
+            os.utime(os.path.join(self.store_dir, key))
+            self._evict(keep=key)
+
+            fold_matrices = [
+                tuple(_load_array(path) for path in self._get_paths(key, fold))
+                for fold in range(self.n_splits)
+            ]
+            return self._put_in_memory(key, fold_matrices)
+
+    def get_train_subsample(self, fold: int, fraction: float) -> np.ndarray:
+        """
+        Returns a stratified subsample of the training rows of a fold.
+
+        The rows of each class are taken in a random order fixed per fold, so
+        that the subsample of a smaller fraction is part of the subsample of
+        a larger one. Each class keeps at least one row.
+
+        Parameters
+        ----------
+        fold : int
+            Index of the fold.
+        fraction : float
+            Fraction of the training rows of each class, in (0, 1].
+
+        Returns
+        -------
+        np.ndarray
+            Sorted positions in the training rows of the fold.
+        """
+        if self._train_quantiles is None:
+            rng = np.random.default_rng(0)
+            self._train_quantiles = []
+            for train, _ in self.folds_:
+                _, codes = np.unique(self.y[train], return_inverse=True)
+                order = rng.permutation(len(train))
+                counts = np.bincount(codes)
+                by_class = order[np.argsort(codes[order], kind="stable")]
+                starts = np.cumsum(counts) - counts
+                rank = np.empty(len(train))
+                rank[by_class] = np.arange(len(train)) - np.repeat(starts, counts)
+                self._train_quantiles.append(rank / counts[codes])
+        return np.flatnonzero(self._train_quantiles[fold] < fraction)
+
+    def _get_data_matrix(self) -> np.ndarray:
+        path = os.path.join(self.store_dir, "data")
+        if not _array_exists(path):
+            _save_array(path, self.X, self.dtype)
+        return _load_array(path)
+
+    def iter_scores(
+        self,
+        estimator: BaseEstimator,
+        scoring: Union[str, Callable, None] = None,
+        n_jobs: Optional[int] = None,
+        n_preprocessing_steps: int = 1,
+        error_score: Union[float, str] = np.nan,
+        train_fraction: float = 1.0,
+    ) -> Iterator[float]:
+        """
+        Evaluates an estimator on the stored folds and yields the score of
+        each fold in fold order as soon as it is available.
+
+        The folds are evaluated in parallel. Closing the generator early, e.g.
+        when a trial is pruned, cancels the folds not started yet. The fold
+        matrices are locked against the eviction by other processes until the
+        generator is exhausted or closed. See 'cross_val_score' for the
+        parameters.
+        """
+        scorer = check_scoring(estimator, scoring=scoring)
+        subsamples = [None] * self.n_splits
+        if train_fraction < 1:
+            subsamples = [
+                self.get_train_subsample(fold, train_fraction)
+                for fold in range(self.n_splits)
+            ]
+
+        with contextlib.ExitStack() as stack:
+            tasks = []
+            if isinstance(estimator, Pipeline):
+                preprocessor = estimator[:n_preprocessing_steps]
+                # The workers open the memory-mapped files by their paths.
+                stack.enter_context(self._lock_key(fingerprint_params(preprocessor)))
+                fold_matrices = self.get_fold_matrices(preprocessor, n_jobs=n_jobs)
+                estimator = estimator[n_preprocessing_steps:]
+                for (X_train, X_test), (train, test), sub in zip(
+                    fold_matrices, self.folds_, subsamples
+                ):
+                    y_train = self.y[train] if sub is None else self.y[train[sub]]
+                    tasks.append((X_train, X_test, y_train, self.y[test], sub, None))
+            else:
+                X = self._get_data_matrix()
+                for (train, test), sub in zip(self.folds_, subsamples):
+                    if sub is not None:
+                        train = train[sub]
+                    tasks.append((X, X, self.y[train], self.y[test], train, test))
+
+            yield from joblib.Parallel(n_jobs=n_jobs, return_as="generator")(
+                joblib.delayed(_fit_and_score)(
+                    clone(estimator),
+                    X_train,
+                    X_test,
+                    y_train,
+                    y_test,
+                    scorer,
+                    error_score,
+                    train_rows,
+                    test_rows,
+                )
+                for X_train, X_test, y_train, y_test, train_rows, test_rows in tasks
+            )
+
+    def cross_val_score(
+        self,
+        estimator: BaseEstimator,
+        scoring: Union[str, Callable, None] = None,
+        n_jobs: Optional[int] = None,
+        n_preprocessing_steps: int = 1,
+        error_score: Union[float, str] = np.nan,
+        train_fraction: float = 1.0,
+    ) -> np.ndarray:
+        """
+        Evaluates an estimator on the stored folds, like
+        'sklearn.model_selection.cross_val_score' with the 'X', 'y' and 'cv'
+        of the store.
+
+        Parameters
+        ----------
+        estimator : BaseEstimator
+            Estimator to evaluate. If it is a Pipeline, its first
+            'n_preprocessing_steps' steps are the preprocessor of the stored
+            fold matrices and the remaining steps are fitted on them as numpy
+            arrays. Other estimators are fitted on the rows of 'X'.
+        scoring : str, callable or None, default=None
+            Scorer as for 'cross_val_score'.
+        n_jobs : int or None, default=None
+            Number of folds evaluated in parallel.
+        n_preprocessing_steps : int, default=1
+            Number of leading pipeline steps of the preprocessor.
+        error_score : float or "raise", default=np.nan
+            Score of folds whose fit fails, "raise" raises the error.
+        train_fraction : float, default=1.0
+            Fraction of the training rows of each fold the estimator is fitted
+            on, see 'get_train_subsample'. The test rows are all scored.
+
+        Returns
+        -------
+        np.ndarray
+            Score of each fold.
+        """
+        scores = self.iter_scores(
+            estimator,
+            scoring,
+            n_jobs,
+            n_preprocessing_steps,
+            error_score,
+            train_fraction,
+        )
+        return np.asarray(list(scores), dtype=float)
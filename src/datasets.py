@@ -0,0 +1,216 @@
+"""
+Reads and writes the raw and split data files in the storage format selected
+by 'DATA_STORAGE_FORMAT' in 'src/config.py'.
+
+Columns are loaded with the dtypes of the schema in 'src/schema.py', i.e.
+categorical columns as pandas categoricals instead of object strings.
+"""
+
+import os
+from typing import Optional, Sequence
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+import pyarrow.parquet as pq
+
+from src.config import DATA_STORAGE_FORMAT
+from src.schema import COLUMNS
+
+STORAGE_EXTENSIONS = {"csv": ".csv", "parquet": ".parquet", "feather": ".feather"}
+""" File extensions of the supported storage formats. """
+
+DTYPES = {
+    spec.name: (
+        pd.CategoricalDtype(spec.categories)
+        if spec.kind != "numeric"
+        else "float64" if spec.divisor is not None else "float32"
+    )
+    for spec in COLUMNS
+}
+""" Pandas dtypes of the columns of the raw data, as decoded by 'decode_frame'. """
+
+LABEL_COLS = [spec.name for spec in COLUMNS if spec.kind == "target"]
+"""
+Columns loaded as plain labels instead of categoricals, so that merging classes
+with 'replace' and counting them with 'value_counts' behave as for strings.
+"""
+
+
+def get_dataset_path(
+    directory: str, filename: str, storage_format: Optional[str] = None
+) -> str:
+    """
+    Returns the path of a data file in the given storage format.
+
+    Parameters
+    ----------
+    directory : str
+        Directory of the data file.
+    filename : str
+        Name of the data file without extension, e.g. 'TRAIN_RAW_FILENAME'.
+    storage_format : str or None, default=None
+        One of 'csv', 'parquet' and 'feather'. None uses 'DATA_STORAGE_FORMAT'.
+
+    Returns
+    -------
+    str
+        Path of the data file including the extension of the storage format.
+    """
+    storage_format = storage_format or DATA_STORAGE_FORMAT
+    if storage_format not in STORAGE_EXTENSIONS:
+        raise ValueError(
+            f"Unknown storage format '{storage_format}',"
+            f" expected one of {list(STORAGE_EXTENSIONS)}."
+        )
+    return os.path.join(directory, filename + STORAGE_EXTENSIONS[storage_format])
+
+
+def load_dataset(
+    directory: str,
+    filename: str,
+    columns: Optional[Sequence[str]] = None,
+    storage_format: Optional[str] = None,
+    rows: Optional[np.ndarray] = None,
+) -> pd.DataFrame:
+    """
+    Loads a data file written by 'save_dataset' or 'DatasetWriter'.
+
+    Parameters
+    ----------
+    directory : str
+        Directory of the data file.
+    filename : str
+        Name of the data file without extension, e.g. 'TRAIN_RAW_FILENAME'.
+    columns : sequence of str or None, default=None
+        Columns to load, None loads all. Only these columns are read from disk.
+    storage_format : str or None, default=None
+        One of 'csv', 'parquet' and 'feather'. None uses 'DATA_STORAGE_FORMAT'.
+    rows : np.ndarray or None, default=None
+        Row positions to load in this order, None loads all. For 'feather' the
+        rows are taken from the memory-mapped file, so only they are
+        materialized.
+
+    Returns
+    -------
+    pd.DataFrame
+        Data with categorical feature columns as pandas categoricals and the
+        target column as plain labels.
+    """
+    storage_format = storage_format or DATA_STORAGE_FORMAT
+    path = get_dataset_path(directory, filename, storage_format)
+    columns = list(columns) if columns is not None else None
+
+    if storage_format == "feather":
+        # Memory-mapping reads the uncompressed buffers without copying them
+        # into the heap before the conversion to pandas.
+        table = feather.read_table(path, columns=columns, memory_map=True)
+        if rows is not None:
+            table = table.take(np.asarray(rows))
+        df = table.to_pandas()
+    else:
+        if storage_format == "csv":
+            df = pd.read_csv(path, usecols=columns, dtype=DTYPES)
+        else:
+            df = pd.read_parquet(path, columns=columns)
+        if rows is not None:
+            df = df.iloc[rows].reset_index(drop=True)
+
+    for col in LABEL_COLS:
+        if col in df.columns:
+            df[col] = df[col].astype(object)
+    return df
+
+
+class DatasetWriter:
+    """
+    Writes a data file incrementally, one DataFrame chunk at a time.
+
+    The chunks must have the same columns and dtypes. The file is written to a
+    temporary path first and renamed when the writer is closed without error.
+
+    Examples
+    --------
+    >>> with DatasetWriter(DATA_RAW_DIR, DATA_RAW_FILENAME) as writer:
+    ...     for chunk in chunks:
+    ...         writer.write(chunk)
+    """
+
+    def __init__(
+        self, directory: str, filename: str, storage_format: Optional[str] = None
+    ):
+        self.storage_format = storage_format or DATA_STORAGE_FORMAT
+        self.path = get_dataset_path(directory, filename, self.storage_format)
+        self.tmp_path = f"{self.path}.tmp"
+        self.n_rows = 0
+        self._writer = None
+
+    def write(self, df: pd.DataFrame) -> None:
+        """Appends a chunk to the data file."""
+        if self.storage_format == "csv":
+            df.to_csv(
+                self.tmp_path,
+                mode="a" if self.n_rows else "w",
+                header=not self.n_rows,
+                index=False,
+            )
+        else:
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            if self._writer is None:
+                if self.storage_format == "parquet":
+                    self._writer = pq.ParquetWriter(self.tmp_path, table.schema)
+                else:
+                    self._writer = pa.ipc.new_file(self.tmp_path, table.schema)
+            self._writer.write_table(table)
+        self.n_rows += len(df)
+
+    def close(self) -> None:
+        """Finishes the data file and moves it to its final path."""
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        os.replace(self.tmp_path, self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            if self._writer is not None:
+                self._writer.close()
+            if os.path.exists(self.tmp_path):
+                os.remove(self.tmp_path)
+
+
+def save_dataset(
+    df: pd.DataFrame,
+    directory: str,
+    filename: str,
+    storage_format: Optional[str] = None,
+) -> str:
+    """
+    Saves a DataFrame as data file with the dtypes of the schema.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        Data to save, columns of the schema are converted to its dtypes.
+    directory : str
+        Directory of the data file.
+    filename : str
+        Name of the data file without extension, e.g. 'TRAIN_RAW_FILENAME'.
+    storage_format : str or None, default=None
+        One of 'csv', 'parquet' and 'feather'. None uses 'DATA_STORAGE_FORMAT'.
+
+    Returns
+    -------
+    str
+        Path of the written data file.
+    """
+    df = df.astype({c: DTYPES[c] for c in df.columns if c in DTYPES})
+    with DatasetWriter(directory, filename, storage_format) as writer:
+        writer.write(df)
+    return writer.path
@@ -0,0 +1,276 @@
+"""
+Computes learning curves with a checkpoint of each score, so that an
+interrupted computation resumes where it stopped.
+
+The (training size, fold) fits are scheduled from the largest to the smallest
+training size, so the longest fits do not end up last on a single worker.
+Estimators supporting 'partial_fit' are trained incrementally over the growing
+training sizes of a fold instead of from scratch for each size.
+
+Random forests and gradient boosting are refitted for each size, their
+'warm_start' is not used: added trees or boosting iterations are fitted on the
+larger training set, while the earlier ones keep the smaller one, so the
+grown model is not the model of that training size.
+"""
+
+import json
+import os
+import warnings
+from typing import Any, Dict, Iterator, List, Literal, Optional, Sequence, Tuple, Union
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.base import BaseEstimator, clone, is_classifier
+from sklearn.exceptions import FitFailedWarning
+from sklearn.metrics import check_scoring
+from sklearn.model_selection import check_cv
+
+Score = Tuple[int, int, float, float]
+""" Fold, training size, training score and validation score of a fit. """
+
+
+def get_train_sizes(
+    train_sizes: Union[np.ndarray, Sequence[float]], n_max_training_samples: int
+) -> np.ndarray:
+    """
+    Returns the absolute training sizes, as 'sklearn.model_selection.learning_curve'.
+
+    Sizes in (0, 1] are fractions of the largest training set, other sizes are
+    absolute. Duplicate sizes are removed.
+    """
+    train_sizes = np.asarray(train_sizes)
+    if np.issubdtype(train_sizes.dtype, np.floating) and train_sizes.max() <= 1.0:
+        train_sizes = (train_sizes * n_max_training_samples).astype(int)
+    train_sizes = np.clip(train_sizes, 1, n_max_training_samples)
+    return np.unique(train_sizes.astype(int))
+
+
+def _fit_and_score_sizes(
+    estimator: BaseEstimator,
+    X: Any,
+    y: np.ndarray,
+    fold: int,
+    train: np.ndarray,
+    test: np.ndarray,
+    sizes: Sequence[int],
+    scorer: Any,
+    incremental: bool,
+    error_score: Union[float, str],
+) -> List[Score]:
+    """
+    Fits the estimator on the first rows of a fold's training set for each
+    size and scores it on these rows and the fold's test set. Incremental
+    estimators are trained on the added rows of each size with 'partial_fit'.
+    """
+    scores = []
+    n_fitted = 0
+    classes = np.unique(y)
+    estimator = clone(estimator)
+    for n_train in sorted(sizes):
+        if not incremental:
+            estimator = clone(estimator)
+        train_rows = train[:n_train]
+        try:
+            if incremental:
+                new_rows = train[n_fitted:n_train]
+                estimator.partial_fit(X[new_rows], y[new_rows], classes=classes)
+                n_fitted = n_train
+            else:
+                estimator.fit(X[train_rows], y[train_rows])
+            train_score = scorer(estimator, X[train_rows], y[train_rows])
+            val_score = scorer(estimator, X[test], y[test])
+        except Exception as e:
+            if error_score == "raise":
+                raise
+            warnings.warn(
+                f"Fitting failed, the scores of size {n_train} of fold {fold} are"
+                f" set to {error_score}: {e!r}",
+                FitFailedWarning,
+            )
+            train_score = val_score = error_score
+        scores.append((fold, int(n_train), float(train_score), float(val_score)))
+    return scores
+
+
+def _to_record(fold: int, n_train: int, train_score: float, val_score: float) -> dict:
+    """Returns a score as line of a checkpoint file."""
+    return {
+        "fold": fold,
+        "train_size": n_train,
+        "train_score": train_score,
+        "val_score": val_score,
+    }
+
+
+def _read_checkpoint(path: str, config: Dict[str, Any]) -> List[Score]:
+    """
+    Returns the scores of a checkpoint file written for the same
+    configuration, an empty list otherwise. A partly written last line of an
+    interrupted run is ignored.
+    """
+    if not os.path.exists(path):
+        return []
+    with open(path, "r") as f:
+        lines = f.read().splitlines()
+    try:
+        header = json.loads(lines[0]) if lines else {}
+    except json.JSONDecodeError:
+        # The header of a run interrupted while writing it.
+        return []
+    if header.get("config") != config:
+        return []
+
+    scores = []
+    for line in lines[1:]:
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError:
+            continue
+        scores.append(
+            (
+                record["fold"],
+                record["train_size"],
+                record["train_score"],
+                record["val_score"],
+            )
+        )
+    return scores
+
+
+def compute_learning_curve(
+    estimator: BaseEstimator,
+    X: Union[pd.DataFrame, np.ndarray],
+    y: Union[pd.Series, np.ndarray],
+    cv: Union[int, Any] = 5,
+    scoring: Optional[str] = None,
+    train_sizes: Union[np.ndarray, Sequence[float]] = np.linspace(0.1, 1.0, 10),
+    n_jobs: Optional[int] = None,
+    checkpoint_path: Optional[str] = None,
+    incremental: Union[bool, Literal["auto"]] = "auto",
+    error_score: Union[float, str] = np.nan,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Computes a learning curve like 'sklearn.model_selection.learning_curve',
+    checkpointing each score.
+
+    Parameters
+    ----------
+    estimator : BaseEstimator
+        Estimator to fit, e.g. a classifier on preprocessed features.
+    X : pd.DataFrame or np.ndarray
+        Features, numeric DataFrames are converted to a float64 array, which
+        joblib passes memory-mapped to the workers.
+    y : pd.Series or np.ndarray
+        Target.
+    cv : int or cross-validation generator, default=5
+        Folds as for 'learning_curve'.
+    scoring : str or None, default=None
+        Scorer as for 'learning_curve'.
+    train_sizes : array-like, default=np.linspace(0.1, 1.0, 10)
+        Relative or absolute numbers of training examples.
+    n_jobs : int or None, default=None
+        Number of parallel fits.
+    checkpoint_path : str or None, default=None
+        JSON lines file the scores are appended to as they finish. Scores of
+        a previous run with the same estimator parameters, data, folds, sizes
+        and scoring are loaded from it and not computed again.
+    incremental : bool or "auto", default="auto"
+        Whether to train over the growing sizes of a fold with 'partial_fit',
+        "auto" does so if the estimator supports it. Ensembles with
+        'warm_start' are refitted, see the module docstring.
+    error_score : float or "raise", default=np.nan
+        Score of failed fits, "raise" raises the error.
+
+    Returns
+    -------
+    tuple of (np.ndarray, np.ndarray, np.ndarray)
+        Absolute training sizes, training scores and validation scores of
+        shape (n_sizes, n_folds).
+    """
+    if isinstance(X, pd.DataFrame):
+        X = X.to_numpy(dtype=np.float64)
+    y = np.asarray(y)
+    if incremental == "auto":
+        incremental = hasattr(estimator, "partial_fit")
+
+    folds = list(check_cv(cv, y, classifier=is_classifier(estimator)).split(X, y))
+    sizes = get_train_sizes(train_sizes, len(folds[0][0]))
+    scorer = check_scoring(estimator, scoring=scoring)
+
+    config = {
+        "estimator": joblib.hash(clone(estimator)),
+        "data": joblib.hash((X, y, folds)),
+        "train_sizes": sizes.tolist(),
+        "scoring": str(scoring),
+        "incremental": bool(incremental),
+    }
+    done = _read_checkpoint(checkpoint_path, config) if checkpoint_path else []
+    done_keys = {(fold, n_train) for fold, n_train, _, _ in done}
+
+    if incremental:
+        # A fold is trained over all its sizes in one task.
+        tasks = [
+            (fold, sizes.tolist())
+            for fold in range(len(folds))
+            if any((fold, int(n)) not in done_keys for n in sizes)
+        ]
+    else:
+        tasks = [
+            (fold, [int(n)])
+            for n in sizes[::-1]
+            for fold in range(len(folds))
+            if (fold, int(n)) not in done_keys
+        ]
+
+    results: Iterator[List[Score]] = joblib.Parallel(
+        n_jobs=n_jobs, return_as="generator_unordered"
+    )(
+        joblib.delayed(_fit_and_score_sizes)(
+            estimator,
+            X,
+            y,
+            fold,
+            *folds[fold],
+            task_sizes,
+            scorer,
+            incremental,
+            error_score,
+        )
+        for fold, task_sizes in tasks
+    )
+
+    scores = {
+        (fold, n_train): (s_train, s_val) for fold, n_train, s_train, s_val in done
+    }
+    checkpoint = None
+    if checkpoint_path:
+        # Rewritten with the loaded scores, which drops a partly written line.
+        # The old checkpoint is only replaced once the new one is complete.
+        tmp_path = f"{checkpoint_path}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(json.dumps({"config": config}) + "\n")
+            for fold, n_train, s_train, s_val in done:
+                f.write(json.dumps(_to_record(fold, n_train, s_train, s_val)) + "\n")
+        os.replace(tmp_path, checkpoint_path)
+        checkpoint = open(checkpoint_path, "a")
+    try:
+        for task_scores in results:
+            for fold, n_train, s_train, s_val in task_scores:
+                scores[(fold, n_train)] = (s_train, s_val)
+                if checkpoint is not None:
+                    record = _to_record(fold, n_train, s_train, s_val)
+                    checkpoint.write(json.dumps(record) + "\n")
+            if checkpoint is not None:
+                checkpoint.flush()
+    finally:
+        if checkpoint is not None:
+            checkpoint.close()
+
+    train_scores = np.array(
+        [[scores[(fold, int(n))][0] for fold in range(len(folds))] for n in sizes]
+    )
+    val_scores = np.array(
+        [[scores[(fold, int(n))][1] for fold in range(len(folds))] for n in sizes]
+    )
+    return sizes, train_scores, val_scores
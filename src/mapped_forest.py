@@ -0,0 +1,247 @@
+"""
+Saves tree ensembles as NumPy arrays that are loaded memory-mapped.
+
+Pickled forests are read completely into the memory of each process that
+loads them, as sklearn copies the node arrays of its trees on unpickling.
+'save_mapped_forest' stores the nodes of all trees of a fitted
+'RandomForestClassifier', 'ExtraTreesClassifier' or 'DecisionTreeClassifier'
+as uncompressed '.npy' files. 'MappedForestClassifier' maps them read-only
+and predicts on them directly, so that processes loading the same model share
+the pages of the operating system's page cache instead of holding private
+copies.
+
+The predictions equal those of the saved estimator.
+"""
+
+import json
+import os
+import shutil
+from typing import Any, List, Literal, Optional
+
+import joblib
+import numpy as np
+from sklearn.base import BaseEstimator
+
+MAPPED_FOREST_FORMAT_VERSION = 1
+""" Version of the file layout, stored in 'meta.json'. """
+
+NODE_ARRAYS = (
+    "children_left",
+    "children_right",
+    "feature",
+    "threshold",
+    "missing_go_to_left",
+    "value",
+    "roots",
+)
+""" Arrays of the nodes of all trees, each saved as '<name>.npy'. """
+
+
+def _get_trees(estimator: BaseEstimator) -> List[Any]:
+    """Returns the fitted sklearn trees of a forest or a single tree."""
+    if hasattr(estimator, "estimators_"):
+        trees = [tree.tree_ for tree in estimator.estimators_]
+    elif hasattr(estimator, "tree_"):
+        trees = [estimator.tree_]
+    else:
+        raise TypeError(
+            f"Expected a fitted forest or decision tree classifier, got"
+            f" '{type(estimator).__name__}'."
+        )
+    if getattr(estimator, "n_outputs_", 1) != 1:
+        raise ValueError("Only classifiers with a single output are supported.")
+    return trees
+
+
+def save_mapped_forest(estimator: BaseEstimator, path: str) -> None:
+    """
+    Saves the trees of a fitted forest or decision tree classifier as '.npy'
+    files in a directory.
+
+    The nodes of all trees are concatenated, the children refer to the
+    position of the node in the concatenation. The values of the nodes are
+    the class probabilities of 'predict_proba' of the trees.
+
+    Parameters
+    ----------
+    estimator : BaseEstimator
+        Fitted 'RandomForestClassifier', 'ExtraTreesClassifier' or
+        'DecisionTreeClassifier' with a single output.
+    path : str
+        Directory to write to, e.g. '<model_name>.model.forest' in the model
+        directory. An existing directory is replaced.
+    """
+    trees = _get_trees(estimator)
+    n_classes = len(estimator.classes_)
+    offsets = np.cumsum([0] + [tree.node_count for tree in trees])
+
+    arrays = {
+        "children_left": [],
+        "children_right": [],
+        "feature": [],
+        "threshold": [],
+        "missing_go_to_left": [],
+        "value": [],
+    }
+    for tree, offset in zip(trees, offsets):
+        is_leaf = tree.children_left < 0
+        for name in ("children_left", "children_right"):
+            children = getattr(tree, name).astype(np.intp)
+            arrays[name].append(np.where(is_leaf, -1, children + offset))
+        arrays["feature"].append(np.where(is_leaf, -1, tree.feature).astype(np.intp))
+        arrays["threshold"].append(tree.threshold.astype(np.float64))
+        arrays["missing_go_to_left"].append(
+            np.asarray(tree.missing_go_to_left, dtype=bool)
+        )
+
+        # The trees of sklearn >= 1.4 store the class fractions of the nodes.
+        arrays["value"].append(np.array(tree.value[:, 0, :n_classes], dtype=np.float64))
+
+    arrays = {name: np.concatenate(parts) for name, parts in arrays.items()}
+    arrays["roots"] = offsets[:-1].astype(np.intp)
+
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    os.makedirs(tmp_path)
+    for name in NODE_ARRAYS:
+        np.save(os.path.join(tmp_path, f"{name}.npy"), arrays[name])
+    joblib.dump(
+        {
+            "classes_": estimator.classes_,
+            "n_features_in_": estimator.n_features_in_,
+            "feature_names_in_": getattr(estimator, "feature_names_in_", None),
+        },
+        os.path.join(tmp_path, "attributes.pkl"),
+    )
+    with open(os.path.join(tmp_path, "meta.json"), "w") as f:
+        json.dump(
+            {
+                "format_version": MAPPED_FOREST_FORMAT_VERSION,
+                "estimator": type(estimator).__name__,
+                "n_trees": len(trees),
+                "n_nodes": int(offsets[-1]),
+            },
+            f,
+            indent=2,
+        )
+
+    if os.path.isdir(path):
+        shutil.rmtree(path)
+    os.replace(tmp_path, path)
+
+
+class MappedForestClassifier:
+    """
+    Predicts with a forest saved by 'save_mapped_forest', whose node arrays
+    are memory-mapped.
+
+    Only the prediction interface of the saved classifier is provided.
+
+    Parameters
+    ----------
+    path : str
+        Directory written by 'save_mapped_forest'.
+    mmap_mode : {"r", "c"} or None, default="r"
+        Mode to map the node arrays with, None reads them into memory.
+    batch_size : int, default=4096
+        Number of rows whose paths through all trees are followed at once.
+
+    Attributes
+    ----------
+    classes_ : np.ndarray
+        Class labels.
+    n_features_in_ : int
+        Number of features.
+    feature_names_in_ : np.ndarray or None
+        Names of the features the classifier was fitted on, if any.
+    n_trees : int
+        Number of trees.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        mmap_mode: Optional[Literal["r", "c"]] = "r",
+        batch_size: int = 4096,
+    ):
+        with open(os.path.join(path, "meta.json"), "r") as f:
+            meta = json.load(f)
+        if meta["format_version"] != MAPPED_FOREST_FORMAT_VERSION:
+            raise ValueError(
+                f"Unsupported format version {meta['format_version']} of '{path}'."
+            )
+
+        self.path = path
+        self.mmap_mode = mmap_mode
+        self.batch_size = batch_size
+        self.estimator_name = meta["estimator"]
+        for name in NODE_ARRAYS:
+            setattr(
+                self,
+                name,
+                np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mmap_mode),
+            )
+        for name, value in joblib.load(os.path.join(path, "attributes.pkl")).items():
+            setattr(self, name, value)
+        self.n_trees = len(self.roots)
+
+    def __repr__(self) -> str:
+        return f"MappedForestClassifier({self.estimator_name}, n_trees={self.n_trees})"
+
+    def _check_X(self, X: Any) -> np.ndarray:
+        # Trees compare the features as float32, as sklearn does.
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim != 2 or X.shape[1] != self.n_features_in_:
+            raise ValueError(
+                f"X has shape {X.shape}, but the classifier expects"
+                f" {self.n_features_in_} features."
+            )
+        return X
+
+    def _apply_batch(self, X: np.ndarray) -> np.ndarray:
+        """Returns the leaf of each row in each tree, of shape (n_rows, n_trees)."""
+        n_rows = len(X)
+        leaves = np.empty(n_rows * self.n_trees, dtype=np.intp)
+        positions = np.arange(n_rows * self.n_trees)
+        rows = positions // self.n_trees
+        nodes = np.tile(np.asarray(self.roots), n_rows)
+
+        while len(nodes):
+            features = self.feature[nodes]
+            is_leaf = features < 0
+            if is_leaf.any():
+                leaves[positions[is_leaf]] = nodes[is_leaf]
+                is_inner = ~is_leaf
+                positions, rows, nodes = (
+                    positions[is_inner],
+                    rows[is_inner],
+                    nodes[is_inner],
+                )
+                features = features[is_inner]
+
+            values = X[rows, features]
+            go_left = values <= self.threshold[nodes]
+            is_missing = np.isnan(values)
+            if is_missing.any():
+                go_left[is_missing] = self.missing_go_to_left[nodes[is_missing]]
+            nodes = np.where(
+                go_left, self.children_left[nodes], self.children_right[nodes]
+            )
+
+        return leaves.reshape(n_rows, self.n_trees)
+
+    def predict_proba(self, X: Any) -> np.ndarray:
+        """Returns the class probabilities, the mean of those of the trees."""
+        X = self._check_X(X)
+        proba = np.zeros((len(X), len(self.classes_)), dtype=np.float64)
+        for start in range(0, len(X), self.batch_size):
+            leaves = self._apply_batch(X[start : start + self.batch_size])
+            batch_proba = proba[start : start + self.batch_size]
+            # Summed tree by tree, as the forests of sklearn.
+            for tree in range(self.n_trees):
+                batch_proba += self.value[leaves[:, tree]]
+        proba /= self.n_trees
+        return proba
+
+    def predict(self, X: Any) -> np.ndarray:
+        """Returns the class with the highest mean probability."""
+        return self.classes_.take(np.argmax(self.predict_proba(X), axis=1), axis=0)
@@ -5,27 +5,295 @@ confusion matrix reconstruction, and formatting of classification reports.
 
 import os
 import json
-import pickle
+import warnings
 from datetime import datetime
-from typing import Union, Optional, List, Dict, Any, Sequence, Literal
+from typing import Union, Optional, List, Dict, Any, Sequence, Literal, Tuple
 
+import joblib
 import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
+import scipy.sparse as sp
 import seaborn as sns
 
 from scipy.ndimage import uniform_filter1d
 from sklearn.base import BaseEstimator
-from sklearn.metrics import (
-    precision_score,
-    recall_score,
-    f1_score,
-    balanced_accuracy_score,
-    roc_auc_score,
-    confusion_matrix,
-    classification_report,
-)
-from sklearn.model_selection import learning_curve
+from sklearn.compose import ColumnTransformer
+from sklearn.exceptions import UndefinedMetricWarning
+from sklearn.metrics import f1_score, roc_auc_score
+
+from src.artifacts import load_model_artifact
+from src.learning_curves import compute_learning_curve
+
+
+AVERAGE_MODES = ("micro", "macro", "weighted", "binary")
+""" Averaging modes of precision, recall and F1 of 'get_metrics_from_contingency'. """
+
+MERGED_LABELS = {"pre": "dia"}
+""" Labels merged into another one by the models of the presence of diabetes. """
+
+
+def encode_labels(
+    target_truth: Union[pd.Series, np.ndarray],
+    target_pred: Union[pd.Series, np.ndarray],
+    labels: Optional[Sequence[Union[str, int]]] = None,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Encodes true and predicted labels as integer codes of one sorted set of classes.
+
+    Parameters
+    ----------
+    target_truth : array-like
+        True target labels.
+    target_pred : array-like
+        Predicted target labels.
+    labels : list or None, default=None
+        Class labels added to the classes even if neither true nor predicted.
+
+    Returns
+    -------
+    tuple of np.ndarray
+        The sorted classes and the codes of the true and of the predicted labels,
+        i.e. their indices into the classes.
+    """
+    target_truth = np.asarray(target_truth)
+    target_pred = np.asarray(target_pred)
+    if len(target_truth) != len(target_pred):
+        raise ValueError(
+            f"Found {len(target_truth)} true but {len(target_pred)} predicted labels."
+        )
+    values = [target_truth, target_pred]
+    if labels is not None:
+        values.append(np.asarray(labels))
+    classes, codes = np.unique(np.concatenate(values), return_inverse=True)
+    n_samples = len(target_truth)
+    return classes, codes[:n_samples], codes[n_samples : 2 * n_samples]
+
+
+def align_labels(
+    target_truth: Union[pd.Series, np.ndarray],
+    labels: Sequence[Union[str, int]],
+) -> np.ndarray:
+    """
+    Maps true labels onto the labels a model predicts, e.g. the 3-class target
+    onto a model of the presence of diabetes with 'pre' merged into 'dia'.
+
+    A label of 'MERGED_LABELS' the model does not predict is replaced by the
+    label it is merged into, if the model predicts that one.
+
+    Parameters
+    ----------
+    target_truth : array-like
+        True target labels.
+    labels : list
+        Class labels the model predicts, its results' "predicts".
+
+    Returns
+    -------
+    np.ndarray
+        The true labels in the classes of the model.
+
+    Raises
+    ------
+    ValueError
+        If true labels remain which the model does not predict.
+    """
+    target_truth = np.array(target_truth)
+    for label, merged_into in MERGED_LABELS.items():
+        if label not in labels and merged_into in labels:
+            target_truth[target_truth == label] = merged_into
+
+    unknown = set(np.unique(target_truth).tolist()) - set(labels)
+    if unknown:
+        raise ValueError(
+            f"The model predicts {list(labels)}, but the true labels contain"
+            f" {sorted(unknown)}."
+        )
+    return target_truth
+
+
+def get_contingency(
+    truth_codes: np.ndarray,
+    pred_codes: np.ndarray,
+    n_classes: int,
+    sample_weight: Optional[np.ndarray] = None,
+) -> np.ndarray:
+    """
+    Counts the pairs of true and predicted class codes with one 'np.bincount'.
+
+    Returns
+    -------
+    np.ndarray
+        Confusion matrix of shape (n_classes, n_classes), rows are the true and
+        columns the predicted classes. Of integers, or of floats if weighted.
+    """
+    return np.bincount(
+        truth_codes * n_classes + pred_codes,
+        weights=sample_weight,
+        minlength=n_classes * n_classes,
+    ).reshape(n_classes, n_classes)
+
+
+def _divide(numerator: np.ndarray, denominator: np.ndarray, metric: str) -> np.ndarray:
+    """Divides like scikit-learn's metrics, ill-defined results are 0 with a warning."""
+    mask = denominator == 0
+    result = numerator / np.where(mask, 1, denominator)
+    if np.any(mask):
+        result[mask] = 0.0
+        warnings.warn(
+            f"{metric} is ill-defined and being set to 0.0 in labels with no"
+            f" {'predicted' if metric == 'Precision' else 'true'} samples.",
+            UndefinedMetricWarning,
+            stacklevel=3,
+        )
+    return result
+
+
+def _get_scores(
+    tp: np.ndarray, pred_sum: np.ndarray, true_sum: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Returns precision, recall and F1 score of per-class or summed counts."""
+    precision = _divide(tp, pred_sum, "Precision")
+    recall = _divide(tp, true_sum, "Recall")
+    # 2 * precision * recall / (precision + recall), of the counts.
+    mask = (true_sum + pred_sum) == 0
+    f1 = 2.0 * tp / np.where(mask, 1, 1.0 * true_sum + pred_sum)
+    f1[mask] = 0.0
+    return precision, recall, f1
+
+
+def _average(scores: np.ndarray, average: str, true_sum: np.ndarray) -> float:
+    if len(scores) == 0:
+        return np.nan
+    if average == "weighted" and true_sum.sum() > 0:
+        return float(np.average(scores, weights=true_sum))
+    return float(np.mean(scores))
+
+
+def get_metrics_from_contingency(
+    contingency: np.ndarray,
+    classes: np.ndarray,
+    labels: Sequence[Union[str, int]],
+    avg_mode: str = "weighted",
+) -> Dict[str, Any]:
+    """
+    Derives the metrics of 'evaluate_classifier' from a confusion matrix.
+
+    The metrics equal the ones of scikit-learn's 'precision_score', 'recall_score',
+    'f1_score' and 'balanced_accuracy_score' over the true or predicted classes,
+    and of 'confusion_matrix' and 'classification_report' over 'labels', without
+    validating and encoding the labels again for each metric.
+
+    Parameters
+    ----------
+    contingency : np.ndarray
+        Confusion matrix over 'classes', see 'get_contingency'.
+    classes : np.ndarray
+        Sorted classes of the codes, see 'encode_labels'.
+    labels : list
+        Class labels of the confusion matrix and the classification report, all
+        contained in 'classes'.
+    avg_mode : str, default="weighted"
+        Averaging method for precision, recall, and F1 score, one of 'AVERAGE_MODES'.
+        "binary" reports the scores of the positive class 'labels[-1]', as
+        the ROC AUC of 'evaluate_classifier'.
+
+    Returns
+    -------
+    dict
+        The "f1", "recall", "precision", "bal_accuracy", "conf_matrix" and
+        "classification_report" entries of the results of 'evaluate_classifier'.
+    """
+    if avg_mode not in AVERAGE_MODES:
+        raise ValueError(
+            f"Unknown avg_mode '{avg_mode}', expected one of {AVERAGE_MODES}."
+        )
+
+    tp = np.diag(contingency)
+    pred_sum = contingency.sum(axis=0)
+    true_sum = contingency.sum(axis=1)
+
+    # Scores over the true or predicted classes, as in 'precision_score' etc.
+    present = (true_sum + pred_sum) > 0
+    if avg_mode == "micro":
+        precision, recall, f1 = (
+            float(score[0])
+            for score in _get_scores(
+                tp[present].sum(keepdims=True),
+                pred_sum[present].sum(keepdims=True),
+                true_sum[present].sum(keepdims=True),
+            )
+        )
+    elif avg_mode == "binary":
+        if present.sum() > 2:
+            raise ValueError("avg_mode 'binary' requires at most two classes.")
+        i = np.searchsorted(classes, np.asarray(labels[-1:]))
+        precision, recall, f1 = (
+            float(score[0]) for score in _get_scores(tp[i], pred_sum[i], true_sum[i])
+        )
+    else:
+        precision, recall, f1 = (
+            _average(score, avg_mode, true_sum[present])
+            for score in _get_scores(tp[present], pred_sum[present], true_sum[present])
+        )
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        per_class_recall = tp / true_sum
+    if np.any(np.isnan(per_class_recall[present])):
+        warnings.warn("y_pred contains classes not in y_true")
+    bal_accuracy = float(np.nanmean(per_class_recall[present]))
+
+    # Confusion matrix and classification report over the labels.
+    indices = np.searchsorted(classes, np.asarray(labels))
+    conf_matrix_val = contingency[np.ix_(indices, indices)]
+    label_tp, label_pred_sum, label_true_sum = (
+        tp[indices],
+        pred_sum[indices],
+        true_sum[indices],
+    )
+    scores = _get_scores(label_tp, label_pred_sum, label_true_sum)
+
+    headers = ["precision", "recall", "f1-score", "support"]
+    report = {
+        f"{label}": dict(zip(headers, [float(p), float(r), float(f), float(s)]))
+        for label, p, r, f, s in zip(labels, *scores, label_true_sum)
+    }
+    support = float(label_true_sum.sum())
+    micro_is_accuracy = set(indices) >= set(np.flatnonzero(present))
+    micro_scores = _get_scores(
+        label_tp.sum(keepdims=True),
+        label_pred_sum.sum(keepdims=True),
+        label_true_sum.sum(keepdims=True),
+    )
+    if micro_is_accuracy:
+        report["accuracy"] = float(micro_scores[0][0])
+    else:
+        report["micro avg"] = dict(
+            zip(headers, [*(float(score[0]) for score in micro_scores), support])
+        )
+    for average in ("macro", "weighted"):
+        report[f"{average} avg"] = dict(
+            zip(
+                headers,
+                [
+                    *(_average(score, average, label_true_sum) for score in scores),
+                    support,
+                ],
+            )
+        )
+
+    return {
+        "f1": f1,
+        "recall": recall,
+        "precision": precision,
+        "bal_accuracy": bal_accuracy,
+        "conf_matrix": {
+            f"C_{true_class}_{pred_class}": int(conf_matrix_val[true_class, pred_class])
+            for true_class in range(conf_matrix_val.shape[0])
+            for pred_class in range(conf_matrix_val.shape[1])
+        },
+        "classification_report": report,
+    }
 
 
 def evaluate_classifier(
@@ -62,7 +330,7 @@ def evaluate_classifier(
         Indicator string for specific feature configuration used.
     avg_mode : str, default="macro"
         Averaging method for precision, recall, and F1 score.
-        Options: {"micro", "macro", "weighted", "samples"}
+        Options: {"micro", "macro", "weighted", "binary"}, see 'AVERAGE_MODES'.
 
     Returns
     -------
@@ -73,15 +341,10 @@ def evaluate_classifier(
         - confusion matrix entries (flattened)
         - classification report (as dict)
     """
-    precision_score_val = precision_score(target_truth, target_pred, average=avg_mode)
-    recall_score_val = recall_score(target_truth, target_pred, average=avg_mode)
-    f1_score_val = f1_score(target_truth, target_pred, average=avg_mode)
-    balanced_accuracy_val = balanced_accuracy_score(target_truth, target_pred)
-
-    confusion_matrix_val = confusion_matrix(
-        target_truth, target_pred, labels=labels
-    )
-
+    classes, truth_codes, pred_codes = encode_labels(target_truth, target_pred, labels)
+    contingency = get_contingency(truth_codes, pred_codes, len(classes))
+    metrics = get_metrics_from_contingency(contingency, classes, labels, avg_mode)
+    f1_score_val = metrics["f1"]
 
     roc_auc_score_val = pd.NA
     if target_pred_proba is not None:
@@ -108,21 +371,13 @@ def evaluate_classifier(
         "special_features": special_features,
         "predicts": labels,
         "avg_mode": avg_mode,
-        "f1": f1_score_val,
-        "recall": recall_score_val,
-        "precision": precision_score_val,
-        "bal_accuracy": balanced_accuracy_val,
+        "f1": metrics["f1"],
+        "recall": metrics["recall"],
+        "precision": metrics["precision"],
+        "bal_accuracy": metrics["bal_accuracy"],
         "roc_auc_score": roc_auc_score_val if pd.notna(roc_auc_score_val) else '',
-        "conf_matrix": {
-            f"C_{true_class}_{pred_class}": int(
-                confusion_matrix_val[true_class, pred_class]
-            )
-            for true_class in range(confusion_matrix_val.shape[0])
-            for pred_class in range(confusion_matrix_val.shape[1])
-        },
-        "classification_report": classification_report(
-            target_truth, target_pred, digits=3, output_dict=True, labels=labels
-        ),
+        "conf_matrix": metrics["conf_matrix"],
+        "classification_report": metrics["classification_report"],
     }
 
     return results
@@ -206,11 +461,18 @@ def save_learning_curve_data(
     Loads model components, computes learning curve data using cross-validation,
     and saves training/validation scores and summary statistics to CSV and JSON files.
 
+    Each score is appended to '.learning_curve_checkpoint.jsonl' as soon as it
+    is computed. A call interrupted before completion resumes from it, see
+    'src.learning_curves.compute_learning_curve'.
+
     Parameters
     ----------
     model_dir : str
         Path to the directory containing '.model.pkl', '.pipeline.pkl', and
         '.label_encoder.pkl' files.
+        They are loaded with 'src.artifacts.load_model_artifact', which
+        caches them for the other evaluation functions. The classifier is
+        refitted, so a mapped forest is not used, the pickle is loaded.
 
     X : pd.DataFrame
         Input features (not preprocessed).
@@ -228,7 +490,8 @@ def save_learning_curve_data(
         Number of parallel jobs to run.
 
     train_sizes : array-like, optional (default=np.linspace(0.1, 1.0, 10))
-        Relative or absolute numbers of training examples to use.
+        Relative or absolute numbers of training examples to use. The score
+        files have a row per distinct absolute size that was evaluated.
 
     Returns
     -------
@@ -239,21 +502,17 @@ def save_learning_curve_data(
     model_name = os.path.basename(os.path.normpath(model_dir))
     path_filename_prefix = os.path.join(model_dir, model_name)
 
-    with open(f"{path_filename_prefix}.model.pkl", "rb") as f:
-        classifier = pickle.load(f)
-
-    with open(f"{path_filename_prefix}.pipeline.pkl", "rb") as f:
-        preprocessor = pickle.load(f)
-
-    with open(f"{path_filename_prefix}.label_encoder.pkl", "rb") as f:
-        labelencoder = pickle.load(f)
+    artifact = load_model_artifact(model_dir, prefer_mapped=False)
+    classifier = artifact.classifier
+    preprocessor = artifact.preprocessor
+    labelencoder = artifact.label_encoder
 
     features_train_proc = preprocessor.transform(X)
     target_train_enc = labelencoder.transform(y)
 
 
     start_timestamp = datetime.now()
-    training_sizes, train_scores, val_scores = learning_curve(
+    training_sizes, train_scores, val_scores = compute_learning_curve(
         estimator=classifier,
         X=features_train_proc,
         y=target_train_enc,
@@ -261,25 +520,22 @@ def save_learning_curve_data(
         scoring=scoring,
         n_jobs=n_jobs,
         train_sizes=train_sizes,
+        checkpoint_path=f"{path_filename_prefix}.learning_curve_checkpoint.jsonl",
     )
     end_timestamp = datetime.now()
     td = end_timestamp - start_timestamp
 
     df_train = pd.DataFrame(
-        {"train_sizes": train_sizes}
-        | {
-            f"scores_{i}": score
-            for rows in train_scores
-            for i, score in enumerate(rows)
-        }
+        {"train_sizes": training_sizes}
+        | {f"scores_{i}": train_scores[:, i] for i in range(train_scores.shape[1])}
     )
     df_train.to_csv(
         f"{path_filename_prefix}.learning_curve_train_scores.csv", index=False
     )
 
     df_train = pd.DataFrame(
-        {"train_sizes": train_sizes}
-        | {f"scores_{i}": score for rows in val_scores for i, score in enumerate(rows)}
+        {"train_sizes": training_sizes}
+        | {f"scores_{i}": val_scores[:, i] for i in range(val_scores.shape[1])}
     )
     df_train.to_csv(
         f"{path_filename_prefix}.learning_curve_validation_scores.csv", index=False
@@ -290,6 +546,7 @@ def save_learning_curve_data(
         "scoring": scoring,
         "n_jobs": n_jobs,
         "train_sizes": list(train_sizes),
+        "train_sizes_abs": training_sizes.tolist(),
         "training_time_sec": td.seconds,
     }
 
@@ -401,21 +658,134 @@ def plot_learning_curves_from_file(
     else:
         fig.show()
 
+def _get_permutation_indices(n_rows: int, n_repeats: int) -> np.ndarray:
+    """
+    Returns the row order of a permuted column for each repeat.
+
+    Repeat i shuffles the column of repeat i - 1 again with seed i, like
+    'Series.sample(frac=1, random_state=i)' applied repeatedly.
+    """
+
+    indices = np.empty((n_repeats, n_rows), dtype=np.intp)
+    order = np.arange(n_rows)
+    for i in range(n_repeats):
+        order = order[np.random.RandomState(i).choice(n_rows, n_rows, replace=False)]
+        indices[i] = order
+    return indices
+
+
+def _get_column_blocks(
+    preprocessor: BaseEstimator, columns: pd.Index
+) -> List[Tuple[Any, List[str], slice]]:
+    """
+    Returns the fitted transformers of a ColumnTransformer with their input
+    columns and the slice of their output in the transformed matrix.
+    Other preprocessors are a single block of all columns.
+    """
+
+    if not isinstance(preprocessor, ColumnTransformer):
+        return [(preprocessor, list(columns), slice(None))]
+
+    blocks = []
+    for name, transformer, cols in preprocessor.transformers_:
+        out = preprocessor.output_indices_[name]
+        if isinstance(transformer, str) and transformer == "drop":
+            continue
+        if out.start == out.stop:
+            continue
+        if not all(isinstance(c, str) for c in cols):
+            cols = list(np.asarray(columns)[cols])
+        blocks.append((transformer, list(cols), out))
+    return blocks
+
+
+def _to_dense(X: Any) -> np.ndarray:
+    """Returns a transformed matrix, sparse or a DataFrame, as float64 array."""
+
+    if sp.issparse(X):
+        X = X.toarray()
+    return np.asarray(X, dtype=np.float64)
+
+
+def _as_classifier_input(
+    X: np.ndarray, feature_names: Optional[pd.Index]
+) -> Union[np.ndarray, pd.DataFrame]:
+    """Wraps a matrix in a DataFrame if the classifier was fit with feature names."""
+
+    if feature_names is None:
+        return X
+    return pd.DataFrame(X, columns=feature_names, copy=False)
+
+
+def _get_permutation_scores(
+    classifier: BaseEstimator,
+    blocks: List[Tuple[Any, List[str], slice]],
+    X: pd.DataFrame,
+    X_proc: np.ndarray,
+    feature_names: Optional[pd.Index],
+    y: np.ndarray,
+    f1_base: float,
+    features: List[str],
+    permutations: np.ndarray,
+) -> List[List[float]]:
+    """
+    Returns the decrease of the weighted F1 score for each permutation of each
+    of the features.
+
+    Only the output of the transformers reading a feature is recomputed, the
+    other columns of the transformed matrix are kept.
+    """
+
+    X_perm = np.array(X_proc)
+    importances = []
+    for feat in features:
+        feat_blocks = [block for block in blocks if feat in block[1]]
+        scores = []
+        for order in permutations:
+            for transformer, cols, out in feat_blocks:
+                X_block = X[cols].assign(
+                    **{feat: X[feat].take(order).set_axis(X.index)}
+                )
+                if isinstance(transformer, str) and transformer == "passthrough":
+                    X_perm[:, out] = X_block.to_numpy()
+                else:
+                    X_perm[:, out] = _to_dense(transformer.transform(X_block))
+
+            y_pred = classifier.predict(_as_classifier_input(X_perm, feature_names))
+            scores.append(f1_base - f1_score(y, y_pred, average="weighted"))
+        importances.append(scores)
+
+        for _, _, out in feat_blocks:
+            X_perm[:, out] = X_proc[:, out]
+    return importances
+
+
 def save_feature_importances_data(
     model_dir: str,
     X: pd.DataFrame,
     y: Union[pd.Series, np.ndarray],
+    n_repeats: int = 5,
+    n_jobs: Optional[int] = -1,
+    max_samples: Optional[Union[int, float]] = None,
+    random_state: int = 0,
 ) -> None:
     """
     Loads a trained classifier, preprocessor, and label encoder from disk,
     computes permutation feature importances based on weighted F1 score,
     and saves the results as a CSV file.
 
+    The features are transformed once. For each permutation only the output
+    of the transformers reading the permuted feature is recomputed. The
+    features are evaluated in parallel. Sparse output of the preprocessor,
+    e.g. of 'build_preprocessor(sparse_output=True)', is made dense.
+
     Parameters
     ----------
     model_dir : str
         Path to directory containing '.model.pkl', '.pipeline.pkl', and
         '.label_encoder.pkl' files.
+        They are loaded with 'src.artifacts.load_model_artifact', which
+        caches them for the other evaluation functions.
 
     X : pd.DataFrame
         Input features (not preprocessed).
@@ -423,6 +793,19 @@ def save_feature_importances_data(
     y : Union[pd.Series, np.ndarray]
         Target labels.
 
+    n_repeats : int, optional (default=5)
+        Number of permutations of each feature.
+
+    n_jobs : int or None, optional (default=-1)
+        Number of parallel jobs to run.
+
+    max_samples : int or float or None, optional (default=None)
+        Number or fraction of rows drawn from 'X' to compute the importances
+        on, to bound the cost. None uses all rows.
+
+    random_state : int, optional (default=0)
+        Seed of drawing the rows for 'max_samples'.
+
     Returns
     -------
     None
@@ -432,63 +815,77 @@ def save_feature_importances_data(
     model_name = os.path.basename(os.path.normpath(model_dir))
     path_filename_prefix = os.path.join(model_dir, model_name)
 
-    with open(f"{path_filename_prefix}.model.pkl", "rb") as f:
-        classifier = pickle.load(f)
-
-    with open(f"{path_filename_prefix}.pipeline.pkl", "rb") as f:
-        preprocessor = pickle.load(f)
-
-    with open(f"{path_filename_prefix}.label_encoder.pkl", "rb") as f:
-        labelencoder = pickle.load(f)
+    artifact = load_model_artifact(model_dir)
+    classifier = artifact.classifier
+    preprocessor = artifact.preprocessor
+    labelencoder = artifact.label_encoder
+
+    if max_samples is not None:
+        n_samples = (
+            max_samples if isinstance(max_samples, int) else int(max_samples * len(X))
+        )
+        if n_samples < len(X):
+            rows = np.sort(
+                np.random.RandomState(random_state).choice(
+                    len(X), n_samples, replace=False
+                )
+            )
+            X = X.iloc[rows]
+            y = np.asarray(y)[rows]
+    X = X.reset_index(drop=True)
 
     features_train_proc = preprocessor.transform(X)
     target_train_enc = labelencoder.transform(y)
 
-    target_train_pred = classifier.predict(features_train_proc)
-
+    feature_names = (
+        features_train_proc.columns
+        if isinstance(features_train_proc, pd.DataFrame)
+        else None
+    )
+    # The permuted columns are written into a dense copy of the matrix.
+    features_train_proc = _to_dense(features_train_proc)
 
+    target_train_pred = classifier.predict(
+        _as_classifier_input(features_train_proc, feature_names)
+    )
     f1_base = f1_score(target_train_enc, target_train_pred, average="weighted")
 
-
-    importances_of_permutations = []
-
-    for feat in X.columns:
-        features_permutated = X.copy()
-        permutation_run_scores = []
-        for i in range(5):
-            series_perm = features_permutated[feat].sample(
-                frac=1, replace=False, random_state=i
-            )
-
-            series_perm.reset_index(drop=True, inplace=True)
-            features_permutated[feat] = series_perm
-            preprocessed_features_permutated = preprocessor.transform(
-                features_permutated
-            )
-
-            f1_permutated = f1_score(
-                target_train_enc,
-                classifier.predict(preprocessed_features_permutated),
-                average="weighted",
-            )
-            permutation_run_scores.append(f1_base - f1_permutated)
-        importances_of_permutations.append(permutation_run_scores)
-
+    blocks = _get_column_blocks(preprocessor, X.columns)
+    permutations = _get_permutation_indices(len(X), n_repeats)
+
+    # One task per worker, so that the classifier is sent to each worker once.
+    n_chunks = min(len(X.columns), joblib.effective_n_jobs(n_jobs))
+    feature_chunks = [list(c) for c in np.array_split(X.columns, n_chunks)]
+
+    results = joblib.Parallel(n_jobs=n_jobs)(
+        joblib.delayed(_get_permutation_scores)(
+            classifier,
+            blocks,
+            X,
+            features_train_proc,
+            feature_names,
+            target_train_enc,
+            f1_base,
+            features,
+            permutations,
+        )
+        for features in feature_chunks
+    )
+    importances_of_permutations = [scores for chunk in results for scores in chunk]
 
     feature_importances = pd.DataFrame(
         {"feature": X.columns}
         | {
-            "importance_mean": np.mean(perm_imp)
-            for perm_imp in importances_of_permutations
+            "importance_mean": [
+                np.mean(perm_imp) for perm_imp in importances_of_permutations
+            ]
         }
         | {
-            f"imp_{i}": imp
-            for perm_imp in importances_of_permutations
-            for i, imp in enumerate(perm_imp)
+            f"imp_{i}": [perm_imp[i] for perm_imp in importances_of_permutations]
+            for i in range(n_repeats)
         }
     )
 
-
     feature_importances.sort_values(by="importance_mean", ascending=False, inplace=True)
     feature_importances.to_csv(
         f"{path_filename_prefix}.feature_importances.csv", index=False
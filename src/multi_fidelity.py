@@ -0,0 +1,127 @@
+"""
+Multi-fidelity cross-validation of the trials of hyperparameter studies.
+
+A trial is cross-validated on growing budgets, the rungs: the estimator is
+fitted on a stratified subsample of the training rows of each fold and, if it
+has an 'n_estimators' parameter, with a fraction of the estimators. After
+each rung but the last, the mean score is reported to the trial and the
+successive halving pruner (ASHA) only lets the top '1 / REDUCTION_FACTOR' of
+the trials that reached the rung continue. Bad configurations are thus
+stopped after a few cheap fits on a tenth of the rows, while the values of the
+completed trials are scored on the full budget and stay comparable.
+
+The reported steps are 'REDUCTION_FACTOR ** rung', the resources of the rungs
+of 'get_successive_halving_pruner'. Run from the project root, e.g.:
+
+    python -m src.studies src.objectives:rf_feateng_multi_fidelity_objective \\
+        --pruner asha --n-trials 100
+"""
+
+from typing import Callable, NamedTuple, Optional, Sequence, Union
+
+import numpy as np
+import optuna
+from sklearn.base import BaseEstimator, clone
+
+from src.cross_validation import FoldMatrixStore
+
+
+class Rung(NamedTuple):
+    """Budget of a rung, as fractions of the training rows and estimators."""
+
+    train_fraction: float
+    n_estimators_fraction: float
+
+
+RUNGS = (Rung(0.1, 0.25), Rung(0.3, 0.5), Rung(1.0, 1.0))
+"""
+Default rungs, the last one is the full budget. Fitting a forest on the first
+two costs about 2.5% and 15% of the full budget.
+"""
+
+REDUCTION_FACTOR = 3
+""" Ratio of the trials reaching a rung to the trials promoted to the next one. """
+
+
+def get_successive_halving_pruner(
+    reduction_factor: int = REDUCTION_FACTOR,
+) -> optuna.pruners.SuccessiveHalvingPruner:
+    """Returns the pruner of the rungs reported by 'cross_val_score_multi_fidelity'."""
+    return optuna.pruners.SuccessiveHalvingPruner(
+        min_resource=1, reduction_factor=reduction_factor, min_early_stopping_rate=0
+    )
+
+
+def scale_n_estimators(estimator: BaseEstimator, fraction: float) -> BaseEstimator:
+    """
+    Returns a clone of the estimator with all its 'n_estimators' parameters,
+    e.g. "clf__n_estimators" of a pipeline, scaled by 'fraction', at least 1.
+    """
+    estimator = clone(estimator)
+    estimator.set_params(
+        **{
+            name: max(1, round(value * fraction))
+            for name, value in estimator.get_params().items()
+            if name.split("__")[-1] == "n_estimators" and isinstance(value, int)
+        }
+    )
+    return estimator
+
+
+def cross_val_score_multi_fidelity(
+    trial: optuna.Trial,
+    fold_store: FoldMatrixStore,
+    estimator: BaseEstimator,
+    scoring: Union[str, Callable, None] = None,
+    n_jobs: Optional[int] = None,
+    rungs: Sequence[Rung] = RUNGS,
+    reduction_factor: int = REDUCTION_FACTOR,
+) -> float:
+    """
+    Cross-validates an estimator on the folds of a 'FoldMatrixStore' on the
+    budgets of the rungs and reports the mean score of each rung to the trial.
+
+    Parameters
+    ----------
+    trial : optuna.Trial
+        Trial of a study with 'get_successive_halving_pruner' of the same
+        'reduction_factor'.
+    fold_store : FoldMatrixStore
+        Folds of the training data.
+    estimator : BaseEstimator
+        Estimator to evaluate, see 'FoldMatrixStore.cross_val_score'.
+    scoring : str, callable or None, default=None
+        Scorer as for 'cross_val_score'.
+    n_jobs : int or None, default=None
+        Number of folds evaluated in parallel.
+    rungs : sequence of Rung, default=RUNGS
+        Growing budgets, the last one is the budget of the returned score.
+    reduction_factor : int, default=REDUCTION_FACTOR
+        Reduction factor of the pruner, rung 'i' is reported as step
+        'reduction_factor ** i'.
+
+    Returns
+    -------
+    float
+        Mean score of the folds on the last rung, failed folds are ignored.
+
+    Raises
+    ------
+    optuna.TrialPruned
+        If the pruner stops the trial after a rung.
+    """
+    score = np.nan
+    for i, rung in enumerate(rungs):
+        scores = fold_store.cross_val_score(
+            scale_n_estimators(estimator, rung.n_estimators_fraction),
+            scoring=scoring,
+            n_jobs=n_jobs,
+            train_fraction=rung.train_fraction,
+        )
+        if np.isnan(scores).all():
+            return np.nan
+        score = float(np.nanmean(scores))
+        trial.report(score, step=reduction_factor**i)
+        if i < len(rungs) - 1 and trial.should_prune():
+            raise optuna.TrialPruned()
+    return score
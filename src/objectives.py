@@ -0,0 +1,127 @@
+"""
+Objective factories of the hyperparameter studies, run by 'src/studies.py'.
+
+A factory loads the training data and returns the objective of a study. It is
+called once per worker process with the 'n_jobs' of the folds of a trial.
+"""
+
+from typing import Callable, Dict, List
+
+import optuna
+from imblearn.over_sampling import RandomOverSampler
+from imblearn.pipeline import Pipeline
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.preprocessing import LabelEncoder
+
+from src.config import TRAIN_RAW_FILENAME
+from src.cross_validation import FoldMatrixStore
+from src.multi_fidelity import cross_val_score_multi_fidelity
+from src.preprocessing import build_preprocessor
+from src.schema import TARGET_COL
+from src.splits import load_split
+from src.studies import cross_val_score_pruned
+
+
+def _get_threshold_choices(thresholds: List[List[float]]) -> Dict[str, List[float]]:
+    """Maps the names of the threshold choices, e.g. '[20,30]', to the thresholds."""
+    return {
+        f"[{','.join(sorted([str(x) for x in lst]))}]": sorted(lst)
+        for lst in thresholds
+    }
+
+
+CAT_GEN_THRESHOLD_CHOICES = {
+    "cg_bmi_th": _get_threshold_choices(
+        [
+            [30],
+            [20, 30],
+            [30, 45],
+            [20, 30, 40],
+            [20, 30, 40, 50],
+            [20, 30, 40, 50, 60],
+        ]
+    ),
+    "cg_mh_th": _get_threshold_choices([[0], [10], [0, 5], [0, 10, 20], [10, 20]]),
+    "cg_ph_th": _get_threshold_choices([[0], [10], [0, 5], [0, 10, 20], [10, 20]]),
+}
+"""
+Choices of the thresholds of 'BMI', 'MentHlth' and 'PhysHlth', as searched in
+'rf_hyperparam_opt_bayesian_feateng.ipynb'.
+"""
+
+
+def _get_rf_feateng_objective(
+    n_jobs: int, score_trial: Callable[..., float]
+) -> Callable[[optuna.Trial], float]:
+    df_train_raw = load_split(TRAIN_RAW_FILENAME)
+    features_train_raw = df_train_raw.drop(TARGET_COL, axis=1)
+    target_train_raw = df_train_raw[TARGET_COL].replace({"pre": "dia"})
+    target_train_enc = LabelEncoder().fit_transform(target_train_raw)
+
+    # The folds are stored as uint8, an eighth of float64, and the forest
+    # converts the oversampled rows to float32 once per fit.
+    preprocessor = build_preprocessor(dtype_policy="compact")
+    preprocessor.set_output(transform="pandas")
+    fold_store = FoldMatrixStore(features_train_raw, target_train_enc, dtype=None)
+
+    def objective(trial: optuna.Trial) -> float:
+        preprocessor.set_params(
+            cg__cat_gen__thresholds=[
+                choices[trial.suggest_categorical(name, list(choices))]
+                for name, choices in CAT_GEN_THRESHOLD_CHOICES.items()
+            ]
+        )
+
+        params = {
+            "n_estimators": trial.suggest_int("n_estimators", 10, 310, step=20),
+            "max_features": trial.suggest_categorical(
+                "max_features", choices=["sqrt", "log2"]
+            ),
+            "max_depth": trial.suggest_int("max_depth", 5, 60, step=5),
+            "min_samples_split": trial.suggest_int(
+                name="min_samples_split", low=2, high=102, step=5
+            ),
+            "min_samples_leaf": trial.suggest_int(
+                name="min_samples_leaf", low=1, high=101, step=5
+            ),
+        }
+
+        pipeline = Pipeline(
+            [
+                ("preprocessor", preprocessor),
+                ("sample", RandomOverSampler(random_state=5)),
+                (
+                    "clf",
+                    RandomForestClassifier(
+                        class_weight="balanced", random_state=42, **params
+                    ),
+                ),
+            ]
+        )
+
+        return score_trial(
+            trial, fold_store, pipeline, scoring="f1_macro", n_jobs=n_jobs
+        )
+
+    return objective
+
+
+def rf_feateng_objective(n_jobs: int = -1) -> Callable[[optuna.Trial], float]:
+    """
+    Returns the objective of 'rf_hyperparam_opt_bayesian_feateng.ipynb'.
+
+    It maximizes the macro f1-score of a random forest on 'no dia' vs
+    ('pre', 'dia') with random oversampling over the thresholds of the
+    binned columns and the forest's parameters.
+    """
+    return _get_rf_feateng_objective(n_jobs, cross_val_score_pruned)
+
+
+def rf_feateng_multi_fidelity_objective(
+    n_jobs: int = -1,
+) -> Callable[[optuna.Trial], float]:
+    """
+    Returns the objective of 'rf_feateng_objective' cross-validated on the
+    growing rungs of 'src/multi_fidelity.py', for the "asha" pruner.
+    """
+    return _get_rf_feateng_objective(n_jobs, cross_val_score_multi_fidelity)
@@ -0,0 +1,204 @@
+"""
+Builds the preprocessing pipelines used by the training notebooks from the
+column schema in 'src/schema.py'.
+"""
+
+from typing import Dict, List, Literal, Optional, Sequence
+
+import numpy as np
+from sklearn.base import BaseEstimator
+from sklearn.compose import ColumnTransformer
+from sklearn.impute import SimpleImputer
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import OneHotEncoder, OrdinalEncoder, StandardScaler
+
+from src.schema import NOMINAL_COLS, ORDINAL_COLS, ORDINAL_ORDERS
+from src.transformers import (
+    CastTransformer,
+    CategoryFromThresholdTransformer,
+    MissingFlagTransformer,
+    ThresholdOneHotEncoder,
+)
+
+DEFAULT_CAT_GEN_THRESHOLDS = {
+    "BMI": [20, 25, 30],
+    "MentHlth": [0, 5, 10],
+    "PhysHlth": [0, 5, 10],
+}
+""" Default thresholds of the columns binned into categories. """
+
+DTYPE_POLICIES = ("float64", "float32", "compact")
+"""
+Dtypes of the preprocessed matrix: "float64" as scikit-learn's encoders,
+"float32" as the tree models fit on, so they fit without converting it, and
+"compact" with uint8 one-hot, flag and ordinal columns and float32 numeric
+columns, i.e. uint8 without numeric columns and with one-hot encoded bins.
+"""
+
+SPARSE_INPUT_ESTIMATORS = {
+    "KNeighborsClassifier",
+    "LinearSVC",
+    "LogisticRegression",
+    "MLPClassifier",
+    "RandomOverSampler",
+    "RidgeClassifier",
+    "SMOTE",
+    "SVC",
+}
+"""
+Names of the estimators and samplers of the notebooks fitted on sparse
+matrices without densifying them. The tree models accept sparse matrices too,
+but fit several times slower on them than on dense arrays.
+"""
+
+
+def accepts_sparse(estimator: BaseEstimator) -> bool:
+    """
+    Returns whether an estimator, or all steps of a pipeline, are fitted on
+    the sparse output of 'build_preprocessor(sparse_output=True)' without
+    densifying it or slowing down, see 'SPARSE_INPUT_ESTIMATORS'.
+
+    Examples
+    --------
+    >>> preprocessor = build_preprocessor(sparse_output=accepts_sparse(classifier))
+    """
+    steps = [step for _, step in getattr(estimator, "steps", [(None, estimator)])]
+    return all(
+        step is None
+        or step == "passthrough"
+        or type(step).__name__ in SPARSE_INPUT_ESTIMATORS
+        for step in steps
+    )
+
+
+def build_preprocessor(
+    numeric_cols: Sequence[str] = (),
+    cat_gen_thresholds: Optional[Dict[str, List[float]]] = None,
+    cat_gen_encoding: Literal["onehot", "codes"] = "onehot",
+    missing_flags: bool = True,
+    nominal_cols: Sequence[str] = NOMINAL_COLS,
+    ordinal_cols: Sequence[str] = ORDINAL_COLS,
+    sparse_output: bool = False,
+    dtype_policy: Literal["float64", "float32", "compact"] = "float64",
+) -> ColumnTransformer:
+    """
+    Builds the preprocessing ColumnTransformer of the training notebooks.
+
+    Parameters
+    ----------
+    numeric_cols : sequence of str, default=()
+        Columns imputed by median and standard scaled.
+    cat_gen_thresholds : dict or None, default=None
+        Maps columns to thresholds, the columns are imputed by median and
+        binned into categories. None uses 'DEFAULT_CAT_GEN_THRESHOLDS', an
+        empty dict disables the binning. The thresholds can be tuned via the
+        parameter 'cg__cat_gen__thresholds'.
+    cat_gen_encoding : {"onehot", "codes"}, default="onehot"
+        Encoding of the bins, one-hot encoded with the first bin dropped or
+        as integer bin codes.
+    missing_flags : bool, default=True
+        Whether to add missing value flags for the numeric, ordinal and
+        nominal columns.
+    nominal_cols : sequence of str, default=NOMINAL_COLS
+        Columns imputed by most frequent value and one-hot encoded.
+    ordinal_cols : sequence of str, default=ORDINAL_COLS
+        Columns imputed by most frequent value and ordinal encoded in the
+        order of 'ORDINAL_ORDERS'.
+    sparse_output : bool, default=False
+        Whether the one-hot encoded columns and missing value flags are
+        sparse and the whole output is a CSR matrix, which stores only the
+        non-zero values. For estimators that 'accepts_sparse'.
+    dtype_policy : {"float64", "float32", "compact"}, default="float64"
+        Dtype of the output, see 'DTYPE_POLICIES'. The columns of all
+        transformers are in the dtype or a smaller one of exactly the same
+        values, so that concatenating them does not upcast.
+
+    Returns
+    -------
+    sklearn.compose.ColumnTransformer
+        Unfitted preprocessor with the transformers 'num', 'ord', 'nom', 'miss'
+        and 'cg'. Transformers without columns are left out.
+    """
+    if cat_gen_thresholds is None:
+        cat_gen_thresholds = DEFAULT_CAT_GEN_THRESHOLDS
+    if dtype_policy not in DTYPE_POLICIES:
+        raise ValueError(f"'dtype_policy' must be one of {DTYPE_POLICIES}.")
+    float_dtype = np.float64 if dtype_policy == "float64" else np.float32
+    code_dtype = np.uint8 if dtype_policy == "compact" else float_dtype
+
+    num_steps = [
+        ("impute", SimpleImputer(strategy="median")),
+        ("scale", StandardScaler()),
+    ]
+    if float_dtype != np.float64:
+        num_steps.append(("cast", CastTransformer(float_dtype)))
+    num_pipe = Pipeline(num_steps)
+
+    ordinal_pipe = Pipeline(
+        [
+            ("impute", SimpleImputer(strategy="most_frequent")),
+            (
+                "encode",
+                OrdinalEncoder(
+                    categories=[ORDINAL_ORDERS[c] for c in ordinal_cols],
+                    dtype=code_dtype,
+                ),
+            ),
+        ]
+    )
+
+    nominal_pipe = Pipeline(
+        [
+            ("impute", SimpleImputer(strategy="most_frequent")),
+            (
+                "ohe",
+                OneHotEncoder(
+                    handle_unknown="ignore",
+                    drop="first",
+                    sparse_output=sparse_output,
+                    dtype=code_dtype,
+                ),
+            ),
+        ]
+    )
+
+    missing_val_cols = [*numeric_cols, *ordinal_cols, *nominal_cols]
+    # Boolean flags would turn a pandas output of another dtype into objects.
+    flag_dtype = bool if dtype_policy == "float64" else code_dtype
+    missing_val_pipe = Pipeline(
+        [
+            (
+                "flags",
+                MissingFlagTransformer(dtype=flag_dtype, sparse_output=sparse_output),
+            )
+        ]
+    )
+
+    cat_gen_cols = list(cat_gen_thresholds)
+    thresholds = [cat_gen_thresholds[c] for c in cat_gen_cols]
+    if cat_gen_encoding == "onehot":
+        cat_gen = ThresholdOneHotEncoder(
+            thresholds, drop="first", sparse_output=sparse_output
+        )
+    elif cat_gen_encoding == "codes":
+        cat_gen = CategoryFromThresholdTransformer(thresholds, output="codes")
+    else:
+        raise ValueError("'cat_gen_encoding' must be either 'onehot' or 'codes'.")
+    cat_gen_pipe = Pipeline(
+        [("impute", SimpleImputer(strategy="median")), ("cat_gen", cat_gen)]
+    )
+
+    transformers = [
+        ("num", num_pipe, list(numeric_cols)),
+        ("ord", ordinal_pipe, list(ordinal_cols)),
+        ("nom", nominal_pipe, list(nominal_cols)),
+        ("miss", missing_val_pipe, missing_val_cols if missing_flags else []),
+        ("cg", cat_gen_pipe, cat_gen_cols),
+    ]
+
+    return ColumnTransformer(
+        transformers=[t for t in transformers if len(t[2]) > 0],
+        remainder="drop",
+        # The default threshold densifies outputs with more than 30% non-zeros.
+        sparse_threshold=1.0 if sparse_output else 0.3,
+    )
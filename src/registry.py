@@ -0,0 +1,292 @@
+"""
+Indexes the results of the saved models in a local SQLite database.
+
+Each model directory '<MODELS_DIR>/<model_name>' holds its results as
+'<model_name>.results.json', written by 'evaluate_classifier'. Instead of
+parsing all of them for each comparison, 'ModelRegistry' keeps the metadata
+and the flattened numeric values of the results in '<MODELS_DIR>/registry.sqlite'.
+'refresh' only stats the result files and parses the new and modified ones,
+'register' indexes one model right after it was saved.
+
+Nested keys of the results are joined by '__', e.g.
+"classification_report__dia__recall".
+"""
+
+import json
+import os
+import sqlite3
+from contextlib import closing
+from typing import Any, Dict, Iterator, Optional, Sequence, Tuple
+
+import pandas as pd
+
+from src.artifacts import ARTIFACT_SUFFIXES
+from src.config import MODELS_DIR
+
+REGISTRY_FILENAME = "registry.sqlite"
+""" Filename of the index in the models directory. """
+
+SCHEMA_VERSION = 1
+""" Version of the tables, an index of another version is rebuilt. """
+
+METADATA_KEYS = ["timestamp", "model_purpose", "model_class", "special_features"]
+""" Keys of the results stored as columns of the models table. """
+
+METRIC_KEYS = ["f1", "recall", "precision", "bal_accuracy", "roc_auc_score"]
+""" Default keys of the values returned by 'ModelRegistry.get_frame'. """
+
+KEY_SEPARATOR = "__"
+""" Separator of the parts of nested keys. """
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS models (
+    model_name TEXT PRIMARY KEY,
+    results_mtime_ns INTEGER NOT NULL,
+    results_size INTEGER NOT NULL,
+    timestamp TEXT,
+    model_purpose TEXT,
+    model_class TEXT,
+    special_features TEXT,
+    predicts TEXT,
+    predicts_key TEXT,
+    results TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS models_predicts_key ON models (predicts_key);
+CREATE TABLE IF NOT EXISTS model_values (
+    model_name TEXT NOT NULL REFERENCES models (model_name) ON DELETE CASCADE,
+    key TEXT NOT NULL,
+    value REAL,
+    PRIMARY KEY (key, model_name)
+) WITHOUT ROWID;
+"""
+
+
+def flatten_results(results: Dict[str, Any], prefix: str = "") -> Dict[str, float]:
+    """Returns the numeric values of nested results by their '__'-joined keys."""
+    values = {}
+    for key, value in results.items():
+        if isinstance(value, dict):
+            values |= flatten_results(value, f"{prefix}{key}{KEY_SEPARATOR}")
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            values[f"{prefix}{key}"] = float(value)
+    return values
+
+
+def get_predicts_key(predicts: Sequence[Any]) -> str:
+    """Returns the predicted classes in any order as comparable string."""
+    return ",".join(sorted(str(c) for c in predicts))
+
+
+def _get_results_path(models_dir: str, model_name: str) -> str:
+    return os.path.join(models_dir, model_name, f"{model_name}.results.json")
+
+
+def _stat_results(models_dir: str, model_name: str) -> Optional[os.stat_result]:
+    """Stats the results of a model, None if it has no results or classifier."""
+    try:
+        stat = os.stat(_get_results_path(models_dir, model_name))
+    except (FileNotFoundError, NotADirectoryError):
+        return None
+    classifier_path = os.path.join(
+        models_dir, model_name, f"{model_name}.{ARTIFACT_SUFFIXES['classifier']}"
+    )
+    return stat if os.path.exists(classifier_path) else None
+
+
+class ModelRegistry:
+    """
+    Index of the results of the saved models in a models directory.
+
+    Parameters
+    ----------
+    models_dir : str, default=MODELS_DIR
+        Directory of the model directories.
+    path : str or None, default=None
+        SQLite file of the index, None is 'REGISTRY_FILENAME' in 'models_dir'.
+    """
+
+    def __init__(self, models_dir: str = MODELS_DIR, path: Optional[str] = None):
+        self.models_dir = models_dir
+        self.path = path or os.path.join(models_dir, REGISTRY_FILENAME)
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.path)
+        connection.execute("PRAGMA foreign_keys = ON")
+        if connection.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+            connection.executescript(
+                "DROP TABLE IF EXISTS model_values; DROP TABLE IF EXISTS models;"
+            )
+            connection.executescript(_SCHEMA)
+            connection.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        return connection
+
+    def _index(
+        self, connection: sqlite3.Connection, model_name: str, stat: os.stat_result
+    ) -> None:
+        with open(_get_results_path(self.models_dir, model_name), "r") as f:
+            results = json.load(f)
+        predicts = results.get("predicts", [])
+        connection.execute("DELETE FROM models WHERE model_name = ?", (model_name,))
+        connection.execute(
+            "INSERT INTO models VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                model_name,
+                stat.st_mtime_ns,
+                stat.st_size,
+                *(
+                    str(results[key]) if results.get(key) is not None else None
+                    for key in METADATA_KEYS
+                ),
+                json.dumps(predicts),
+                get_predicts_key(predicts),
+                json.dumps(results),
+            ),
+        )
+        connection.executemany(
+            "INSERT INTO model_values VALUES (?, ?, ?)",
+            [
+                (model_name, key, value)
+                for key, value in flatten_results(results).items()
+            ],
+        )
+
+    def register(self, model_dir: str) -> None:
+        """Indexes the results of a saved model, e.g. right after saving it."""
+        model_name = os.path.basename(os.path.normpath(model_dir))
+        stat = os.stat(_get_results_path(self.models_dir, model_name))
+        with closing(self._connect()) as connection, connection:
+            self._index(connection, model_name, stat)
+
+    def refresh(self) -> int:
+        """
+        Indexes the new models and the models whose results file changed in
+        modification time or size, and drops the removed models.
+
+        Returns
+        -------
+        int
+            Number of (re-)indexed models.
+        """
+        with closing(self._connect()) as connection, connection:
+            indexed = {
+                name: (mtime_ns, size)
+                for name, mtime_ns, size in connection.execute(
+                    "SELECT model_name, results_mtime_ns, results_size FROM models"
+                )
+            }
+            n_indexed = 0
+            found = set()
+            for entry in os.scandir(self.models_dir):
+                stat = _stat_results(self.models_dir, entry.name)
+                if stat is None:
+                    continue
+                found.add(entry.name)
+                if indexed.get(entry.name) != (stat.st_mtime_ns, stat.st_size):
+                    self._index(connection, entry.name, stat)
+                    n_indexed += 1
+            connection.executemany(
+                "DELETE FROM models WHERE model_name = ?",
+                [(name,) for name in indexed.keys() - found],
+            )
+        return n_indexed
+
+    def get_frame(
+        self,
+        keys: Sequence[str] = METRIC_KEYS,
+        predicts: Optional[Sequence[str]] = None,
+        refresh: bool = True,
+    ) -> pd.DataFrame:
+        """
+        Returns the metadata and values of the indexed models.
+
+        Parameters
+        ----------
+        keys : sequence of str, default=METRIC_KEYS
+            Keys of the numeric values, nested keys joined by '__'. Missing
+            values are NaN.
+        predicts : sequence of str or None, default=None
+            Only models predicting these classes, in any order, are returned.
+        refresh : bool, default=True
+            Whether to 'refresh' the index first.
+
+        Returns
+        -------
+        pd.DataFrame
+            One row per model with "model_name", "model_dir", the
+            'METADATA_KEYS', "predicts" as list and the 'keys'.
+        """
+        if refresh:
+            self.refresh()
+        where, params = "", []
+        if predicts is not None:
+            where, params = "WHERE predicts_key = ?", [get_predicts_key(predicts)]
+        with closing(self._connect()) as connection:
+            df = pd.read_sql_query(
+                f"SELECT model_name, {', '.join(METADATA_KEYS)}, predicts"
+                f" FROM models {where} ORDER BY model_name",
+                connection,
+                params=params,
+            )
+            values = pd.read_sql_query(
+                "SELECT model_name, key, value FROM model_values"
+                f" WHERE key IN ({', '.join('?' * len(keys))})",
+                connection,
+                params=list(keys),
+            )
+
+        df.insert(
+            1,
+            "model_dir",
+            [os.path.join(self.models_dir, name) for name in df["model_name"]],
+        )
+        df["predicts"] = df["predicts"].map(json.loads)
+        values = values.pivot(index="model_name", columns="key", values="value")
+        return df.join(values.reindex(columns=list(keys)), on="model_name")
+
+    def top_k(
+        self,
+        metric: str = "f1",
+        k: int = 10,
+        predicts: Optional[Sequence[str]] = None,
+        refresh: bool = True,
+    ) -> pd.DataFrame:
+        """
+        Returns the 'k' models with the highest value of 'metric', e.g. the
+        top 5 by f1 of the models predicting ["dia", "no dia"], see 'get_frame'.
+        """
+        keys = list(dict.fromkeys([metric, *METRIC_KEYS]))
+        df = self.get_frame(keys, predicts, refresh)
+        return df.dropna(subset=[metric]).nlargest(k, metric).reset_index(drop=True)
+
+    def iter_results(self, refresh: bool = True) -> Iterator[Tuple[str, dict]]:
+        """Yields the directory and the results of each indexed model, in name order."""
+        if refresh:
+            self.refresh()
+        with closing(self._connect()) as connection:
+            rows = connection.execute(
+                "SELECT model_name, results FROM models ORDER BY model_name"
+            ).fetchall()
+        for model_name, results in rows:
+            yield os.path.join(self.models_dir, model_name), json.loads(results)
+
+
+def find_best_model_dir(
+    models_dir: str = MODELS_DIR,
+    metric: str = "f1",
+    predicts: Optional[Sequence[str]] = None,
+) -> str:
+    """
+    Returns the directory of the model with the highest value of a metric in
+    its results, see 'ModelRegistry.top_k'.
+
+    Raises
+    ------
+    FileNotFoundError
+        If no model directory has results with the metric.
+    """
+    df = ModelRegistry(models_dir).top_k(metric, 1, predicts)
+    if df.empty:
+        raise FileNotFoundError(
+            f"No model in '{models_dir}' has results with '{metric}'."
+        )
+    return df["model_dir"].iloc[0]
@@ -0,0 +1,224 @@
+"""
+Oversampling of the training folds without copying their rows.
+
+'RandomOverSampler' appends copies of randomly drawn minority rows to every
+training fold. 'OverSampledClassifier' draws the same rows with the same
+random state, but fits its estimator on the original rows weighted by how
+often each row would be in the oversampled data. The fold matrices, e.g. the
+memory-mapped ones of 'FoldMatrixStore', are passed on as they are.
+
+SMOTE synthesizes new rows, which have to be stored, but most of its fit time
+is the nearest neighbor search within each minority class. Passed as
+'k_neighbors' of 'SMOTE' or 'SMOTENC', 'CachedNearestNeighbors' stores the
+neighbors of the rows of a class on disk, keyed by their content. The trials
+of a study with the same preprocessing of a fold reuse them:
+
+    SMOTE(k_neighbors=CachedNearestNeighbors(n_neighbors=6), random_state=5)
+"""
+
+import os
+from typing import Any, Optional
+
+import joblib
+import numpy as np
+from imblearn.utils import check_sampling_strategy
+from sklearn.base import BaseEstimator, ClassifierMixin, MetaEstimatorMixin, clone
+from sklearn.neighbors import NearestNeighbors
+from sklearn.utils import check_random_state
+from sklearn.utils.metaestimators import available_if
+from sklearn.utils.validation import has_fit_parameter
+
+from src.cache import fingerprint_data
+from src.config import CACHE_DIR
+
+
+def get_oversampling_weights(
+    y: Any, sampling_strategy: Any = "auto", random_state: Any = None
+) -> np.ndarray:
+    """
+    Returns how often each row is in the output of a 'RandomOverSampler' of
+    the same 'sampling_strategy' and 'random_state', without shrinkage.
+
+    Returns
+    -------
+    np.ndarray
+        Weight of each row, 1 plus the number of times it is drawn.
+    """
+    y = np.asarray(y)
+    random_state = check_random_state(random_state)
+    weights = np.ones(len(y))
+    # The classes and draws in the order of 'RandomOverSampler._fit_resample'.
+    for class_sample, n_samples in check_sampling_strategy(
+        sampling_strategy, y, "over-sampling"
+    ).items():
+        drawn = random_state.choice(
+            np.flatnonzero(y == class_sample), size=n_samples, replace=True
+        )
+        weights += np.bincount(drawn, minlength=len(y))
+    return weights
+
+
+def _estimator_has(attr: str):
+    def check(self):
+        return hasattr(self.estimator, attr)
+
+    return check
+
+
+class OverSampledClassifier(ClassifierMixin, MetaEstimatorMixin, BaseEstimator):
+    """
+    Fits a classifier on randomly oversampled rows as sample weights.
+
+    The weights are the multiplicities of the rows in the output of
+    'RandomOverSampler', see 'get_oversampling_weights'. The fit is the same
+    as on the oversampled rows for estimators whose loss sums over the rows,
+    e.g. 'LogisticRegression'. Tree models see the same weighted classes, but
+    bootstrap from and count 'min_samples_leaf' in the distinct rows.
+
+    Parameters
+    ----------
+    estimator : BaseEstimator
+        Classifier with a 'sample_weight' parameter of 'fit'.
+    sampling_strategy : float, str, dict or callable, default="auto"
+        Sampling strategy as for 'RandomOverSampler'.
+    random_state : int, RandomState or None, default=None
+        Random state of the drawn rows, as for 'RandomOverSampler'.
+
+    Attributes
+    ----------
+    estimator_ : BaseEstimator
+        The fitted clone of 'estimator'.
+    classes_ : np.ndarray
+        Classes of the fitted estimator.
+    """
+
+    def __init__(
+        self,
+        estimator: BaseEstimator,
+        sampling_strategy: Any = "auto",
+        random_state: Any = None,
+    ):
+        self.estimator = estimator
+        self.sampling_strategy = sampling_strategy
+        self.random_state = random_state
+
+    def fit(
+        self, X: Any, y: Any, sample_weight: Optional[np.ndarray] = None
+    ) -> "OverSampledClassifier":
+        if not has_fit_parameter(self.estimator, "sample_weight"):
+            raise TypeError(
+                f"'{type(self.estimator).__name__}' does not support sample weights."
+            )
+        weights = get_oversampling_weights(y, self.sampling_strategy, self.random_state)
+        if sample_weight is not None:
+            weights *= sample_weight
+
+        self.estimator_ = clone(self.estimator).fit(X, y, sample_weight=weights)
+        self.classes_ = self.estimator_.classes_
+        return self
+
+    @available_if(_estimator_has("predict"))
+    def predict(self, X: Any) -> np.ndarray:
+        return self.estimator_.predict(X)
+
+    @available_if(_estimator_has("predict_proba"))
+    def predict_proba(self, X: Any) -> np.ndarray:
+        return self.estimator_.predict_proba(X)
+
+    @available_if(_estimator_has("decision_function"))
+    def decision_function(self, X: Any) -> np.ndarray:
+        return self.estimator_.decision_function(X)
+
+
+class CachedNearestNeighbors(NearestNeighbors):
+    """
+    NearestNeighbors which caches the neighbors of its fitted rows on disk.
+
+    'kneighbors' of the fitted rows themselves, without distances, as SMOTE
+    queries them, returns the neighbors stored for rows of the same content
+    and parameters, or computes and stores them. Other queries fit the
+    neighbors search on the rows first.
+
+    Parameters
+    ----------
+    n_neighbors : int, default=6
+        Number of neighbors including the row itself, i.e. 'k_neighbors + 1'
+        of SMOTE.
+    cache_dir : str or None, default=None
+        Directory of the cached neighbors. None uses 'CACHE_DIR/neighbors'.
+
+    The other parameters are those of 'NearestNeighbors'.
+    """
+
+    def __init__(
+        self,
+        n_neighbors: int = 6,
+        *,
+        radius: float = 1.0,
+        algorithm: str = "auto",
+        leaf_size: int = 30,
+        metric: Any = "minkowski",
+        p: float = 2,
+        metric_params: Optional[dict] = None,
+        n_jobs: Optional[int] = None,
+        cache_dir: Optional[str] = None,
+    ):
+        super().__init__(
+            n_neighbors=n_neighbors,
+            radius=radius,
+            algorithm=algorithm,
+            leaf_size=leaf_size,
+            metric=metric,
+            p=p,
+            metric_params=metric_params,
+            n_jobs=n_jobs,
+        )
+        self.cache_dir = cache_dir
+
+    def fit(self, X: Any, y: Any = None) -> "CachedNearestNeighbors":
+        # The search is only fitted if the neighbors are not cached.
+        self._fit_input = X
+        self._is_search_fitted = False
+        return self
+
+    def _fit_search(self) -> None:
+        if not self._is_search_fitted:
+            super().fit(self._fit_input)
+            self._is_search_fitted = True
+
+    def _get_cache_path(self) -> str:
+        cache_dir = (
+            self.cache_dir
+            if self.cache_dir is not None
+            else os.path.join(CACHE_DIR, "neighbors")
+        )
+        key = joblib.hash((fingerprint_data(self._fit_input), self.get_params()))
+        return os.path.join(cache_dir, f"{key}.npy")
+
+    def kneighbors(
+        self, X: Any = None, n_neighbors: Optional[int] = None, return_distance=True
+    ) -> Any:
+        if (
+            X is not self._fit_input
+            or return_distance
+            or n_neighbors not in (None, self.n_neighbors)
+        ):
+            self._fit_search()
+            return super().kneighbors(X, n_neighbors, return_distance)
+
+        path = self._get_cache_path()
+        if os.path.exists(path):
+            return np.load(path)
+
+        self._fit_search()
+        neighbors = super().kneighbors(X, return_distance=False)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.save(f, neighbors)
+        os.replace(tmp_path, path)
+        return neighbors
+
+    def radius_neighbors(self, *args, **kwargs) -> Any:
+        self._fit_search()
+        return super().radius_neighbors(*args, **kwargs)
@@ -0,0 +1,333 @@
+"""
+Declarative schema of the BRFSS columns used in this project.
+
+Each column lists its source column in the original file, its code to value
+mapping, its missing codes and, for ordinal columns, the order of its values.
+The schema is compiled once into NumPy lookup tables, which decode whole
+columns with one vectorized pass.
+
+The recode decisions are inspired by Alex Teboul's work, see the disclaimer in
+'data/scripts/transform_data.py'.
+"""
+
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Literal, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+@dataclass(frozen=True)
+class ColumnSpec:
+    """
+    Describes how a column of the original BRFSS file is decoded.
+
+    Attributes
+    ----------
+    name : str
+        Name of the column in the transformed data.
+    source : str
+        Name of the column in the original data.
+    kind : {"target", "nominal", "ordinal", "numeric"}
+        Kind of the column.
+    value_map : dict
+        Maps codes to values. For categorical kinds the order of the values is
+        the order of the categories, codes not listed become missing values.
+        For numeric columns codes not listed are kept as they are.
+    missing_codes : tuple of int
+        Codes for don't know, refused or missing, decoded as missing values.
+    divisor : float or None
+        Numeric values are divided by it, e.g. 100 for 'BMI * 100'.
+    decimals : int or None
+        Numeric values are rounded to this number of decimals.
+    """
+
+    name: str
+    source: str
+    kind: Literal["target", "nominal", "ordinal", "numeric"]
+    value_map: Dict[int, Any] = field(default_factory=dict)
+    missing_codes: Tuple[int, ...] = ()
+    divisor: Optional[float] = None
+    decimals: Optional[int] = None
+
+    @property
+    def categories(self) -> List[Any]:
+        """Distinct values of 'value_map' in order of first occurrence."""
+        return list(dict.fromkeys(self.value_map.values()))
+
+
+COLUMNS = [
+    # DIABETE3
+    # going to make this ordinal. 0 is for no diabetes or only during pregnancy
+    # 1 is for pre-diabetes or borderline diabetes, 2 is for yes diabetes
+    # Remove all 7 (dont knows)
+    # Remove all 9 (refused)
+    # Rows with a missing target are removed, see 'decode_frame'.
+    ColumnSpec(
+        "Diabetes_012",
+        "DIABETE3",
+        "target",
+        {2: "no dia", 3: "no dia", 1: "pre", 4: "dia"},
+        (7, 9),
+    ),
+    # 1 _RFHYPE5
+    # Change 1 to 0 so it represetnts No high blood pressure and
+    # 2 to 1 so it represents high blood pressure
+    ColumnSpec("HighBP", "_RFHYPE5", "nominal", {1: "n", 2: "y"}, (9,)),
+    # 2 TOLDHI2
+    # Change 2 to 0 because it is No
+    # Remove all 7 (dont knows)
+    # Remove all 9 (refused)
+    ColumnSpec("HighChol", "TOLDHI2", "nominal", {1: "y", 2: "n"}, (7, 9)),
+    # 3 _CHOLCHK
+    # Change 3 to 0 and 2 to 0 for Not checked cholesterol in past 5 years
+    # Remove 9
+    ColumnSpec("CholCheck", "_CHOLCHK", "nominal", {1: "y", 3: "n", 2: "n"}, (9,)),
+    # 4 _BMI5 (no changes, just note that these are BMI * 100.
+    # So for example a BMI of 4018 is really 40.18)
+    ColumnSpec("BMI", "_BMI5", "numeric", divisor=100, decimals=2),
+    # 5 SMOKE100
+    # Change 2 to 0 because it is No
+    # Remove all 7 (dont knows)
+    # Remove all 9 (refused)
+    ColumnSpec("Smoker", "SMOKE100", "nominal", {1: "y", 2: "n"}, (7, 9)),
+    # 6 CVDSTRK3
+    # Change 2 to 0 because it is No
+    # Remove all 7 (dont knows)
+    # Remove all 9 (refused)
+    ColumnSpec("Stroke", "CVDSTRK3", "nominal", {1: "y", 2: "n"}, (7, 9)),
+    # 7 _MICHD
+    # Change 2 to 0 because this means did not have MI or CHD
+    ColumnSpec("HeartDiseaseorAttack", "_MICHD", "nominal", {1: "y", 2: "n"}),
+    # 8 _TOTINDA
+    # 1 for physical activity
+    # change 2 to 0 for no physical activity
+    # Remove all 9 (don't know/refused)
+    ColumnSpec("PhysActivity", "_TOTINDA", "nominal", {1: "y", 2: "n"}, (9,)),
+    # 9 _FRTLT1
+    # Change 2 to 0. this means no fruit consumed per day.
+    # 1 will mean consumed 1 or more pieces of fruit per day
+    # remove all dont knows and missing 9
+    ColumnSpec("Fruits", "_FRTLT1", "nominal", {1: "y", 2: "n"}, (9,)),
+    # 10 _VEGLT1
+    # Change 2 to 0. this means no vegetables consumed per day.
+    # 1 will mean consumed 1 or more pieces of vegetable per day
+    # remove all dont knows and missing 9
+    ColumnSpec("Veggies", "_VEGLT1", "nominal", {1: "y", 2: "n"}, (9,)),
+    # 11 _RFDRHV5
+    # Change 1 to 0 (1 was no for heavy drinking).
+    # Change all 2 to 1 (2 was yes for heavy drinking)
+    # remove all dont knows and missing 9
+    ColumnSpec("HvyAlcoholConsump", "_RFDRHV5", "nominal", {1: "n", 2: "y"}, (9,)),
+    # 12 HLTHPLN1
+    # 1 is yes, change 2 to 0 because it is No health care access
+    # remove 7 and 9 for don't know or refused
+    ColumnSpec("AnyHealthcare", "HLTHPLN1", "nominal", {1: "y", 2: "n"}, (7, 9)),
+    # 13 MEDCOST
+    # Change 2 to 0 for no, 1 is already yes
+    # remove 7 for don/t know and 9 for refused
+    ColumnSpec("NoDocbcCost", "MEDCOST", "nominal", {1: "y", 2: "n"}, (7, 9)),
+    # 14 GENHLTH
+    # This is an ordinal variable that I want to keep (1 is Excellent -> 5 is Poor)
+    # Remove 7 and 9 for don't know and refused
+    ColumnSpec(
+        "GenHlth",
+        "GENHLTH",
+        "ordinal",
+        {1: "excellent", 2: "very good", 3: "good", 4: "fair", 5: "poor"},
+        (7, 9),
+    ),
+    # 15 MENTHLTH
+    # already in days so keep that, scale will be 0-30
+    # change 88 to 0 because it means none (no bad mental health days)
+    # remove 77 and 99 for don't know not sure and refused
+    ColumnSpec("MentHlth", "MENTHLTH", "numeric", {88: 0}, (77, 99)),
+    # 16 PHYSHLTH
+    # already in days so keep that, scale will be 0-30
+    # change 88 to 0 because it means none (no bad mental health days)
+    # remove 77 and 99 for don't know not sure and refused
+    ColumnSpec("PhysHlth", "PHYSHLTH", "numeric", {88: 0}, (77, 99)),
+    # 17 DIFFWALK
+    # change 2 to 0 for no. 1 is already yes
+    # remove 7 and 9 for don't know not sure and refused
+    ColumnSpec("DiffWalk", "DIFFWALK", "nominal", {1: "y", 2: "n"}, (7, 9)),
+    # 18 SEX
+    # in other words - is respondent male (somewhat arbitrarily chose this change
+    # because men are at higher risk for heart disease)
+    # change 2 to 0 (female as 0). Male is 1
+    ColumnSpec("Sex", "SEX", "nominal", {1: "m", 2: "f"}),
+    # 19 _AGEG5YR
+    # already ordinal. 1 is 18-24 all the way up to 13 wis 80 and older. 5 year increments.
+    # remove 14 because it is don't know or missing
+    ColumnSpec(
+        "Age",
+        "_AGEG5YR",
+        "ordinal",
+        {
+            1: "18-24",
+            2: "25-29",
+            3: "30-34",
+            4: "35-39",
+            5: "40-44",
+            6: "45-49",
+            7: "50-54",
+            8: "55-59",
+            9: "60-64",
+            10: "65-69",
+            11: "70-74",
+            12: "75-79",
+            13: "80+",
+        },
+        (14,),
+    ),
+    # 20 EDUCA
+    # This is already an ordinal variable with 1 being never attended school or
+    # kindergarten only up to 6 being college 4 years or more
+    # Scale here is 1-6
+    # Remove 9 for refused:
+    ColumnSpec(
+        "Education",
+        "EDUCA",
+        "ordinal",
+        {
+            1: "no school",
+            2: "elementary",
+            3: "some high school",
+            4: "high school graduate",
+            5: "college",
+            6: "college graduate",
+        },
+        (9,),
+    ),
+    # 21 INCOME2
+    # Variable is already ordinal with 1 being less than $10,000 all the way up to 8 being $75,000 or more
+    # Remove 77 and 99 for don't know and refused
+    ColumnSpec(
+        "Income",
+        "INCOME2",
+        "ordinal",
+        {
+            1: "<$10k",
+            2: "<$15k",
+            3: "<$20k",
+            4: "<$25k",
+            5: "<$35k",
+            6: "<$50k",
+            7: "<$75k",
+            8: ">$75k",
+        },
+        (77, 88, 99),
+    ),
+]
+""" Specifications of all columns in order of the transformed data. """
+
+COLUMNS_BY_NAME = {spec.name: spec for spec in COLUMNS}
+""" Specifications of all columns by name in the transformed data. """
+
+TARGET_COL = next(spec.name for spec in COLUMNS if spec.kind == "target")
+""" Name of the target column. """
+NOMINAL_COLS = [spec.name for spec in COLUMNS if spec.kind == "nominal"]
+""" Names of the nominal feature columns. """
+ORDINAL_COLS = [spec.name for spec in COLUMNS if spec.kind == "ordinal"]
+""" Names of the ordinal feature columns. """
+NUMERIC_COLS = [spec.name for spec in COLUMNS if spec.kind == "numeric"]
+""" Names of the numeric feature columns. """
+ORDINAL_ORDERS = {name: COLUMNS_BY_NAME[name].categories for name in ORDINAL_COLS}
+""" Values of the ordinal columns in ascending order. """
+
+SOURCE_DTYPES = {spec.source: "float32" for spec in COLUMNS}
+"""
+Dtypes to read the original data with. All source columns hold small integer
+codes or missing values, which 'float32' represents exactly.
+"""
+
+
+@dataclass(frozen=True)
+class CompiledColumn:
+    """
+    Lookup table of a column, indexed by its integer codes.
+
+    For categorical kinds the table holds the category index (-1 for missing),
+    for numeric kinds the decoded value (NaN for missing). Numeric values
+    outside the table are kept.
+    """
+
+    spec: ColumnSpec
+    lookup: np.ndarray
+
+    def decode(self, values: np.ndarray) -> np.ndarray:
+        """Decodes an array of float codes, NaN is treated as missing."""
+        values = np.asarray(values)
+        # Comparisons with NaN are False, so missing values are never looked up.
+        in_table = (values >= 0) & (values < len(self.lookup))
+
+        if self.spec.kind == "numeric":
+            result = values.copy()
+            in_table &= values == np.floor(values)
+        else:
+            result = np.full(len(values), -1, dtype=self.lookup.dtype)
+        result[in_table] = self.lookup[values[in_table].astype(np.intp)]
+
+        if self.spec.divisor is not None:
+            result = result.astype(np.float64) / self.spec.divisor
+        if self.spec.decimals is not None:
+            result = result.round(self.spec.decimals)
+        return result
+
+    def decode_series(self, values: np.ndarray) -> pd.Categorical | np.ndarray:
+        """Decodes an array of float codes into a categorical or numeric array."""
+        decoded = self.decode(values)
+        if self.spec.kind == "numeric":
+            return decoded
+        return pd.Categorical.from_codes(decoded, categories=self.spec.categories)
+
+
+def compile_column(spec: ColumnSpec) -> CompiledColumn:
+    """Compiles the mappings of a column specification into a lookup table."""
+    codes = [*spec.value_map, *spec.missing_codes]
+    size = max(codes) + 1 if codes else 0
+
+    if spec.kind == "numeric":
+        lookup = np.arange(size, dtype=np.float32)
+        for code, value in spec.value_map.items():
+            lookup[code] = value
+        lookup[list(spec.missing_codes)] = np.nan
+    else:
+        categories = spec.categories
+        lookup = np.full(size, -1, dtype=np.int8)
+        for code, value in spec.value_map.items():
+            lookup[code] = categories.index(value)
+
+    return CompiledColumn(spec, lookup)
+
+
+COMPILED_COLUMNS = {spec.name: compile_column(spec) for spec in COLUMNS}
+""" Compiled lookup tables of all columns by name in the transformed data. """
+
+
+def decode_frame(df_orig: pd.DataFrame) -> pd.DataFrame:
+    """
+    Decodes (a chunk of) the original data into the transformed data.
+
+    Parameters
+    ----------
+    df_orig : pd.DataFrame
+        Original data containing all source columns of 'COLUMNS'.
+
+    Returns
+    -------
+    pd.DataFrame
+        Transformed data with categorical and numeric columns in order of
+        'COLUMNS'. Rows with a missing target are removed.
+    """
+    target = COMPILED_COLUMNS[TARGET_COL]
+    keep = target.decode(df_orig[target.spec.source].to_numpy()) >= 0
+
+    return pd.DataFrame(
+        {
+            spec.name: COMPILED_COLUMNS[spec.name].decode_series(
+                df_orig[spec.source].to_numpy()[keep]
+            )
+            for spec in COLUMNS
+        }
+    )
@@ -0,0 +1,238 @@
+"""
+Scores files of BRFSS respondents with a saved model.
+
+The input file has the columns of the raw data, as written by
+'data/scripts/transform_data.py', in CSV, Parquet or Feather format. It is
+read in chunks, each chunk is preprocessed and classified and its predictions
+are appended to the output file, so that the memory depends on the chunk
+size, not on the size of the file. Chunks are scored in parallel by worker
+processes, which load the model once and keep it for their following chunks.
+
+Run from the project root, e.g.:
+
+    python -m src.score --model-dir models/<model_name> --input respondents.parquet
+        --output predictions.parquet
+"""
+
+import argparse
+import os
+import time
+from typing import Iterator, List, Optional, Sequence
+
+import joblib
+import numpy as np
+import pandas as pd
+import pyarrow.feather as feather
+import pyarrow.parquet as pq
+
+from src.artifacts import load_model_artifact
+from src.datasets import DTYPES, LABEL_COLS, STORAGE_EXTENSIONS, DatasetWriter
+
+CHUNK_ROWS = 100_000
+""" Default number of rows read and scored at once. """
+
+PREDICTION_COL = "prediction"
+""" Column of the predicted class label in the output file. """
+
+PROBA_COL_PREFIX = "proba_"
+""" Prefix of the columns of the class probabilities in the output file. """
+
+
+def get_storage_format(path: str) -> str:
+    """Returns the storage format of a data file by its extension."""
+    extension = os.path.splitext(path)[1].lower()
+    for storage_format, format_extension in STORAGE_EXTENSIONS.items():
+        if extension == format_extension:
+            return storage_format
+    raise ValueError(
+        f"Unknown extension of '{path}', expected one of"
+        f" {list(STORAGE_EXTENSIONS.values())}."
+    )
+
+
+def iter_chunks(
+    path: str, chunk_rows: int = CHUNK_ROWS, columns: Optional[Sequence[str]] = None
+) -> Iterator[pd.DataFrame]:
+    """
+    Reads a CSV, Parquet or Feather file in chunks of at most 'chunk_rows'
+    rows, with the dtypes of the schema. Only 'columns' are read, if given.
+    """
+    storage_format = get_storage_format(path)
+    columns = list(columns) if columns is not None else None
+
+    if storage_format == "csv":
+        batches = pd.read_csv(path, usecols=columns, dtype=DTYPES, chunksize=chunk_rows)
+    elif storage_format == "parquet":
+        batches = (
+            batch.to_pandas()
+            for batch in pq.ParquetFile(path).iter_batches(
+                batch_size=chunk_rows, columns=columns
+            )
+        )
+    else:
+        table = feather.read_table(path, columns=columns, memory_map=True)
+        batches = (batch.to_pandas() for batch in table.to_batches(chunk_rows))
+
+    for chunk in batches:
+        # Files written by other tools may lack the categorical dtypes.
+        yield chunk.astype(
+            {
+                c: DTYPES[c]
+                for c in chunk.columns
+                if c in DTYPES and c not in LABEL_COLS and chunk[c].dtype != DTYPES[c]
+            }
+        )
+
+
+def score_chunk(
+    model_dir: str,
+    chunk: pd.DataFrame,
+    id_cols: Sequence[str] = (),
+    mmap_mode: Optional[str] = None,
+) -> pd.DataFrame:
+    """
+    Predicts the class and the class probabilities of the rows of a chunk.
+
+    The model is loaded with 'load_model_artifact', whose cache keeps it in
+    the process for the following chunks.
+
+    Returns
+    -------
+    pd.DataFrame
+        The 'id_cols' of the chunk, the decoded predicted class in
+        'PREDICTION_COL' and the probability of each class in
+        'PROBA_COL_PREFIX<class>'.
+    """
+    artifact = load_model_artifact(model_dir, mmap_mode=mmap_mode)
+    features = artifact.preprocessor.transform(chunk)
+    proba = artifact.classifier.predict_proba(features)
+
+    classes = artifact.classifier.classes_
+    if artifact.label_encoder is not None:
+        classes = artifact.label_encoder.inverse_transform(classes)
+    predictions = classes.take(np.argmax(proba, axis=1), axis=0)
+
+    result = chunk[list(id_cols)].reset_index(drop=True)
+    result[PREDICTION_COL] = predictions
+    for i, label in enumerate(classes):
+        result[f"{PROBA_COL_PREFIX}{label}"] = proba[:, i]
+    return result
+
+
+def _get_input_columns(model_dir: str, id_cols: Sequence[str]) -> Optional[List[str]]:
+    """Returns the columns to read, None if the preprocessor does not name them."""
+    preprocessor = load_model_artifact(model_dir).preprocessor
+    if not hasattr(preprocessor, "feature_names_in_"):
+        return None
+    return list(dict.fromkeys([*id_cols, *preprocessor.feature_names_in_]))
+
+
+def score_file(
+    model_dir: str,
+    input_path: str,
+    output_path: str,
+    chunk_rows: int = CHUNK_ROWS,
+    n_jobs: Optional[int] = None,
+    id_cols: Sequence[str] = (),
+    mmap_mode: Optional[str] = None,
+) -> int:
+    """
+    Scores a data file with a saved model and writes the predictions.
+
+    Parameters
+    ----------
+    model_dir : str
+        Directory of the model, see 'src/artifacts.py'.
+    input_path : str
+        CSV, Parquet or Feather file with the feature columns of the raw data.
+    output_path : str
+        CSV, Parquet or Feather file of the predictions, in the order of the
+        input rows. It is written to a temporary file first.
+    chunk_rows : int, default=CHUNK_ROWS
+        Number of rows read and scored at once.
+    n_jobs : int or None, default=None
+        Number of worker processes scoring chunks in parallel, -1 uses all
+        cores. At most twice as many chunks are read ahead.
+    id_cols : sequence of str, default=()
+        Input columns copied to the output, e.g. a respondent id.
+    mmap_mode : str or None, default=None
+        Passed to 'load_model_artifact' in each worker.
+
+    Returns
+    -------
+    int
+        Number of scored rows.
+    """
+    columns = _get_input_columns(model_dir, id_cols)
+    chunks = iter_chunks(input_path, chunk_rows, columns)
+
+    results = joblib.Parallel(
+        n_jobs=n_jobs, return_as="generator", pre_dispatch="2*n_jobs"
+    )(
+        joblib.delayed(score_chunk)(model_dir, chunk, id_cols, mmap_mode)
+        for chunk in chunks
+    )
+
+    output_dir, output_filename = os.path.split(os.path.abspath(output_path))
+    with DatasetWriter(
+        output_dir,
+        os.path.splitext(output_filename)[0],
+        get_storage_format(output_path),
+    ) as writer:
+        for result in results:
+            writer.write(result)
+    return writer.n_rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Scores a file of BRFSS respondents with a saved model."
+    )
+    parser.add_argument(
+        "--model-dir", required=True, help="Directory of the saved model."
+    )
+    parser.add_argument(
+        "--input", required=True, help="CSV, Parquet or Feather file to score."
+    )
+    parser.add_argument(
+        "--output",
+        required=True,
+        help="CSV, Parquet or Feather file of the predictions.",
+    )
+    parser.add_argument(
+        "--chunk-rows",
+        type=int,
+        default=CHUNK_ROWS,
+        help="Number of rows scored at once, bounds the peak memory.",
+    )
+    parser.add_argument(
+        "--n-jobs",
+        type=int,
+        default=-1,
+        help="Number of worker processes, -1 uses all cores.",
+    )
+    parser.add_argument(
+        "--id-cols",
+        nargs="*",
+        default=[],
+        help="Input columns copied to the output, e.g. a respondent id.",
+    )
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    n_rows = score_file(
+        args.model_dir,
+        args.input,
+        args.output,
+        chunk_rows=args.chunk_rows,
+        n_jobs=args.n_jobs,
+        id_cols=args.id_cols,
+    )
+    print(
+        f"✅ Scored {n_rows} rows into '{args.output}'"
+        f" in {time.perf_counter() - start:.1f} s"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,383 @@
+"""
+Serves a saved model over HTTP for scoring single respondents.
+
+Preprocessing and classifying a DataFrame has a fixed cost of milliseconds,
+whatever its number of rows. 'MicroBatcher' therefore collects the records
+of concurrent requests for at most 'max_wait_ms' milliseconds and scores them
+as one DataFrame. The records of each request are cast to the raw feature
+dtypes before, so that an invalid request fails alone with status 400. The
+model is loaded and scored once at startup, so that the first request does
+not pay for it.
+
+Endpoints:
+
+- 'POST /predict' with a JSON record of the raw feature columns or a list of
+  records, returns the predicted class and class probabilities of each.
+- 'GET /metrics' returns the p50/p99 latency, the throughput and the batch
+  sizes of the recent requests.
+- 'GET /health' returns the name of the served model.
+
+Run from the project root, e.g.:
+
+    python -m src.serving --port 8000
+
+The standard library server is meant for local use, not for exposure to a
+network.
+"""
+
+import argparse
+import json
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from src.artifacts import get_model_name, load_model_artifact
+from src.datasets import DTYPES
+from src.registry import find_best_model_dir
+from src.score import PREDICTION_COL, PROBA_COL_PREFIX, score_chunk
+
+MAX_BATCH_SIZE = 256
+""" Default maximum number of records scored at once. """
+
+MAX_WAIT_MS = 2.0
+""" Default time in milliseconds a batch waits for further records. """
+
+Record = Dict[str, Any]
+
+
+class LatencyMetrics:
+    """
+    Latencies and batch sizes of the recent requests, thread-safe.
+
+    Parameters
+    ----------
+    window : int, default=10000
+        Number of recent requests and batches the metrics are computed of.
+    """
+
+    def __init__(self, window: int = 10000):
+        self._lock = threading.Lock()
+        self._requests: deque = deque(maxlen=window)
+        self._batch_sizes: deque = deque(maxlen=window)
+        self.n_requests = 0
+        self.n_errors = 0
+
+    def add_request(self, latency_sec: float, failed: bool = False) -> None:
+        with self._lock:
+            self._requests.append((time.perf_counter(), latency_sec))
+            self.n_requests += 1
+            self.n_errors += failed
+
+    def add_batch(self, n_records: int) -> None:
+        with self._lock:
+            self._batch_sizes.append(n_records)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Returns the metrics of the requests in the window."""
+        with self._lock:
+            requests = list(self._requests)
+            batch_sizes = list(self._batch_sizes)
+            n_requests, n_errors = self.n_requests, self.n_errors
+
+        metrics = {"n_requests": n_requests, "n_errors": n_errors}
+        if requests:
+            finished, latencies = np.array(requests).T
+            p50, p99 = np.percentile(latencies * 1000.0, [50, 99])
+            duration = finished[-1] - finished[0]
+            metrics |= {
+                "latency_p50_ms": float(p50),
+                "latency_p99_ms": float(p99),
+                "throughput_rps": (
+                    float((len(requests) - 1) / duration) if duration > 0 else None
+                ),
+            }
+        if batch_sizes:
+            metrics |= {
+                "mean_batch_size": float(np.mean(batch_sizes)),
+                "max_batch_size": int(np.max(batch_sizes)),
+            }
+        return metrics
+
+
+class MicroBatcher:
+    """
+    Collects records submitted by concurrent threads into batches, which a
+    background thread scores at once.
+
+    A batch is scored when it holds 'max_batch_size' records or when
+    'max_wait_ms' milliseconds passed since its first record arrived.
+
+    Parameters
+    ----------
+    score_batch : callable
+        Scores the submitted records of a batch, a list of one sized
+        container, e.g. a DataFrame, per submit, and returns one result per
+        record in order.
+    max_batch_size : int, default=MAX_BATCH_SIZE
+        Maximum number of records of a batch.
+    max_wait_ms : float, default=MAX_WAIT_MS
+        Maximum time a record waits for further records, 0 scores the
+        records that arrived meanwhile without waiting.
+    metrics : LatencyMetrics or None, default=None
+        Records the sizes of the batches.
+    """
+
+    def __init__(
+        self,
+        score_batch: Callable[[List[Any]], List[Any]],
+        max_batch_size: int = MAX_BATCH_SIZE,
+        max_wait_ms: float = MAX_WAIT_MS,
+        metrics: Optional[LatencyMetrics] = None,
+    ):
+        self.score_batch = score_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self.metrics = metrics
+        self._queue: queue.Queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, records: Any) -> Future:
+        """Queues records, the future returns their results in order."""
+        future: Future = Future()
+        self._queue.put((records, future))
+        return future
+
+    def close(self) -> None:
+        """Scores the queued records and stops the background thread."""
+        self._queue.put(None)
+        self._thread.join()
+
+    def _collect(self) -> Optional[List[tuple]]:
+        item = self._queue.get()
+        if item is None:
+            return None
+        items = [item]
+        n_records = len(item[0])
+        deadline = time.perf_counter() + self.max_wait_ms / 1000.0
+        while n_records < self.max_batch_size:
+            try:
+                timeout = max(deadline - time.perf_counter(), 0.0)
+                item = (
+                    self._queue.get(timeout=timeout)
+                    if timeout
+                    else self._queue.get_nowait()
+                )
+            except queue.Empty:
+                break
+            if item is None:
+                self._queue.put(None)
+                break
+            items.append(item)
+            n_records += len(item[0])
+        return items
+
+    def _run(self) -> None:
+        while (items := self._collect()) is not None:
+            try:
+                results = self.score_batch([records for records, _ in items])
+            except Exception as e:
+                for _, future in items:
+                    future.set_exception(e)
+                continue
+            if self.metrics is not None:
+                self.metrics.add_batch(len(results))
+            start = 0
+            for item_records, future in items:
+                future.set_result(results[start : start + len(item_records)])
+                start += len(item_records)
+
+
+class ScoringService:
+    """
+    Scores records of the raw feature columns with a saved model, in
+    micro-batches.
+
+    Parameters
+    ----------
+    model_dir : str
+        Directory of the model, see 'src/artifacts.py'.
+    max_batch_size : int, default=MAX_BATCH_SIZE
+        Maximum number of records scored at once.
+    max_wait_ms : float, default=MAX_WAIT_MS
+        Maximum time a record waits for further records.
+    """
+
+    def __init__(
+        self,
+        model_dir: str,
+        max_batch_size: int = MAX_BATCH_SIZE,
+        max_wait_ms: float = MAX_WAIT_MS,
+    ):
+        self.model_dir = model_dir
+        self.model_name = get_model_name(model_dir)
+        preprocessor = load_model_artifact(model_dir).preprocessor
+        self.columns = list(preprocessor.feature_names_in_)
+        self.dtypes = {c: DTYPES[c] for c in self.columns if c in DTYPES}
+
+        # Warms the model up with a record of missing values.
+        self.score_frames([self.prepare_records([{}])])
+
+        self.metrics = LatencyMetrics()
+        self.batcher = MicroBatcher(
+            self.score_frames, max_batch_size, max_wait_ms, self.metrics
+        )
+
+    def prepare_records(self, records: List[Record]) -> pd.DataFrame:
+        """
+        Returns records as DataFrame of the raw feature dtypes, missing columns
+        are missing values.
+
+        Raises
+        ------
+        ValueError
+            If a value cannot be cast to the dtype of its column or is not a
+            category of a categorical column.
+        """
+        df = pd.DataFrame.from_records(records, columns=self.columns)
+        # 'astype' would turn unknown categories into missing values.
+        for col, dtype in self.dtypes.items():
+            if isinstance(dtype, pd.CategoricalDtype):
+                values = df[col].dropna()
+                unknown = values[~values.isin(dtype.categories)]
+                if len(unknown):
+                    raise ValueError(
+                        f"Invalid record: {unknown.iloc[0]!r} is not a category"
+                        f" of column '{col}'"
+                    )
+        try:
+            return df.astype(self.dtypes)
+        except (TypeError, ValueError) as e:
+            raise ValueError(f"Invalid record: {e}") from e
+
+    def score_frames(self, frames: List[pd.DataFrame]) -> List[Dict[str, Any]]:
+        """Scores the records of prepared DataFrames at once."""
+        df = frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True)
+        result = score_chunk(self.model_dir, df)
+
+        proba_cols = [c for c in result.columns if c.startswith(PROBA_COL_PREFIX)]
+        labels = [c[len(PROBA_COL_PREFIX) :] for c in proba_cols]
+        proba = result[proba_cols].to_numpy()
+        return [
+            {"prediction": prediction, "proba": dict(zip(labels, row.tolist()))}
+            for prediction, row in zip(result[PREDICTION_COL].tolist(), proba)
+        ]
+
+    def predict(self, features: pd.DataFrame, timeout: float = 30.0) -> List[Dict]:
+        """
+        Scores records prepared by 'prepare_records' in the next micro-batch
+        and records the latency.
+        """
+        start = time.perf_counter()
+        try:
+            results = self.batcher.submit(features).result(timeout=timeout)
+        except Exception:
+            self.metrics.add_request(time.perf_counter() - start, failed=True)
+            raise
+        self.metrics.add_request(time.perf_counter() - start)
+        return results
+
+    def close(self) -> None:
+        self.batcher.close()
+
+
+def _make_handler(service: ScoringService) -> type:
+    class ScoringRequestHandler(BaseHTTPRequestHandler):
+        # Keeps the connections of clients open between requests.
+        protocol_version = "HTTP/1.1"
+
+        def _send_json(self, status: int, body: Any) -> None:
+            data = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self) -> None:
+            if self.path == "/health":
+                self._send_json(200, {"status": "ok", "model": service.model_name})
+            elif self.path == "/metrics":
+                self._send_json(200, service.metrics.snapshot())
+            else:
+                self._send_json(404, {"error": f"Unknown path '{self.path}'."})
+
+        def do_POST(self) -> None:
+            if self.path != "/predict":
+                self._send_json(404, {"error": f"Unknown path '{self.path}'."})
+                return
+            try:
+                length = int(self.headers.get("Content-Length", 0))
+                body = json.loads(self.rfile.read(length))
+                records = body if isinstance(body, list) else [body]
+                if not all(isinstance(record, dict) for record in records):
+                    raise ValueError("Expected a JSON object or a list of objects.")
+                # Cast per request, an invalid record must not fail the batch.
+                features = service.prepare_records(records)
+            except ValueError as e:
+                self._send_json(400, {"error": str(e)})
+                return
+            try:
+                results = service.predict(features)
+            except Exception as e:
+                self._send_json(500, {"error": repr(e)})
+                return
+            self._send_json(200, results if isinstance(body, list) else results[0])
+
+        def log_message(self, format: str, *args: Any) -> None:
+            # Logging each request would dominate the latency.
+            pass
+
+    return ScoringRequestHandler
+
+
+class _ScoringHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # The default backlog of 5 resets connections of many concurrent clients.
+    request_queue_size = 128
+
+
+def serve(
+    service: ScoringService, host: str = "127.0.0.1", port: int = 8000
+) -> ThreadingHTTPServer:
+    """Returns an HTTP server of the service, started with 'serve_forever'."""
+    return _ScoringHTTPServer((host, port), _make_handler(service))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Serves a saved model over HTTP for single-respondent scoring."
+    )
+    parser.add_argument(
+        "--model-dir",
+        default=None,
+        help="Directory of the model, default is the model with the best f1.",
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--max-batch-size", type=int, default=MAX_BATCH_SIZE)
+    parser.add_argument("--max-wait-ms", type=float, default=MAX_WAIT_MS)
+    args = parser.parse_args()
+
+    model_dir = args.model_dir or find_best_model_dir()
+    service = ScoringService(model_dir, args.max_batch_size, args.max_wait_ms)
+    server = serve(service, args.host, args.port)
+    print(f"✅ Serving '{service.model_name}' on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+
+
+if __name__ == "__main__":
+    main()
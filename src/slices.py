@@ -0,0 +1,326 @@
+"""
+Evaluates saved models on slices of the respondents by demographic columns.
+
+A slicing is one of the 'SLICE_COLS' or a cross of several of them, a slice is
+one combination of their categories, e.g. "Sex=f, Age=80+". 'SliceGroups'
+numbers the slices of all slicings once per dataset. The confusion matrices of
+all slices of a model are then counted with one 'np.bincount' of
+'slice * K * K + true * K + pred' and the metrics of 'evaluate_classifier' are
+derived from them at once, see 'get_batched_scores'.
+
+'save_slice_metrics' writes the table of the slices of a model as
+'<model_name>.slices.parquet' next to its results. Run from the project root
+to evaluate all saved models on the validation split:
+
+    python -m src.slices
+"""
+
+import argparse
+import json
+import time
+import warnings
+from itertools import combinations, product
+from typing import List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from src.artifacts import get_model_name, get_path_filename_prefix, load_model_artifact
+from src.bootstrap import get_batched_scores
+from src.config import MODELS_DIR, VALIDATION_RAW_FILENAME
+from src.datasets import DTYPES
+from src.model_evaluation import align_labels, encode_labels
+from src.registry import ModelRegistry
+from src.schema import TARGET_COL
+from src.splits import load_split
+
+SLICE_COLS = ["Sex", "Age", "Income", "Education"]
+""" Demographic columns the metrics are broken down by. """
+
+MAX_CROSSED_COLS = 2
+""" Default maximum number of slice columns crossed into one slicing. """
+
+SLICES_SUFFIX = "slices.parquet"
+""" Suffix of the slice table of a model, after '<model_name>.'. """
+
+
+def get_slicings(
+    slice_cols: Sequence[str] = SLICE_COLS, max_crossed_cols: int = MAX_CROSSED_COLS
+) -> List[Tuple[str, ...]]:
+    """Returns the slice columns and their crosses of up to 'max_crossed_cols'."""
+    return [
+        slicing
+        for n_cols in range(1, max_crossed_cols + 1)
+        for slicing in combinations(slice_cols, n_cols)
+    ]
+
+
+class SliceGroups:
+    """
+    Numbers the slices of the rows of a dataset for all slicings.
+
+    Rows with a missing value in a column of a slicing belong to no slice of
+    the slicing.
+
+    Parameters
+    ----------
+    X : pd.DataFrame
+        Rows with the 'slice_cols', categorical as in 'DTYPES'.
+    slice_cols : sequence of str, default=SLICE_COLS
+        Columns the rows are sliced by.
+    max_crossed_cols : int, default=MAX_CROSSED_COLS
+        Maximum number of columns crossed into one slicing.
+
+    Attributes
+    ----------
+    slices : pd.DataFrame
+        One row per slice, the "slicing", e.g. "Age x Sex", and the category of
+        each of the 'slice_cols', missing if not sliced by.
+    group_codes : np.ndarray
+        Slice of each row in each slicing, of shape (n_slicings, n_rows), -1
+        if the row belongs to no slice.
+    """
+
+    def __init__(
+        self,
+        X: pd.DataFrame,
+        slice_cols: Sequence[str] = SLICE_COLS,
+        max_crossed_cols: int = MAX_CROSSED_COLS,
+    ):
+        self.slice_cols = list(slice_cols)
+        categories = {
+            col: (
+                DTYPES[col].categories
+                if isinstance(DTYPES.get(col), pd.CategoricalDtype)
+                else pd.Index(X[col].dropna().unique()).sort_values()
+            )
+            for col in self.slice_cols
+        }
+        codes = {
+            col: pd.Categorical(X[col], categories=categories[col]).codes
+            for col in self.slice_cols
+        }
+
+        slices = []
+        group_codes = []
+        n_groups = 0
+        for slicing in get_slicings(self.slice_cols, max_crossed_cols):
+            shape = tuple(len(categories[col]) for col in slicing)
+            slicing_codes = [codes[col] for col in slicing]
+            missing = np.any([c < 0 for c in slicing_codes], axis=0)
+            flat = np.ravel_multi_index(
+                [np.where(missing, 0, c) for c in slicing_codes], shape
+            )
+            group_codes.append(np.where(missing, -1, flat + n_groups))
+            n_groups += int(np.prod(shape))
+
+            for values in product(*(categories[col] for col in slicing)):
+                slices.append(
+                    {"slicing": " x ".join(slicing), **dict(zip(slicing, values))}
+                )
+
+        self.group_codes = np.array(group_codes)
+        self.slices = pd.DataFrame(slices, columns=["slicing", *self.slice_cols])
+        self.slices = self.slices.astype(
+            {col: pd.CategoricalDtype(categories[col]) for col in self.slice_cols}
+        )
+
+    @property
+    def n_groups(self) -> int:
+        return len(self.slices)
+
+    def get_contingency(
+        self, truth_codes: np.ndarray, pred_codes: np.ndarray, n_classes: int
+    ) -> np.ndarray:
+        """
+        Counts the confusion matrices of all slices with one 'np.bincount'.
+
+        Returns
+        -------
+        np.ndarray
+            Confusion matrices of shape (n_groups, n_classes, n_classes).
+        """
+        in_slice = self.group_codes >= 0
+        cells = (self.group_codes * n_classes + truth_codes) * n_classes + pred_codes
+        counts = np.bincount(
+            cells[in_slice], minlength=self.n_groups * n_classes * n_classes
+        )
+        return counts.reshape(self.n_groups, n_classes, n_classes)
+
+    def evaluate(
+        self,
+        labels: List[Union[str, int]],
+        target_truth: Union[pd.Series, np.ndarray],
+        target_pred: Union[pd.Series, np.ndarray],
+        avg_mode: str = "weighted",
+    ) -> pd.DataFrame:
+        """
+        Computes the metrics of 'evaluate_classifier' of each slice.
+
+        Returns
+        -------
+        pd.DataFrame
+            The 'slices' with rows, their "n_rows", "f1", "recall",
+            "precision" and "bal_accuracy", the "precision_<label>",
+            "recall_<label>", "f1-score_<label>" and "support_<label>" of
+            each label and the confusion matrix over the labels in "C_<i>_<j>".
+        """
+        classes, truth_codes, pred_codes = encode_labels(
+            target_truth, target_pred, labels
+        )
+        contingency = self.get_contingency(truth_codes, pred_codes, len(classes))
+        n_rows = contingency.sum(axis=(1, 2))
+        non_empty = np.flatnonzero(n_rows)
+        contingency = contingency[non_empty]
+
+        metrics = get_batched_scores(contingency, classes, labels, avg_mode)
+        label_indices = np.searchsorted(classes, np.asarray(labels))
+        label_contingency = contingency[:, label_indices][:, :, label_indices]
+
+        table = {"n_rows": n_rows[non_empty]}
+        table |= {
+            name: metrics[name]
+            for name in ["f1", "recall", "precision", "bal_accuracy"]
+        }
+        for i, label in enumerate(labels):
+            for name, scores in metrics["per_class"].items():
+                table[f"{name}_{label}"] = scores[:, i]
+            table[f"support_{label}"] = label_contingency[:, i].sum(axis=1)
+        for i in range(len(labels)):
+            for j in range(len(labels)):
+                table[f"C_{i}_{j}"] = label_contingency[:, i, j]
+
+        return pd.concat(
+            [
+                self.slices.iloc[non_empty].reset_index(drop=True),
+                pd.DataFrame(table),
+            ],
+            axis=1,
+        )
+
+
+def save_slice_metrics(
+    model_dir: str,
+    X: pd.DataFrame,
+    y: Union[pd.Series, np.ndarray],
+    groups: Optional[SliceGroups] = None,
+    results: Optional[dict] = None,
+) -> pd.DataFrame:
+    """
+    Scores the rows with the saved model and writes the metrics of its slices
+    as '<model_name>.slices.parquet' into its directory.
+
+    Parameters
+    ----------
+    model_dir : str
+        Directory of the model, see 'src/artifacts.py'.
+    X : pd.DataFrame
+        Raw features of the evaluation rows, e.g. of the validation split.
+    y : array-like
+        True labels of the rows, mapped onto the labels the model predicts,
+        see 'align_labels'.
+    groups : SliceGroups or None, default=None
+        Slices of the rows, computed once for several models. None slices 'X'
+        by 'SLICE_COLS'.
+    results : dict or None, default=None
+        Results of the model, for its labels and 'avg_mode'. None reads its
+        '<model_name>.results.json'.
+
+    Returns
+    -------
+    pd.DataFrame
+        The slice table, see 'SliceGroups.evaluate'.
+
+    Raises
+    ------
+    ValueError
+        If 'y' holds labels the model does not predict, see 'align_labels'.
+    """
+    if groups is None:
+        groups = SliceGroups(X)
+    if results is None:
+        with open(f"{get_path_filename_prefix(model_dir)}.results.json", "r") as f:
+            results = json.load(f)
+    y = align_labels(y, results["predicts"])
+
+    artifact = load_model_artifact(model_dir)
+    target_pred = artifact.classifier.predict(artifact.preprocessor.transform(X))
+    if artifact.label_encoder is not None:
+        target_pred = artifact.label_encoder.inverse_transform(target_pred)
+
+    df = groups.evaluate(
+        results["predicts"], y, target_pred, results.get("avg_mode", "weighted")
+    )
+    df.insert(0, "model_name", get_model_name(model_dir))
+    df.to_parquet(f"{get_path_filename_prefix(model_dir)}.{SLICES_SUFFIX}", index=False)
+    return df
+
+
+def save_all_slice_metrics(
+    X: pd.DataFrame,
+    y: Union[pd.Series, np.ndarray],
+    models_dir: str = MODELS_DIR,
+    slice_cols: Sequence[str] = SLICE_COLS,
+    max_crossed_cols: int = MAX_CROSSED_COLS,
+) -> pd.DataFrame:
+    """
+    Writes the slice tables of all saved models in 'models_dir', with the
+    slices of the rows computed once. The labels 'y' are mapped onto the
+    labels of each model, models predicting other labels are skipped with a
+    warning.
+
+    Returns
+    -------
+    pd.DataFrame
+        The slice tables of all models, one after the other.
+    """
+    groups = SliceGroups(X, slice_cols, max_crossed_cols)
+    tables = []
+    for model_dir, results in ModelRegistry(models_dir).iter_results():
+        try:
+            y_model = align_labels(y, results["predicts"])
+        except ValueError as e:
+            warnings.warn(f"Skipped '{get_model_name(model_dir)}': {e}")
+            continue
+        tables.append(save_slice_metrics(model_dir, X, y_model, groups, results))
+    return pd.concat(tables, ignore_index=True) if tables else pd.DataFrame()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Evaluates all saved models on demographic slices of the"
+        " validation split."
+    )
+    parser.add_argument("--models-dir", default=MODELS_DIR)
+    parser.add_argument(
+        "--slice-cols",
+        nargs="+",
+        default=SLICE_COLS,
+        help="Columns the respondents are sliced by.",
+    )
+    parser.add_argument(
+        "--max-crossed-cols",
+        type=int,
+        default=MAX_CROSSED_COLS,
+        help="Maximum number of slice columns crossed into one slicing.",
+    )
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    df = load_split(VALIDATION_RAW_FILENAME)
+    table = save_all_slice_metrics(
+        df.drop(columns=TARGET_COL),
+        df[TARGET_COL],
+        args.models_dir,
+        args.slice_cols,
+        args.max_crossed_cols,
+    )
+    n_models = table["model_name"].nunique() if len(table) else 0
+    print(
+        f"✅ Evaluated {len(table)} slices of {n_models} models"
+        f" in {time.perf_counter() - start:.1f} s"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+"""
+Stores the training, validation and test splits as row indices into the raw
+data file instead of copies of the data.
+
+The splits are described by a manifest in 'DATA_SPLIT_DIR' holding the
+content hash of the raw data file, so indices are never applied to data they
+were not computed for. Cross-validation folds of a split are stored as one
+fold id per row of the split.
+"""
+
+import hashlib
+import json
+import os
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src.config import (
+    DATA_RAW_DIR,
+    DATA_RAW_FILENAME,
+    DATA_SPLIT_DIR,
+    DATA_STORAGE_FORMAT,
+    SPLIT_MANIFEST_FILENAME,
+)
+from src.datasets import get_dataset_path, load_dataset
+
+_hash_cache: Dict[Tuple[str, int, int], str] = {}
+
+
+def compute_file_hash(path: str, block_size: int = 2**20) -> str:
+    """
+    Returns the sha256 hex digest of a file's content.
+
+    Digests are cached per process by path, size and modification time.
+    """
+    stat = os.stat(path)
+    key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    if key not in _hash_cache:
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            while block := f.read(block_size):
+                digest.update(block)
+        _hash_cache[key] = digest.hexdigest()
+    return _hash_cache[key]
+
+
+def save_splits(
+    splits: Dict[str, np.ndarray],
+    folds: Optional[Dict[str, np.ndarray]] = None,
+    params: Optional[dict] = None,
+    split_dir: str = DATA_SPLIT_DIR,
+    raw_filename: str = DATA_RAW_FILENAME,
+    storage_format: Optional[str] = None,
+) -> str:
+    """
+    Saves row indices of splits and the manifest describing them.
+
+    Parameters
+    ----------
+    splits : dict of str to np.ndarray
+        Maps split names, e.g. 'TRAIN_RAW_FILENAME', to row positions in the
+        raw data file. Saved as int32 '<name>.npy'.
+    folds : dict of str to np.ndarray or None, default=None
+        Maps split names to the cross-validation fold id of each row of the
+        split. Saved as int8 '<name>.folds.npy'.
+    params : dict or None, default=None
+        Parameters of the splitting, stored in the manifest for reference.
+    split_dir : str, default=DATA_SPLIT_DIR
+        Directory of the index files and the manifest.
+    raw_filename : str, default=DATA_RAW_FILENAME
+        Name of the raw data file in 'DATA_RAW_DIR' the indices refer to.
+    storage_format : str or None, default=None
+        Storage format of the raw data file. None uses 'DATA_STORAGE_FORMAT'.
+
+    Returns
+    -------
+    str
+        Path of the manifest.
+    """
+    storage_format = storage_format or DATA_STORAGE_FORMAT
+    raw_path = get_dataset_path(DATA_RAW_DIR, raw_filename, storage_format)
+    folds = folds or {}
+
+    os.makedirs(split_dir, exist_ok=True)
+    for name, indices in splits.items():
+        np.save(os.path.join(split_dir, f"{name}.npy"), indices.astype(np.int32))
+    for name, fold_ids in folds.items():
+        np.save(os.path.join(split_dir, f"{name}.folds.npy"), fold_ids.astype(np.int8))
+
+    manifest = {
+        "raw_filename": raw_filename,
+        "storage_format": storage_format,
+        "raw_sha256": compute_file_hash(raw_path),
+        "params": params or {},
+        "splits": {name: len(indices) for name, indices in splits.items()},
+        "folds": {name: int(fold_ids.max()) + 1 for name, fold_ids in folds.items()},
+    }
+    manifest_path = os.path.join(split_dir, SPLIT_MANIFEST_FILENAME)
+    with open(manifest_path, "w") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest_path
+
+
+def load_manifest(split_dir: str = DATA_SPLIT_DIR, verify: bool = True) -> dict:
+    """
+    Loads the manifest of the splits.
+
+    With 'verify=True' a ValueError is raised if the raw data file changed
+    since the splits were saved.
+    """
+    with open(os.path.join(split_dir, SPLIT_MANIFEST_FILENAME), "r") as f:
+        manifest = json.load(f)
+
+    if verify:
+        raw_path = get_dataset_path(
+            DATA_RAW_DIR, manifest["raw_filename"], manifest["storage_format"]
+        )
+        if compute_file_hash(raw_path) != manifest["raw_sha256"]:
+            raise ValueError(
+                f"'{raw_path}' changed since the splits were saved."
+                " Run 'data/scripts/split_data.py' again."
+            )
+    return manifest
+
+
+def load_split_indices(
+    name: str, split_dir: str = DATA_SPLIT_DIR, mmap: bool = True
+) -> np.ndarray:
+    """Returns the row positions of a split in the raw data file."""
+    return np.load(
+        os.path.join(split_dir, f"{name}.npy"), mmap_mode="r" if mmap else None
+    )
+
+
+def load_split(
+    name: str,
+    columns: Optional[Sequence[str]] = None,
+    split_dir: str = DATA_SPLIT_DIR,
+) -> pd.DataFrame:
+    """
+    Loads the rows of a split from the raw data file.
+
+    Parameters
+    ----------
+    name : str
+        Name of the split, e.g. 'TRAIN_RAW_FILENAME'.
+    columns : sequence of str or None, default=None
+        Columns to load, None loads all.
+    split_dir : str, default=DATA_SPLIT_DIR
+        Directory of the index files and the manifest.
+
+    Returns
+    -------
+    pd.DataFrame
+        Rows of the split in stored order with a fresh RangeIndex.
+
+    Raises
+    ------
+    ValueError
+        If the raw data file changed since the splits were saved.
+    """
+    manifest = load_manifest(split_dir)
+
+    return load_dataset(
+        DATA_RAW_DIR,
+        manifest["raw_filename"],
+        columns=columns,
+        storage_format=manifest["storage_format"],
+        rows=load_split_indices(name, split_dir),
+    )
+
+
+def load_fold_ids(name: str, split_dir: str = DATA_SPLIT_DIR) -> np.ndarray:
+    """Returns the cross-validation fold id of each row of a split."""
+    return np.load(os.path.join(split_dir, f"{name}.folds.npy"))
+
+
+def get_folds(
+    name: str, split_dir: str = DATA_SPLIT_DIR
+) -> List[Tuple[np.ndarray, np.ndarray]]:
+    """
+    Returns the (train, test) row positions of the stored folds of a split.
+
+    The result can be passed as 'cv' to sklearn, e.g. 'cross_val_score'. The
+    folds of 'split_data.py' are stratified on the 3-class target, not on the
+    merged 'pre'/'dia' target.
+    """
+    fold_ids = load_fold_ids(name, split_dir)
+    return [
+        (np.flatnonzero(fold_ids != fold), np.flatnonzero(fold_ids == fold))
+        for fold in range(int(fold_ids.max()) + 1)
+    ]
@@ -0,0 +1,278 @@
+"""
+Runs Optuna studies with several worker processes.
+
+The trials of all workers are written to one journal file in 'STUDY_DIR',
+which takes concurrent writes without the locking contention of SQLite.
+Objectives report the score of each cross-validation fold, so that a pruner
+stops unpromising trials after the first folds.
+
+Run from the project root, e.g.:
+
+    python -m src.studies src.objectives:rf_feateng_objective --n-trials 100
+"""
+
+import argparse
+import importlib
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Callable, Optional, Tuple, Union
+
+import numpy as np
+import optuna
+from optuna.samplers import TPESampler
+from optuna.storages import JournalStorage
+from optuna.storages.journal import JournalFileBackend, JournalFileOpenLock
+from sklearn.base import BaseEstimator
+
+from src.config import STUDY_DIR
+from src.cross_validation import FoldMatrixStore
+from src.multi_fidelity import get_successive_halving_pruner
+
+PRUNERS = {
+    "median": lambda: optuna.pruners.MedianPruner(n_startup_trials=5, n_warmup_steps=1),
+    "hyperband": lambda: optuna.pruners.HyperbandPruner(min_resource=1),
+    "asha": get_successive_halving_pruner,
+    "none": optuna.pruners.NopPruner,
+}
+"""
+Pruners selectable by name, their steps are the number of evaluated folds.
+"asha" prunes the rungs of multi-fidelity objectives, see 'src/multi_fidelity.py'.
+"""
+
+ObjectiveFactory = Callable[..., Callable[[optuna.Trial], float]]
+
+
+def get_study_storage(
+    study_name: str, study_dir: str = STUDY_DIR
+) -> optuna.storages.BaseStorage:
+    """
+    Returns the journal file storage '<study_name>.log' of a study.
+
+    The file lock works on all platforms and for several processes.
+    """
+    os.makedirs(study_dir, exist_ok=True)
+    path = os.path.join(study_dir, f"{study_name}.log")
+    return JournalStorage(JournalFileBackend(path, lock_obj=JournalFileOpenLock(path)))
+
+
+def balance_jobs(
+    n_trials: int,
+    n_splits: int = 5,
+    n_workers: Optional[int] = None,
+    n_cores: Optional[int] = None,
+) -> Tuple[int, int]:
+    """
+    Splits the cores between parallel trials and parallel folds per trial.
+
+    Parallel trials are preferred, as they scale without synchronization and
+    leave the folds of a trial in order for pruning. The remaining cores
+    evaluate folds in parallel.
+
+    Parameters
+    ----------
+    n_trials : int
+        Number of trials of the study.
+    n_splits : int, default=5
+        Number of cross-validation folds of a trial.
+    n_workers : int or None, default=None
+        Number of worker processes, None derives it from the cores.
+    n_cores : int or None, default=None
+        Number of cores to use, None uses all.
+
+    Returns
+    -------
+    tuple of (int, int)
+        Number of worker processes and 'n_jobs' of the folds of a trial.
+    """
+    n_cores = n_cores or os.cpu_count() or 1
+    if n_workers is None:
+        n_workers = min(n_trials, n_cores)
+    n_workers = max(1, n_workers)
+    n_jobs = max(1, min(n_splits, n_cores // n_workers))
+    return n_workers, n_jobs
+
+
+def cross_val_score_pruned(
+    trial: optuna.Trial,
+    fold_store: FoldMatrixStore,
+    estimator: BaseEstimator,
+    scoring: Union[str, Callable, None] = None,
+    n_jobs: Optional[int] = None,
+) -> float:
+    """
+    Cross-validates an estimator on the folds of a 'FoldMatrixStore' and
+    reports the mean score after each fold to the trial.
+
+    Returns
+    -------
+    float
+        Mean score of the folds, failed folds are ignored.
+
+    Raises
+    ------
+    optuna.TrialPruned
+        If the pruner of the study stops the trial, the remaining folds are
+        not evaluated.
+    """
+    scores = []
+    fold_scores = fold_store.iter_scores(estimator, scoring=scoring, n_jobs=n_jobs)
+    try:
+        for score in fold_scores:
+            scores.append(score)
+            if np.isnan(scores).all():
+                continue
+            trial.report(float(np.nanmean(scores)), step=len(scores))
+            if trial.should_prune():
+                raise optuna.TrialPruned()
+    finally:
+        fold_scores.close()
+    return float(np.nanmean(scores))
+
+
+def _import_object(path: str) -> object:
+    """Imports an object given as 'package.module:name'."""
+    module_name, _, name = path.partition(":")
+    return getattr(importlib.import_module(module_name), name)
+
+
+def _run_worker(
+    study_name: str,
+    objective_factory: Union[str, ObjectiveFactory],
+    n_trials: int,
+    n_jobs: int,
+    seed: int,
+    pruner: str,
+    study_dir: str,
+) -> None:
+    if isinstance(objective_factory, str):
+        objective_factory = _import_object(objective_factory)
+
+    study = optuna.load_study(
+        study_name=study_name,
+        storage=get_study_storage(study_name, study_dir),
+        sampler=TPESampler(seed=seed),
+        pruner=PRUNERS[pruner](),
+    )
+    study.optimize(objective_factory(n_jobs=n_jobs), n_trials=n_trials)
+
+
+def run_study(
+    study_name: str,
+    objective_factory: Union[str, ObjectiveFactory],
+    n_trials: int,
+    n_workers: Optional[int] = None,
+    n_splits: int = 5,
+    direction: str = "maximize",
+    pruner: str = "median",
+    seed: int = 42,
+    study_dir: str = STUDY_DIR,
+) -> optuna.Study:
+    """
+    Runs the trials of a study in parallel worker processes.
+
+    Parameters
+    ----------
+    study_name : str
+        Name of the study. An existing study of the name is continued.
+    objective_factory : str or callable
+        Function returning the objective, called in each worker with the
+        'n_jobs' of the folds of a trial, or its import path
+        'package.module:name'. It must be importable by the workers.
+    n_trials : int
+        Number of trials of all workers together.
+    n_workers : int or None, default=None
+        Number of worker processes, None balances them with the folds of a
+        trial over the cores, see 'balance_jobs'.
+    n_splits : int, default=5
+        Number of cross-validation folds of a trial.
+    direction : str, default="maximize"
+        Direction of the optimization.
+    pruner : str, default="median"
+        Name of the pruner, one of 'PRUNERS'.
+    seed : int, default=42
+        Seed of the sampler of the first worker, the other workers use the
+        following seeds.
+    study_dir : str, default=STUDY_DIR
+        Directory of the journal file of the study.
+
+    Returns
+    -------
+    optuna.Study
+        The study with the trials of all workers.
+    """
+    if pruner not in PRUNERS:
+        raise ValueError(f"Unknown pruner '{pruner}', expected one of {list(PRUNERS)}.")
+    n_workers, n_jobs = balance_jobs(n_trials, n_splits, n_workers)
+
+    storage = get_study_storage(study_name, study_dir)
+    optuna.create_study(
+        study_name=study_name,
+        storage=storage,
+        direction=direction,
+        load_if_exists=True,
+    )
+
+    worker_trials = [
+        n_trials // n_workers + (i < n_trials % n_workers) for i in range(n_workers)
+    ]
+    worker_args = [
+        (study_name, objective_factory, k, n_jobs, seed + i, pruner, study_dir)
+        for i, k in enumerate(worker_trials)
+    ]
+    if n_workers == 1:
+        _run_worker(*worker_args[0])
+    else:
+        # Spawned workers start without the state of the parent, e.g. of a
+        # notebook kernel, which is not fork safe.
+        with ProcessPoolExecutor(
+            max_workers=n_workers, mp_context=multiprocessing.get_context("spawn")
+        ) as executor:
+            futures = [executor.submit(_run_worker, *args) for args in worker_args]
+            for future in futures:
+                future.result()
+
+    return optuna.load_study(study_name=study_name, storage=storage)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Runs an Optuna study with several worker processes."
+    )
+    parser.add_argument(
+        "objective",
+        help="Import path of the objective factory, e.g."
+        " 'src.objectives:rf_feateng_objective'.",
+    )
+    parser.add_argument("--study-name", default=None)
+    parser.add_argument("--n-trials", type=int, default=20)
+    parser.add_argument("--n-workers", type=int, default=None)
+    parser.add_argument("--n-splits", type=int, default=5)
+    parser.add_argument("--pruner", choices=list(PRUNERS), default="median")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    study_name = args.study_name or (
+        f"{datetime.now().strftime('%Y%m%d%H%M%S')}_{args.objective.split(':')[-1]}"
+    )
+    n_workers, n_jobs = balance_jobs(args.n_trials, args.n_splits, args.n_workers)
+    print(f"Running '{study_name}' with {n_workers} workers of {n_jobs} jobs")
+
+    study = run_study(
+        study_name,
+        args.objective,
+        n_trials=args.n_trials,
+        n_workers=n_workers,
+        n_splits=args.n_splits,
+        pruner=args.pruner,
+        seed=args.seed,
+    )
+
+    n_pruned = sum(t.state == optuna.trial.TrialState.PRUNED for t in study.trials)
+    print(f"✅ {len(study.trials)} trials, {n_pruned} pruned")
+    print(f"   best value {study.best_value:.4f} with {study.best_params}")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,39 +2,179 @@
 
 import numpy as np
 import pandas as pd
+import scipy.sparse as sp
 from sklearn.base import BaseEstimator, TransformerMixin
 
 
 class MissingFlagTransformer(BaseEstimator, TransformerMixin):
+    """
+    Flags missing values per column.
+
+    The flags are written directly into an array of ``dtype`` without copying
+    the input. With ``packbits=True`` the flags of each row are packed into
+    bits (``np.packbits``), i.e. ``ceil(n_flags / 8)`` uint8 columns. With
+    ``sparse_output=True`` the flags are returned as CSR matrix, which only
+    stores the missing values. With ``drop_never_missing=True`` only columns
+    with missing values during ``fit`` are flagged.
+    """
+
+    _PACK_CHUNK_ROWS = 65_536
+
+    def __init__(
+        self, dtype=bool, packbits=False, drop_never_missing=False, sparse_output=False
+    ):
+        self.dtype = dtype
+        self.packbits = packbits
+        self.drop_never_missing = drop_never_missing
+        self.sparse_output = sparse_output
+
+    def __setstate__(self, state):
+        # Transformers pickled before these parameters existed flag all columns.
+        state = {
+            "dtype": bool,
+            "packbits": False,
+            "drop_never_missing": False,
+            "sparse_output": False,
+        } | state
+        if "feature_names_in_" in state and "flagged_features_" not in state:
+            state["flagged_features_"] = np.arange(len(state["feature_names_in_"]))
+        super().__setstate__(state)
+
     def fit(self, X, y=None):
+        if self.packbits and self.sparse_output:
+            raise ValueError("'packbits' and 'sparse_output' can't both be set.")
+
         if hasattr(X, "columns"):
             self.feature_names_in_ = list(X.columns)
         else:
             self.feature_names_in_ = list([f"x{i}" for i in range(X.shape[1])])
+
+        if self.drop_never_missing:
+            self.flagged_features_ = np.flatnonzero(self._get_na_mask(X).any(axis=0))
+        else:
+            self.flagged_features_ = np.arange(len(self.feature_names_in_))
         return self
 
-    def transform(self, X):
-        X_ = X.copy()
+    @staticmethod
+    def _iter_na_columns(X, features):
+        """Yields the missing value mask of each of the features."""
+        if isinstance(X, pd.DataFrame):
+            for i in features:
+                yield X.iloc[:, i].isna().to_numpy()
+        else:
+            X_ = np.asarray(X)
+            isna = np.isnan if X_.dtype.kind in "fc" else pd.isna
+            for i in features:
+                yield isna(X_[:, i])
 
-        na_mask = (
-            pd.isna(X_).to_numpy() if isinstance(X_, pd.DataFrame) else np.isnan(X_)
-        )
+    def _get_na_mask(self, X, features=None, dtype=bool):
+        if features is None:
+            features = range(X.shape[1])
+
+        na_mask = np.empty((X.shape[0], len(features)), dtype=dtype)
+        for j, column_mask in enumerate(self._iter_na_columns(X, features)):
+            na_mask[:, j] = column_mask
         return na_mask
 
+    def _get_sparse_na_mask(self, X):
+        # The rows of each column are the CSC indices, no dense mask is built.
+        indices = [
+            np.flatnonzero(column_mask)
+            for column_mask in self._iter_na_columns(X, self.flagged_features_)
+        ]
+        indptr = np.concatenate([[0], np.cumsum([len(rows) for rows in indices])])
+        indices = np.concatenate([np.empty(0, dtype=np.intp), *indices])
+        data = np.ones(len(indices), dtype=self.dtype)
+        shape = (X.shape[0], len(self.flagged_features_))
+        return sp.csc_matrix((data, indices, indptr), shape=shape).tocsr()
+
+    def transform(self, X):
+        if self.sparse_output:
+            return self._get_sparse_na_mask(X)
+        if not self.packbits:
+            return self._get_na_mask(X, self.flagged_features_, self.dtype)
+
+        # Pack in row chunks to never hold the full unpacked mask.
+        n_bytes = -(-len(self.flagged_features_) // 8)
+        packed = np.empty((X.shape[0], n_bytes), dtype=np.uint8)
+        for start in range(0, X.shape[0], self._PACK_CHUNK_ROWS):
+            rows = slice(start, start + self._PACK_CHUNK_ROWS)
+            X_chunk = X.iloc[rows] if isinstance(X, pd.DataFrame) else X[rows]
+            packed[rows] = np.packbits(
+                self._get_na_mask(X_chunk, self.flagged_features_), axis=1
+            )
+        return packed
+
     def get_feature_names_out(self, input_features=None):
         if input_features is None:
             input_features = self.feature_names_in_
 
-        output_features = [f"{c}_isna" for c in input_features]
+        if self.packbits:
+            n_bytes = -(-len(self.flagged_features_) // 8)
+            return np.array([f"isna_bits_{i}" for i in range(n_bytes)])
+
+        output_features = [f"{input_features[i]}_isna" for i in self.flagged_features_]
 
         return np.array(output_features)
 
 
+class CastTransformer(BaseEstimator, TransformerMixin):
+    """
+    Casts the input to ``dtype``, e.g. the float64 output of a scaler to
+    float32. Sparse input stays sparse.
+    """
+
+    def __init__(self, dtype=np.float32):
+        self.dtype = dtype
+
+    def fit(self, X, y=None):
+        if hasattr(X, "columns"):
+            self.feature_names_in_ = list(X.columns)
+        else:
+            self.feature_names_in_ = list([f"x{i}" for i in range(X.shape[1])])
+        return self
+
+    def transform(self, X):
+        if sp.issparse(X):
+            return X.astype(self.dtype)
+        return np.asarray(X, dtype=self.dtype)
+
+    def get_feature_names_out(self, input_features=None):
+        if input_features is None:
+            input_features = self.feature_names_in_
+
+        return np.array(input_features)
+
+
 class CategoryFromThresholdTransformer(BaseEstimator, TransformerMixin):
-    def __init__(self, thresholds):
+    """
+    Bins numeric columns by thresholds.
+
+    With ``output="labels"`` the bins are returned as strings like ``"[20-30)"``,
+    with ``output="codes"`` as int8 bin codes indexing ``categories_``, where
+    missing values are coded as ``-1``.
+    """
+
+    def __init__(self, thresholds, output="labels"):
         self.thresholds = thresholds
+        self.output = output
+
+    def __setstate__(self, state):
+        # Transformers pickled before 'output' and 'categories_' existed.
+        state = {"output": "labels"} | state
+        if "feature_names_in_" in state and "categories_" not in state:
+            state["categories_"] = [
+                self._get_categories(th) for th in state["thresholds"]
+            ]
+        super().__setstate__(state)
 
     def fit(self, X, y=None):
+        if self.output not in ("labels", "codes"):
+            raise ValueError("'output' must be either 'labels' or 'codes'.")
+
+        return self._fit_thresholds(X)
+
+    def _fit_thresholds(self, X):
         if isinstance(X, pd.DataFrame):
             self.feature_names_in_ = list(X.columns)
         else:
@@ -53,38 +193,145 @@ class CategoryFromThresholdTransformer(BaseEstimator, TransformerMixin):
             raise ValueError(
                 "number of input features and length of 'thresholds' must be the same."
             )
+
+        # Labels per column, indexed by the bin returned from 'np.searchsorted'.
+        self.categories_ = [self._get_categories(th) for th in self.thresholds]
         return self
 
-    def _get_cat_from_threshold(self, value, thresholds):
-        if pd.isna(value):
-            return "NA"
-        if value >= thresholds[-1]:
-            result = f"{thresholds[-1]}+"
-        elif value < thresholds[0]:
-            result = f"<{thresholds[0]}"
-        else:
-            idx = next(i for i, val in list(enumerate(thresholds)) if val > value)
+    @staticmethod
+    def _get_categories(thresholds):
+        inner = [
+            f"[{thresholds[i - 1]}-{thresholds[i]})" for i in range(1, len(thresholds))
+        ]
+        return np.array([f"<{thresholds[0]}", *inner, f"{thresholds[-1]}+"])
 
-            result = f"[{thresholds[idx-1]}-{thresholds[idx]})"
-        return result
+    def _get_bins(self, X):
+        """Returns the bin index of every value and the mask of missing values."""
+        X_ = X.to_numpy() if isinstance(X, pd.DataFrame) else np.asarray(X)
+
+        na_mask = pd.isna(X_)
+        values = np.zeros(X_.shape, dtype=np.float64)
+        np.copyto(values, X_, where=~na_mask, casting="unsafe")
+
+        bins = np.empty(X_.shape, dtype=np.intp)
+        for i, th in enumerate(self.thresholds):
+            # side="right" counts thresholds <= value, i.e. the value is in
+            # [th[bin - 1], th[bin]), the bin of the label 'categories_[bin]'.
+            bins[:, i] = np.searchsorted(th, values[:, i], side="right")
+
+        return bins, na_mask
 
     def transform(self, X):
-        X_ = X.copy()
+        bins, na_mask = self._get_bins(X)
 
-        if isinstance(X_, pd.DataFrame):
-            X_ = X_.values
+        if self.output == "codes":
+            codes = bins.astype(np.int8)
+            codes[na_mask] = -1
+            return codes
 
         res = np.column_stack(
             [
-                [self._get_cat_from_threshold(x, th) for x in X_[:, i]]
-                for i, th in enumerate(self.thresholds)
+                np.where(na_mask[:, i], "NA", categories[bins[:, i]])
+                for i, categories in enumerate(self.categories_)
             ]
         )
 
         return res
 
-    def get_feature_names_out(self, input_features=None):
+    def get_feature_names_out(self, input_features=None, categories=False):
+        """
+        Returns the names of the output columns, ``"<column>_cat"``.
+
+        With ``categories=True`` returns the category list instead, the names
+        ``"<column>_<category>"`` of the categories of all columns in the
+        order of their codes, e.g. to label the codes of ``output="codes"``.
+        """
         if input_features is None:
             input_features = self.feature_names_in_
 
+        if categories:
+            return np.array(
+                [
+                    f"{c}_{category}"
+                    for c, column_categories in zip(input_features, self.categories_)
+                    for category in column_categories
+                ]
+            )
         return np.array([f"{c}_cat" for c in input_features])
+
+
+class ThresholdOneHotEncoder(CategoryFromThresholdTransformer):
+    """
+    Bins numeric columns by thresholds and one-hot encodes the bins in one step.
+
+    Encodes the same bins as ``CategoryFromThresholdTransformer`` followed by
+    a ``OneHotEncoder``, but writes a uint8 matrix directly instead of
+    creating a string per cell. It differs from that pipeline in:
+
+    - the column order, the bin order of ``categories_`` instead of the
+      lexicographic order of the labels, e.g. ``"30+"`` before ``"<20"``;
+    - ``drop="first"``, which drops the lowest bin instead of the
+      lexicographically first label;
+    - missing values, encoded as all zeros instead of an ``"NA"`` column.
+
+    Attributes
+    ----------
+    offsets_ : np.ndarray
+        Index of the first output column of each input column, followed by
+        the number of output columns.
+    """
+
+    def __init__(self, thresholds, drop=None, sparse_output=False):
+        self.thresholds = thresholds
+        self.drop = drop
+        self.sparse_output = sparse_output
+
+    def __setstate__(self, state):
+        # Encoders pickled before the offsets were a public fitted attribute.
+        if "_offsets" in state:
+            state["offsets_"] = state.pop("_offsets")
+        super().__setstate__(state)
+
+    def fit(self, X, y=None):
+        if self.drop not in (None, "first"):
+            raise ValueError("'drop' must be either None or 'first'.")
+
+        self._fit_thresholds(X)
+
+        n_dropped = 1 if self.drop == "first" else 0
+        n_out = [len(categories) - n_dropped for categories in self.categories_]
+        self.offsets_ = np.concatenate([[0], np.cumsum(n_out)])
+        return self
+
+    def transform(self, X):
+        bins, na_mask = self._get_bins(X)
+
+        if self.drop == "first":
+            bins -= 1
+            na_mask |= bins < 0
+
+        n_rows = bins.shape[0]
+        rows, cols = np.nonzero(~na_mask)
+        indices = bins[rows, cols] + self.offsets_[cols]
+        shape = (n_rows, self.offsets_[-1])
+
+        if self.sparse_output:
+            data = np.ones(len(rows), dtype=np.uint8)
+            return sp.csr_matrix((data, (rows, indices)), shape=shape)
+
+        res = np.zeros(shape, dtype=np.uint8)
+        res[rows, indices] = 1
+        return res
+
+    def get_feature_names_out(self, input_features=None):
+        if input_features is None:
+            input_features = self.feature_names_in_
+
+        start = 1 if self.drop == "first" else 0
+        return np.array(
+            [
+                f"{c}_{category}"
+                for c, categories in zip(input_features, self.categories_)
+                for category in categories[start:]
+            ]
+        )
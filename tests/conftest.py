@@ -0,0 +1,60 @@
+"""
+Fixtures of the tests: synthetic raw data and a model saved from it.
+"""
+
+import os
+
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.linear_model import LogisticRegression
+from sklearn.preprocessing import LabelEncoder
+
+from src.artifacts import clear_artifact_cache
+from src.datasets import DTYPES, LABEL_COLS
+from src.preprocessing import build_preprocessor
+
+N_ROWS = 500
+""" Number of rows of the synthetic raw data. """
+
+
+@pytest.fixture(scope="session")
+def raw_data():
+    rng = np.random.default_rng(0)
+    columns = {}
+    for name, dtype in DTYPES.items():
+        if name in LABEL_COLS:
+            continue
+        if isinstance(dtype, pd.CategoricalDtype):
+            values = rng.choice(np.asarray(dtype.categories), N_ROWS)
+        else:
+            values = rng.integers(0, 31, N_ROWS)
+        columns[name] = pd.Series(values, dtype=dtype)
+    X = pd.DataFrame(columns)
+    y = np.where(X["GenHlth"].cat.codes + rng.normal(size=N_ROWS) > 2, "dia", "no")
+    return X, y
+
+
+def _save_model(model_dir: str, X: pd.DataFrame, y: np.ndarray, **params) -> None:
+    """Saves a logistic regression on the preprocessed data like the notebooks."""
+    preprocessor = build_preprocessor(**params).fit(X)
+    labelencoder = LabelEncoder().fit(y)
+    classifier = LogisticRegression(max_iter=1000).fit(
+        preprocessor.transform(X), labelencoder.transform(y)
+    )
+    prefix = os.path.join(model_dir, os.path.basename(model_dir))
+    os.makedirs(model_dir)
+    joblib.dump(classifier, f"{prefix}.model.pkl")
+    joblib.dump(preprocessor, f"{prefix}.pipeline.pkl")
+    joblib.dump(labelencoder, f"{prefix}.label_encoder.pkl")
+
+
+@pytest.fixture
+def save_model():
+    """
+    Returns a function saving a logistic regression on preprocessed raw data
+    to a model directory. The loaded artifacts are cleared afterwards.
+    """
+    yield _save_model
+    clear_artifact_cache()
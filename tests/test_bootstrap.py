@@ -0,0 +1,40 @@
+"""
+Tests that the batched metrics of 'src/bootstrap.py' equal the metrics of
+'get_metrics_from_contingency' of each confusion matrix.
+"""
+
+import numpy as np
+import pytest
+
+from src.bootstrap import get_batched_scores
+from src.model_evaluation import (
+    encode_labels,
+    get_contingency,
+    get_metrics_from_contingency,
+)
+
+
+@pytest.mark.parametrize(
+    "labels, avg_mode",
+    [
+        (["dia", "no"], "binary"),
+        ([0, 1], "binary"),
+        (["dia", "no", "pre"], "weighted"),
+        (["dia", "no", "pre"], "macro"),
+        (["dia", "no", "pre"], "micro"),
+    ],
+)
+def test_batched_scores_equal_metrics(labels, avg_mode):
+    rng = np.random.default_rng(0)
+    contingencies, expected = [], []
+    for _ in range(3):
+        y_true, y_pred = rng.choice(labels, 100), rng.choice(labels, 100)
+        classes, truth_codes, pred_codes = encode_labels(y_true, y_pred, labels)
+        contingencies.append(get_contingency(truth_codes, pred_codes, len(classes)))
+        expected.append(
+            get_metrics_from_contingency(contingencies[-1], classes, labels, avg_mode)
+        )
+
+    metrics = get_batched_scores(np.stack(contingencies), classes, labels, avg_mode)
+    for name in ("f1", "recall", "precision", "bal_accuracy"):
+        assert metrics[name] == pytest.approx([m[name] for m in expected])
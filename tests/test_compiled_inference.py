@@ -0,0 +1,92 @@
+"""
+Tests that the compiled preprocessors of 'src/compiled_inference.py' give the
+same output as the fitted ColumnTransformers, on synthetic raw data with
+missing values.
+"""
+
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+import scipy.sparse as sp
+
+from src.compiled_inference import compile_preprocessor
+from src.datasets import DTYPES, LABEL_COLS
+from src.preprocessing import build_preprocessor
+
+N_ROWS = 2000
+""" Number of rows of the synthetic raw data. """
+
+MISSING_RATE = 0.15
+""" Fraction of missing values of each column. """
+
+PREPROCESSOR_PARAMS = {
+    "onehot": {},
+    "codes": {"cat_gen_encoding": "codes"},
+    "compact": {"dtype_policy": "compact"},
+    "float32": {"dtype_policy": "float32"},
+    "float32, scaled numeric": {
+        "numeric_cols": ("BMI", "MentHlth", "PhysHlth"),
+        "cat_gen_thresholds": {},
+        "dtype_policy": "float32",
+    },
+    "sparse": {"sparse_output": True},
+    "no missing flags": {"missing_flags": False},
+}
+""" Parameters of 'build_preprocessor' of the compared variants. """
+
+
+def _make_raw_frame(n_rows: int, seed: int) -> pd.DataFrame:
+    """Returns random raw features in the dtypes of 'DTYPES'."""
+    rng = np.random.default_rng(seed)
+    columns = {}
+    for name, dtype in DTYPES.items():
+        if name in LABEL_COLS:
+            continue
+        if isinstance(dtype, pd.CategoricalDtype):
+            values = pd.Series(
+                rng.choice(np.asarray(dtype.categories), n_rows), dtype=dtype
+            )
+        elif name == "BMI":
+            values = pd.Series(np.round(rng.uniform(12, 60, n_rows), 2), dtype=dtype)
+        else:
+            values = pd.Series(rng.integers(0, 31, n_rows), dtype=dtype)
+        columns[name] = values.mask(rng.random(n_rows) < MISSING_RATE)
+    return pd.DataFrame(columns)
+
+
+@pytest.fixture(scope="module")
+def raw_frames():
+    return _make_raw_frame(N_ROWS, seed=0), _make_raw_frame(N_ROWS, seed=1)
+
+
+@pytest.mark.parametrize("variant", PREPROCESSOR_PARAMS)
+def test_compiled_equals_column_transformer(raw_frames, variant):
+    X_train, X_test = raw_frames
+    preprocessor = build_preprocessor(**PREPROCESSOR_PARAMS[variant]).fit(X_train)
+    expected = preprocessor.transform(X_test)
+    if sp.issparse(expected):
+        expected = expected.toarray()
+
+    # Records as the serving endpoint receives them, missing values are null.
+    records = json.loads(X_test.to_json(orient="records"))
+    compiled = compile_preprocessor(preprocessor)
+    actual = compiled.transform(records)
+
+    assert actual.shape == expected.shape
+    assert np.array_equal(actual, np.asarray(expected, dtype=np.float64))
+
+
+def test_compiled_accepts_nan_and_sequence_records(raw_frames):
+    X_train, X_test = raw_frames
+    preprocessor = build_preprocessor().fit(X_train)
+    compiled = compile_preprocessor(preprocessor)
+    expected = preprocessor.transform(X_test)
+
+    rows = X_test.astype(object).to_numpy()
+    assert pd.isna(rows).any()
+    assert np.array_equal(compiled.transform(list(rows)), expected)
+    assert np.array_equal(
+        compiled.transform(X_test.to_dict(orient="records")), expected
+    )
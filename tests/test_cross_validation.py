@@ -0,0 +1,98 @@
+"""
+Tests of the stored fold matrices of 'FoldMatrixStore' in
+'src/cross_validation.py'.
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.preprocessing import StandardScaler
+
+from src.cross_validation import FoldMatrixStore
+
+N_ROWS = 1000
+""" Number of rows of the synthetic data. """
+
+PREPROCESSOR_NBYTES = 5 * N_ROWS * 10 * 8
+""" Size of the float64 matrices of the 5 folds of one preprocessor. """
+
+
+@pytest.fixture(scope="module")
+def Xy():
+    rng = np.random.default_rng(0)
+    return pd.DataFrame(rng.normal(size=(N_ROWS, 10))), rng.integers(0, 2, N_ROWS)
+
+
+def _preprocessor(i: int) -> StandardScaler:
+    """Returns one of four preprocessors of different parameters."""
+    return StandardScaler(with_mean=i < 2, with_std=bool(i % 2))
+
+
+def _stored_keys(fold_store: FoldMatrixStore) -> list:
+    return [entry.name for entry in os.scandir(fold_store.store_dir) if entry.is_dir()]
+
+
+def test_fold_matrices_equal_preprocessed_folds(Xy, tmp_path):
+    X, y = Xy
+    fold_store = FoldMatrixStore(X, y, store_dir=str(tmp_path))
+    for (X_train, X_test), (train, test) in zip(
+        fold_store.get_fold_matrices(_preprocessor(0)), fold_store.folds_
+    ):
+        preprocessor = _preprocessor(0).fit(X.iloc[train])
+        assert isinstance(X_train, np.memmap)
+        assert np.array_equal(X_train, preprocessor.transform(X.iloc[train]))
+        assert np.array_equal(X_test, preprocessor.transform(X.iloc[test]))
+
+
+def test_evicts_by_count_and_bytes(Xy, tmp_path):
+    X, y = Xy
+    fold_store = FoldMatrixStore(X, y, store_dir=str(tmp_path / "count"))
+    fold_store.max_preprocessors = 2
+    for i in range(4):
+        fold_store.get_fold_matrices(_preprocessor(i))
+    assert len(_stored_keys(fold_store)) == 2
+
+    fold_store = FoldMatrixStore(
+        X, y, store_dir=str(tmp_path / "bytes"), max_bytes=1.5 * PREPROCESSOR_NBYTES
+    )
+    for i in range(4):
+        fold_store.get_fold_matrices(_preprocessor(i))
+    assert len(_stored_keys(fold_store)) == 1
+
+
+def test_memory_tier_keeps_recent_preprocessors(Xy, tmp_path):
+    X, y = Xy
+    fold_store = FoldMatrixStore(
+        X, y, store_dir=str(tmp_path), memory_bytes=2 * PREPROCESSOR_NBYTES
+    )
+    fold_matrices = [fold_store.get_fold_matrices(_preprocessor(i)) for i in range(3)]
+
+    assert not isinstance(fold_matrices[2][0][0], np.memmap)
+    assert fold_store.get_fold_matrices(_preprocessor(2)) is fold_matrices[2]
+    assert fold_store.get_fold_matrices(_preprocessor(1)) is fold_matrices[1]
+    # The least recently used preprocessor was dropped and is read again.
+    reloaded = fold_store.get_fold_matrices(_preprocessor(0))
+    assert reloaded is not fold_matrices[0]
+    for (X_train, X_test), (X_train_0, X_test_0) in zip(reloaded, fold_matrices[0]):
+        assert np.array_equal(X_train, X_train_0)
+        assert np.array_equal(X_test, X_test_0)
+
+
+@pytest.mark.skipif(os.name != "posix", reason="needs 'fcntl'")
+def test_keeps_preprocessors_locked_by_other_processes(Xy, tmp_path):
+    import fcntl
+
+    X, y = Xy
+    fold_store = FoldMatrixStore(X, y, store_dir=str(tmp_path), max_preprocessors=1)
+    fold_store.get_fold_matrices(_preprocessor(0))
+    (key,) = _stored_keys(fold_store)
+    # A lock on another open file acts as the lock of another process.
+    with open(os.path.join(fold_store.store_dir, f"{key}.lock")) as f:
+        fcntl.flock(f, fcntl.LOCK_SH)
+        fold_store.get_fold_matrices(_preprocessor(1))
+        assert key in _stored_keys(fold_store)
+    fold_store.get_fold_matrices(_preprocessor(2))
+    assert key not in _stored_keys(fold_store)
+    assert len(_stored_keys(fold_store)) == 1
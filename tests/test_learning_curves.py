@@ -0,0 +1,57 @@
+"""
+Tests of the checkpointed learning curves of 'src/learning_curves.py'.
+"""
+
+import json
+
+import numpy as np
+import pytest
+from sklearn.linear_model import LogisticRegression
+
+from src.learning_curves import compute_learning_curve
+
+N_ROWS = 300
+""" Number of rows of the synthetic data. """
+
+
+@pytest.fixture(scope="module")
+def Xy():
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(N_ROWS, 4))
+    return X, (X[:, 0] + rng.normal(size=N_ROWS) > 0).astype(int)
+
+
+def test_resumes_from_checkpoint(Xy, tmp_path):
+    X, y = Xy
+    path = str(tmp_path / "checkpoint.jsonl")
+    kwargs = dict(cv=3, train_sizes=[0.5, 0.5, 1.0], checkpoint_path=path)
+    sizes, train_scores, val_scores = compute_learning_curve(
+        LogisticRegression(), X, y, **kwargs
+    )
+    assert sizes.tolist() == [100, 200]
+    assert val_scores.shape == (2, 3)
+
+    # A partly written last line is dropped, the other scores are loaded.
+    with open(path) as f:
+        lines = f.read().splitlines()
+    scores = [json.loads(line) for line in lines[1:]]
+    for record in scores:
+        record["val_score"] = -1.0
+    with open(path, "w") as f:
+        f.write("\n".join([lines[0]] + [json.dumps(r) for r in scores[:-1]]))
+        f.write("\n" + lines[-1][:10])
+    _, _, resumed = compute_learning_curve(LogisticRegression(), X, y, **kwargs)
+    assert np.sum(resumed == -1.0) == len(scores) - 1
+    assert np.sum(np.isin(resumed, val_scores)) == 1
+
+
+def test_ignores_partly_written_header(Xy, tmp_path):
+    X, y = Xy
+    path = tmp_path / "checkpoint.jsonl"
+    path.write_text('{"config": {"estim')
+    _, _, val_scores = compute_learning_curve(
+        LogisticRegression(), X, y, cv=3, train_sizes=[1.0], checkpoint_path=str(path)
+    )
+    assert not np.isnan(val_scores).any()
+    assert json.loads(path.read_text().splitlines()[0])["config"]
+    assert not (tmp_path / "checkpoint.jsonl.tmp").exists()
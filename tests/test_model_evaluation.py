@@ -0,0 +1,59 @@
+"""
+Tests of the metrics and the permutation feature importances of
+'src/model_evaluation.py' on synthetic data and a model saved in a temporary
+directory.
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.metrics import f1_score, precision_score, recall_score
+
+from src.model_evaluation import (
+    encode_labels,
+    get_contingency,
+    get_metrics_from_contingency,
+    save_feature_importances_data,
+)
+
+
+@pytest.mark.parametrize("labels", [["dia", "no"], [0, 1]])
+def test_binary_metrics_of_last_label(labels):
+    rng = np.random.default_rng(0)
+    y_true, y_pred = rng.choice(labels, 200), rng.choice(labels, 200)
+    classes, truth_codes, pred_codes = encode_labels(y_true, y_pred, labels)
+    metrics = get_metrics_from_contingency(
+        get_contingency(truth_codes, pred_codes, len(classes)),
+        classes,
+        labels,
+        "binary",
+    )
+    for name, score in (
+        ("f1", f1_score),
+        ("recall", recall_score),
+        ("precision", precision_score),
+    ):
+        assert metrics[name] == pytest.approx(
+            score(y_true, y_pred, pos_label=labels[-1])
+        )
+
+
+def test_feature_importances_of_sparse_preprocessor(raw_data, save_model, tmp_path):
+    X, y = raw_data
+    importances = {}
+    for variant, sparse_output in (("dense", False), ("sparse", True)):
+        model_dir = str(tmp_path / variant)
+        save_model(model_dir, X, y, sparse_output=sparse_output)
+        save_feature_importances_data(model_dir, X, y, n_repeats=2, n_jobs=1)
+        importances[variant] = pd.read_csv(
+            os.path.join(model_dir, f"{variant}.feature_importances.csv"),
+            index_col="feature",
+        ).sort_index()
+
+    assert list(importances["sparse"].index) == sorted(X.columns)
+    assert importances["sparse"].loc["GenHlth", "importance_mean"] > 0
+    pd.testing.assert_frame_equal(
+        importances["sparse"], importances["dense"], atol=1e-6
+    )
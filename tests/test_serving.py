@@ -0,0 +1,36 @@
+"""
+Tests of the validation of the records of a request in 'src/serving.py'.
+"""
+
+import json
+
+import pytest
+
+from src.serving import ScoringService
+
+
+@pytest.fixture
+def service(raw_data, save_model, tmp_path):
+    X, y = raw_data
+    model_dir = str(tmp_path / "model")
+    save_model(model_dir, X, y)
+    service = ScoringService(model_dir, max_wait_ms=1)
+    yield service
+    service.close()
+
+
+def test_scores_valid_records(raw_data, service):
+    X, _ = raw_data
+    records = json.loads(X.head(3).to_json(orient="records"))
+    results = service.predict(service.prepare_records(records))
+    assert [result["prediction"] in ("dia", "no") for result in results] == [True] * 3
+
+
+def test_rejects_unknown_categories(raw_data, service):
+    X, _ = raw_data
+    record = json.loads(X.head(1).to_json(orient="records"))[0]
+    record["GenHlth"] = "unknown"
+    with pytest.raises(
+        ValueError, match="'unknown' is not a category of column 'GenHlth'"
+    ):
+        service.prepare_records([record])
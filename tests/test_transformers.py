@@ -0,0 +1,98 @@
+"""
+Tests of the binning transformers of 'src/transformers.py'.
+"""
+
+import pickle
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.preprocessing import OneHotEncoder
+
+from src.transformers import CategoryFromThresholdTransformer, ThresholdOneHotEncoder
+
+THRESHOLDS = [[20, 25, 30], [0, 5, 10]]
+""" Thresholds of the two binned columns. """
+
+
+@pytest.fixture(scope="module")
+def X():
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame(
+        {
+            "BMI": rng.uniform(12, 60, 500).round(2),
+            "MentHlth": rng.integers(0, 31, 500).astype(float),
+        }
+    )
+    df.loc[rng.random(500) < 0.1, "BMI"] = np.nan
+    return df
+
+
+def test_codes_index_categories(X):
+    labels = CategoryFromThresholdTransformer(THRESHOLDS).fit_transform(X)
+    transformer = CategoryFromThresholdTransformer(THRESHOLDS, output="codes").fit(X)
+    codes = transformer.transform(X)
+
+    assert codes.dtype == np.int8
+    for i, categories in enumerate(transformer.categories_):
+        missing = codes[:, i] == -1
+        assert np.array_equal(missing, labels[:, i] == "NA")
+        assert np.array_equal(categories[codes[~missing, i]], labels[~missing, i])
+
+    assert list(transformer.get_feature_names_out()) == ["BMI_cat", "MentHlth_cat"]
+    assert list(transformer.get_feature_names_out(categories=True)) == [
+        "BMI_<20",
+        "BMI_[20-25)",
+        "BMI_[25-30)",
+        "BMI_30+",
+        "MentHlth_<0",
+        "MentHlth_[0-5)",
+        "MentHlth_[5-10)",
+        "MentHlth_10+",
+    ]
+
+
+@pytest.mark.parametrize("sparse_output", [False, True])
+def test_one_hot_encoder_matches_string_pipeline(X, sparse_output):
+    encoder = ThresholdOneHotEncoder(THRESHOLDS, sparse_output=sparse_output).fit(X)
+    Xt = encoder.transform(X)
+    Xt = Xt.toarray() if sparse_output else Xt
+
+    # The string pipeline orders the columns by label and encodes "NA" as a
+    # column, the fused encoder orders them by bin and leaves "NA" all zeros.
+    labels = CategoryFromThresholdTransformer(THRESHOLDS).fit_transform(X)
+    onehot = OneHotEncoder(sparse_output=False).fit(labels)
+    expected = pd.DataFrame(
+        onehot.transform(labels),
+        columns=onehot.get_feature_names_out(["BMI_cat", "MentHlth_cat"]),
+    )
+    names = [
+        f"{c}_cat_{category}"
+        for c, categories in zip(X.columns, encoder.categories_)
+        for category in categories
+    ]
+    # Bins without values, e.g. "<0", have no column in the string pipeline.
+    expected = expected.reindex(columns=names, fill_value=0)
+    assert np.array_equal(Xt, expected.to_numpy())
+    assert list(encoder.offsets_) == [0, 4, 8]
+
+
+def test_one_hot_encoder_drops_lowest_bin(X):
+    full = ThresholdOneHotEncoder(THRESHOLDS).fit(X)
+    dropped = ThresholdOneHotEncoder(THRESHOLDS, drop="first").fit(X)
+
+    keep = np.ones(full.offsets_[-1], dtype=bool)
+    keep[full.offsets_[:-1]] = False
+    assert np.array_equal(dropped.transform(X), full.transform(X)[:, keep])
+    assert "BMI_<20" not in dropped.get_feature_names_out()
+
+
+def test_one_hot_encoder_unpickles_private_offsets(X):
+    encoder = ThresholdOneHotEncoder(THRESHOLDS).fit(X)
+    state = encoder.__getstate__()
+    state["_offsets"] = state.pop("offsets_")
+    restored = ThresholdOneHotEncoder.__new__(ThresholdOneHotEncoder)
+    restored.__setstate__(state)
+
+    restored = pickle.loads(pickle.dumps(restored))
+    assert np.array_equal(restored.transform(X), encoder.transform(X))